@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PlagiarismappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'PlagiarismApp'
+
+    def ready(self):
+        from . import worker  # noqa: F401
@@ -0,0 +1,157 @@
+"""Precision and recall of each engine against `compare_texts` on a course
+made by generate_corpus, with its throughput, memory and index size."""
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+from time import perf_counter
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connections
+from django.db.models import Sum
+from django.db.models.functions import Length
+from django.test.utils import override_settings
+from django.utils import timezone
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from ..models import Fingerprint, Submission, SubmissionVector
+from ..services.utils import PlagiarismCheckerService
+from .measure import git_commit, write_results
+
+# Settings of each engine configuration the accuracy suite can compare,
+# over those of ENGINE_DEFAULTS; register another by adding it here
+ENGINES = {
+    "pairwise": {"PLAGIARISM_SCORING_MODE": "pairwise"},
+    "corpus": {"PLAGIARISM_SCORING_MODE": "corpus", "PLAGIARISM_CORPUS_DIR": ""},
+    "corpus-memmap": {"PLAGIARISM_SCORING_MODE": "corpus"},
+    "winnowing": {"PLAGIARISM_SCORING_MODE": "winnowing"},
+}
+ENGINE_DEFAULTS = {
+    # Passages are found after flagging and cost every engine the same
+    "PLAGIARISM_WINNOWING_PASSAGES": False,
+}
+
+
+def flagged_pairs(preprocessed_texts, threshold):
+    """Brute-force set of (i, j) pairs scoring above the threshold."""
+    matrix = CountVectorizer().fit_transform(preprocessed_texts)
+    matrix = normalize(matrix.astype(np.float64), norm="l2")
+    scores = (matrix @ matrix.T).toarray()
+    rows, columns = np.nonzero(np.triu(scores, k=1) > threshold)
+    return set(zip(rows.tolist(), columns.tolist()))
+
+
+def index_bytes(course_id, corpus_dir):
+    """Bytes of the vectors, fingerprints and corpus files stored for a
+    course."""
+    stored = [
+        SubmissionVector.objects.filter(submission__assignment__course__id=course_id).aggregate(
+            size=Sum(Length("vector"))
+        )["size"],
+        # A 64-bit hash and a 32-bit position per fingerprint
+        Fingerprint.objects.filter(course__id=course_id).count() * 12,
+    ]
+    for directory, _, names in os.walk(corpus_dir):
+        stored.extend(os.path.getsize(os.path.join(directory, name)) for name in names)
+    return sum(size or 0 for size in stored)
+
+
+def measure_engine(engine, course_id, corpus_dir, results):
+    """Check every submission of a course against all others with one
+    engine, recording the pairs it flags."""
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    engine_settings = {**ENGINE_DEFAULTS, "PLAGIARISM_CORPUS_DIR": corpus_dir, **ENGINES[engine]}
+    with override_settings(**engine_settings):
+        submissions = list(
+            Submission.objects.filter(assignment__course__id=course_id).values_list("id", "student_id")
+        )
+        flagged = set()
+        start = perf_counter()
+        for submission_id, student_id in submissions:
+            checker = PlagiarismCheckerService(course_id, submission_id, student_id)
+            checker.compare_with_all_submissions()
+            flagged.update(
+                tuple(sorted((result["current_submission_id"], result["other_submission_id"])))
+                for result in checker.report
+            )
+        elapsed = perf_counter() - start
+        stored = index_bytes(course_id, corpus_dir)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in KiB on Linux
+    results[engine] = (len(submissions) / elapsed, (rss_after - rss_before) / 2 ** 10, stored, flagged)
+
+
+def benchmark_accuracy(checker, options, stdout):
+    if not options["labels"]:
+        raise CommandError("The accuracy suite needs the --labels of a course made by generate_corpus")
+    with open(options["labels"]) as file:
+        labels = json.load(file)
+    course_id = labels["course_id"]
+    threshold = settings.PLAGIARISM_SIMILARITY_THRESHOLD
+    labelled = {
+        tuple(sorted((submission["submission_id"], submission["source_id"])))
+        for submission in labels["submissions"]
+        if submission["source_id"]
+    }
+
+    # Every engine reuses these stored texts, so extraction is left out
+    # of their throughput
+    course_checker = PlagiarismCheckerService(course_id=course_id, submission_id=None, student_id=None)
+    ids, texts = zip(*[(str(submission.id), text) for submission, text in course_checker.get_peer_texts()])
+    preprocessed = [course_checker.preprocess_text(text) for text in texts]
+    baseline = {tuple(sorted((ids[row], ids[column]))) for row, column in flagged_pairs(preprocessed, threshold)}
+
+    stdout.write(
+        f"{len(ids)} submissions, {len(baseline)} pairs above {threshold} by compare_texts, "
+        f"{len(labelled)} labelled"
+    )
+    stdout.write(
+        f"{'engine':>14} {'flagged':>8} {'precision':>10} {'recall':>8} {'labelled recall':>16} "
+        f"{'docs/s':>8} {'RSS growth (MB)':>16} {'index (MB)':>11}"
+    )
+    stdout.write(
+        f"{'compare_texts':>14} {len(baseline):>8} {1:>10.3f} {1:>8.3f} "
+        f"{len(baseline & labelled) / len(labelled) if labelled else 1:>16.3f} {'-':>8} {'-':>16} {'-':>11}"
+    )
+
+    results = {"commit": git_commit(), "created": timezone.now().isoformat(), "engines": {}}
+    # Each engine runs in a fresh process so that peak RSS is its own,
+    # and starts without the indexes of the engine before it
+    context = multiprocessing.get_context("fork")
+    shared = context.Manager().dict()
+    for engine in options["engines"]:
+        Fingerprint.objects.filter(course__id=course_id).delete()
+        SubmissionVector.objects.filter(submission__assignment__course__id=course_id).delete()
+
+        with tempfile.TemporaryDirectory() as corpus_dir:
+            connections.close_all()
+            process = context.Process(target=measure_engine, args=(engine, course_id, corpus_dir, shared))
+            process.start()
+            process.join()
+        if engine not in shared:
+            raise CommandError(f"The {engine} engine failed")
+
+        throughput, growth, stored, flagged = shared[engine]
+        found = len(flagged & baseline)
+        results["engines"][engine] = {
+            "settings": ENGINES[engine],
+            "flagged": len(flagged),
+            "precision": found / len(flagged) if flagged else 1.0,
+            "recall": found / len(baseline) if baseline else 1.0,
+            "labelled_recall": len(flagged & labelled) / len(labelled) if labelled else 1.0,
+            "docs_per_second": throughput,
+            "rss_growth_bytes": growth * 2 ** 20,
+            "index_bytes": stored,
+        }
+        row = results["engines"][engine]
+        stdout.write(
+            f"{engine:>14} {len(flagged):>8} {row['precision']:>10.3f} {row['recall']:>8.3f} "
+            f"{row['labelled_recall']:>16.3f} {throughput:>8.1f} {growth:>16.1f} {stored / 2 ** 20:>11.2f}"
+        )
+
+    write_results(options["json"], results, stdout)
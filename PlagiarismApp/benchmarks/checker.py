@@ -0,0 +1,79 @@
+"""Time of each checker step and of a full check on courses made by
+generate_corpus."""
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import Course, Submission, SubmissionText, SubmissionVector
+from ..services.utils import PlagiarismCheckerService
+from .measure import git_commit, timed, write_results
+
+
+def generated_courses(codes):
+    """The courses of the given codes, in order."""
+    courses = {course.code: course for course in Course.objects.filter(code__in=codes)}
+    missing = [code for code in codes if code not in courses]
+    if missing:
+        raise CommandError(f"No course {', '.join(missing)}; create them with generate_corpus first")
+    return [courses[code] for code in codes]
+
+
+def benchmark_checker(checker, options, stdout):
+    courses = generated_courses(options["courses"])
+    results = {
+        "commit": git_commit(),
+        "created": timezone.now().isoformat(),
+        "settings": {
+            name: getattr(settings, f"PLAGIARISM_{name.upper()}")
+            for name in ["scoring_mode", "similarity_threshold", "workers"]
+        },
+        "courses": {},
+    }
+    results["settings"]["corpus_dir"] = bool(settings.PLAGIARISM_CORPUS_DIR)
+
+    stdout.write(
+        f"{'course':>10} {'docs':>7} {'extract (ms)':>13} {'preprocess (ms)':>16} {'compare (ms)':>13} "
+        f"{'first check (s)':>16} {'repeat check (s)':>17} {'reported':>9}"
+    )
+    for course in courses:
+        submissions = Submission.objects.filter(assignment__course=course).order_by("student__registration_number")
+        if options["cold"]:
+            # Including those stored for byte-identical files elsewhere,
+            # which a check would otherwise reuse
+            hashes = submissions.values("sha256")
+            for model in [SubmissionText, SubmissionVector]:
+                model.objects.filter(Q(submission__in=submissions) | Q(content_hash__in=hashes)).delete()
+
+        course_checker = PlagiarismCheckerService(course_id=course.id, submission_id=None, student_id=None)
+        sample = [(submission.sha256,) for submission in submissions[:options["sample"]]]
+        texts, extraction = timed(course_checker.extract_blob_text, sample)
+        _, preprocessing = timed(course_checker.preprocess_text, [(text,) for text in texts])
+        _, comparison = timed(course_checker.compare_texts, list(zip(texts, texts[1:])))
+
+        current = submissions.first()
+        check = {}
+        for run in ["first", "repeat"]:
+            course_checker = PlagiarismCheckerService(course.id, current.id, current.student_id)
+            start = perf_counter()
+            course_checker.compare_with_all_submissions()
+            check[run] = {"seconds": perf_counter() - start, **course_checker.stats}
+        check["reported"] = len(course_checker.report)
+
+        results["courses"][course.code] = {
+            "submissions": submissions.count(),
+            "extract_text_from_pdf": extraction,
+            "preprocess_text": preprocessing,
+            "compare_texts": comparison,
+            "compare_with_all_submissions": check,
+        }
+        stdout.write(
+            f"{course.code:>10} {results['courses'][course.code]['submissions']:>7} "
+            f"{extraction['ms_per_call']:>13.2f} {preprocessing['ms_per_call']:>16.2f} "
+            f"{comparison['ms_per_call'] or 0:>13.2f} {check['first']['seconds']:>16.3f} "
+            f"{check['repeat']['seconds']:>17.3f} {check['reported']:>9}"
+        )
+
+    write_results(options["json"], results, stdout)
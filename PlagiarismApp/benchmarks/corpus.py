@@ -0,0 +1,155 @@
+"""Memory and time per check of the memory-mapped course corpus against
+the matrix built in each worker, one upload at a time and micro-batched."""
+import os
+import tempfile
+import uuid
+from time import perf_counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.test.utils import override_settings
+
+from ..models import Submission, SubmissionStatus
+from ..services import vectors
+from ..services.corpus import CourseCorpus
+from ..services.synthetic import synthetic_texts
+from ..services.utils import PlagiarismCheckerService
+from .accuracy import ENGINE_DEFAULTS
+from .checker import generated_courses
+from .measure import peak_bytes
+
+
+def benchmark_corpus(checker, options, stdout):
+    texts = synthetic_texts(max(options["sizes"]) + 1, words=options["words"], seed=options["seed"])
+    feature_vectors = [document.feature_vector() for document in checker.preprocess_many(texts)]
+    query, feature_vectors = feature_vectors[0], feature_vectors[1:]
+    blobs = [vectors.dumps(vector) for vector in feature_vectors]
+
+    stdout.write(f"{'docs':>8} {'in-memory (s)':>14} {'peak (KiB)':>11} {'memmap (s)':>11} {'peak (KiB)':>11}")
+    for size in options["sizes"]:
+        def build_in_memory():
+            return checker.score_vectors(query, [vectors.loads(blob) for blob in blobs[:size]])
+
+        start = perf_counter()
+        _, in_memory_bytes = peak_bytes(build_in_memory)
+        in_memory_time = perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(PLAGIARISM_CORPUS_DIR=directory):
+            corpus = CourseCorpus(course_id=0)
+            os.makedirs(corpus.path)
+            corpus.write_generation([uuid.uuid4() for _ in range(size)], feature_vectors[:size])
+
+            def open_memory_mapped():
+                snapshot = corpus.open_current()
+                return snapshot, snapshot.score(query)
+
+            start = perf_counter()
+            (snapshot, _), memmap_bytes = peak_bytes(open_memory_mapped)
+            memmap_time = perf_counter() - start
+            snapshot.close()
+
+        stdout.write(
+            f"{size:>8} {in_memory_time:>14.3f} {in_memory_bytes / 2 ** 10:>11.1f} {memmap_time:>11.3f} "
+            f"{memmap_bytes / 2 ** 10:>11.1f}"
+        )
+
+
+def benchmark_microbatch(checker, options, stdout):
+    burst = options["burst"]
+    texts = synthetic_texts(max(options["sizes"]) + burst, words=options["words"], seed=options["seed"])
+    feature_vectors = [document.feature_vector() for document in checker.preprocess_many(texts)]
+    uploads, feature_vectors = feature_vectors[:burst], feature_vectors[burst:]
+
+    stdout.write(
+        f"{'docs':>8} {'uploads':>8} {'single (ms/upload)':>19} {'batched (ms/upload)':>20} {'speed-up':>10}"
+    )
+    for size in options["sizes"]:
+        corpus_vectors = feature_vectors[:size] + uploads
+        ids = [uuid.uuid4() for _ in corpus_vectors]
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(PLAGIARISM_CORPUS_DIR=directory):
+            corpus = CourseCorpus(course_id=0)
+            os.makedirs(corpus.path)
+
+            corpus.write_generation(ids[:size], corpus_vectors[:size])
+
+            # Every single check reads the uploads stored so far, its own
+            # included, over the published corpus, then scores its upload
+            start = perf_counter()
+            for count, upload in enumerate(uploads, start=1):
+                with corpus.open_current() as snapshot:
+                    snapshot.add_overlay(ids[size:size + count], uploads[:count])
+                    snapshot.score(upload)
+            single_time = perf_counter() - start
+
+            start = perf_counter()
+            with corpus.open_current() as snapshot:
+                snapshot.add_overlay(ids[size:], uploads)
+                snapshot.score_many(uploads)
+            batched_time = perf_counter() - start
+
+        stdout.write(
+            f"{size:>8} {burst:>8} {single_time / burst * 1000:>19.2f} {batched_time / burst * 1000:>20.2f} "
+            f"{single_time / batched_time:>9.1f}x"
+        )
+
+
+def benchmark_uploads(checker, options, stdout):
+    stdout.write(
+        f"{'course':>10} {'docs':>7} {'uploads':>8} {'in-memory (ms/check)':>21} {'memmap (ms/check)':>18} "
+        f"{'publishes':>10}"
+    )
+    for course in generated_courses(options["courses"]):
+        submissions = list(
+            Submission.objects.filter(assignment__course=course).order_by("student__registration_number")
+        )
+        uploads = submissions[-options["burst"]:]
+
+        seconds = {}
+        for mode in ["in-memory", "memmap"]:
+            with tempfile.TemporaryDirectory() as directory, override_settings(
+                **ENGINE_DEFAULTS,
+                PLAGIARISM_SCORING_MODE="corpus",
+                PLAGIARISM_CORPUS_DIR=directory if mode == "memmap" else "",
+            ), transaction.atomic():
+                seconds[mode], publishes = check_uploads(course, uploads)
+                # Leave the course as generate_corpus made it
+                transaction.set_rollback(True)
+
+        stdout.write(
+            f"{course.code:>10} {len(submissions):>7} {len(uploads):>8} "
+            f"{np.mean(seconds['in-memory']) * 1000:>21.2f} {np.mean(seconds['memmap']) * 1000:>18.2f} "
+            f"{publishes:>10}"
+        )
+
+
+def check_uploads(course, uploads):
+    """Remove the uploads from the course, then submit and check them again
+    one at a time. Returns the seconds of each check and how many corpus
+    generations they published."""
+    Submission.objects.filter(id__in=[upload.id for upload in uploads]).delete()
+
+    # The rest of the course was vectorized, and its corpus published, by
+    # the checks before the first upload
+    course_checker = PlagiarismCheckerService(course.id, submission_id=None, student_id=None)
+    course_checker.build_submission_vectors(list(
+        course_checker.all_submissions.exclude(
+            vector__engine_version=vectors.VECTOR_ENGINE_VERSION
+        ).values_list("id", flat=True)
+    ))
+    corpus = CourseCorpus(course.id) if settings.PLAGIARISM_CORPUS_DIR else None
+    if corpus is not None:
+        corpus.open().close()
+    generations = {corpus and corpus.current_generation()}
+
+    seconds = []
+    for upload in uploads:
+        upload.save(force_insert=True)
+        SubmissionStatus.objects.create(submission=upload)
+        upload_checker = PlagiarismCheckerService(course.id, upload.id, upload.student_id)
+        start = perf_counter()
+        upload_checker.compare_with_all_submissions()
+        seconds.append(perf_counter() - start)
+        generations.add(corpus and corpus.current_generation())
+    return seconds, len(generations) - 1
@@ -0,0 +1,73 @@
+"""Time and peak memory of PDF text extraction, each mode in its own
+process so that its peak RSS is its own."""
+import io
+import multiprocessing
+import resource
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+import PyPDF2
+from django.test.utils import override_settings
+
+from ..services import blobs
+from ..services.synthetic import synthetic_texts
+from ..services.utils import HTMLToPdf, PlagiarismCheckerService
+
+MODES = ["streamed", "streamed + preprocess", "memory-mapped blob", "memory-mapped + tokens"]
+
+
+def synthetic_thesis(pages: int, words: int, seed: int = 0):
+    """PDF of roughly `pages` pages of synthetic text."""
+    paragraphs = synthetic_texts(pages, words=words, seed=seed)
+    html = "".join(f'<p style="page-break-after: always">{paragraph}</p>' for paragraph in paragraphs)
+    return HTMLToPdf(html)
+
+
+def measure_extraction(mode, pdf_bytes, sha256, results):
+    checker = PlagiarismCheckerService(course_id=None, submission_id=None, student_id=None)
+    extract = {
+        "streamed": lambda: checker.extract_text_from_pdf(pdf_bytes),
+        "streamed + preprocess": lambda: checker.preprocess_pages(checker.iter_pdf_pages(pdf_bytes)),
+        "memory-mapped blob": lambda: checker.extract_blob_text(sha256),
+        "memory-mapped + tokens": lambda: checker.extract_blob_document(sha256),
+    }[mode]
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    start = perf_counter()
+    extract()
+    elapsed = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in KiB on Linux
+    results[mode] = (elapsed, peak / 2 ** 20, (rss_after - rss_before) / 2 ** 10, rss_after / 2 ** 10)
+
+
+def benchmark_extraction(checker, options, stdout):
+    if options["pdf"]:
+        with open(options["pdf"], "rb") as pdf_file:
+            pdf_bytes = pdf_file.read()
+    else:
+        pdf_bytes = synthetic_thesis(options["pages"], options["words"], options["seed"])
+
+    with io.BytesIO(pdf_bytes) as file_buffer:
+        pages = len(PyPDF2.PdfReader(file_buffer).pages)
+    stdout.write(f"{pages} pages, {len(pdf_bytes) / 2 ** 20:.1f} MB")
+    stdout.write(
+        f"{'mode':>22} {'time (s)':>9} {'traced peak (MB)':>17} {'RSS growth (MB)':>16} {'peak RSS (MB)':>14}"
+    )
+
+    context = multiprocessing.get_context("fork")
+    results = context.Manager().dict()
+    for mode in MODES:
+        with tempfile.TemporaryDirectory() as directory, override_settings(BLOB_STORE_DIR=directory):
+            sha256, _ = blobs.put(pdf_bytes)
+            process = context.Process(target=measure_extraction, args=(mode, pdf_bytes, sha256, results))
+            process.start()
+            process.join()
+
+        elapsed, traced, growth, peak = results[mode]
+        stdout.write(f"{mode:>22} {elapsed:>9.2f} {traced:>17.1f} {growth:>16.1f} {peak:>14.1f}")
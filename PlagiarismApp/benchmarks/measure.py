@@ -0,0 +1,55 @@
+"""Timing and memory helpers shared by the benchmark suites."""
+import json
+import subprocess
+import tracemalloc
+from time import perf_counter
+
+from django.conf import settings
+
+
+def retained_bytes(build):
+    """Return what `build` returns and the memory it still holds."""
+    tracemalloc.start()
+    result = build()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained
+
+
+def peak_bytes(build):
+    """Return what `build` returns and the most memory it held at once."""
+    tracemalloc.start()
+    result = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak
+
+
+def timed(function, arguments):
+    """Call `function` with each of `arguments` in turn; return the results
+    and a summary of the time taken."""
+    start = perf_counter()
+    results = [function(*argument) for argument in arguments]
+    elapsed = perf_counter() - start
+    return results, {
+        "calls": len(arguments),
+        "seconds": elapsed,
+        "ms_per_call": elapsed / len(arguments) * 1000 if arguments else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, results, stdout):
+    """Write a suite's results to `path` as JSON, when one was given."""
+    if path:
+        with open(path, "w") as file:
+            json.dump(results, file, indent=2, default=str)
+        stdout.write(f"Results written to {path}")
@@ -0,0 +1,164 @@
+"""Throughput and memory of preprocessing, of the documents and vectors it
+produces, and of shingling them."""
+from time import perf_counter
+
+import numpy as np
+from django.conf import settings
+from pydoc_data.topics import topics
+from sklearn.feature_extraction.text import CountVectorizer
+
+from ..services import shingles
+from ..services import text as text_processing
+from ..services import vectors
+from ..services.synthetic import synthetic_texts
+from .measure import retained_bytes
+
+
+def benchmark_preprocessing(checker, options, stdout):
+    # The pydoc topics ship with Python: real English prose mixed with
+    # code, quotes, contractions and abbreviations
+    documents = [topics[key] for key in sorted(topics)]
+    stem = text_processing.resources()["stem"]
+    stdout.write(f"{'stem cache':>12} {'time (s)':>9} {'tokens/s':>10} {'stem hits':>10}")
+
+    stem.cache_clear()
+    for cache in ["cold", "warm"]:
+        before = stem.cache_info()
+        start = perf_counter()
+        tokens = sum(len(text_processing.preprocess_tokens(document)) for document in documents)
+        elapsed = perf_counter() - start
+
+        after = stem.cache_info()
+        hits, misses = after.hits - before.hits, after.misses - before.misses
+        stdout.write(f"{cache:>12} {elapsed:>9.3f} {tokens / elapsed:>10.0f} {hits / (hits + misses):>9.1%}")
+
+
+def benchmark_documents(checker, options, stdout):
+    words = 10000
+    texts = synthetic_texts(max(options["sizes"]), words=words, seed=options["seed"])
+    text = texts[0]
+
+    # Fill the stem cache and the vocabulary first, so that only the
+    # document itself is measured; the vocabulary is shared per check
+    checker.preprocess_document(text)
+    preprocessed, string_bytes = retained_bytes(lambda: checker.preprocess_text(text))
+    _, split_bytes = retained_bytes(lambda: preprocessed.split())
+    document, document_bytes = retained_bytes(lambda: checker.preprocess_document(text))
+    stdout.write(f"Memory per {words}-word document ({len(document)} stems):")
+    stdout.write(f"{'stem string':>28} {string_bytes / 2 ** 10:>9.1f} KiB")
+    stdout.write(f"{'stem string, split':>28} {(string_bytes + split_bytes) / 2 ** 10:>9.1f} KiB")
+    stdout.write(f"{'token IDs and term counts':>28} {document_bytes / 2 ** 10:>9.1f} KiB")
+
+    stdout.write(f"{'docs':>8} {'CountVectorizer (s)':>20} {'feature hashes (s)':>19}")
+    for size in options["sizes"]:
+        strings = [checker.preprocess_text(text) for text in texts[:size]]
+        documents = checker.preprocess_many(texts[:size])
+
+        start = perf_counter()
+        CountVectorizer().fit_transform(strings)
+        vectorizer_time = perf_counter() - start
+
+        start = perf_counter()
+        checker.vectorize_documents(documents)
+        matrix_time = perf_counter() - start
+
+        stdout.write(f"{size:>8} {vectorizer_time:>20.3f} {matrix_time:>19.3f}")
+
+
+def benchmark_vectors(checker, options, stdout):
+    texts = synthetic_texts(max(options["sizes"]), words=options["words"], seed=options["seed"])
+    blobs = [vectors.dumps(document.feature_vector()) for document in checker.preprocess_many(texts)]
+    stdout.write(
+        f"Stored vector: {np.mean([len(blob) for blob in blobs]) / 2 ** 10:.1f} KiB per "
+        f"{options['words']}-word document"
+    )
+
+    stdout.write(f"{'docs':>8} {'preprocessing (s)':>18} {'stored (s)':>11} {'speed-up':>10}")
+    for size in options["sizes"]:
+        start = perf_counter()
+        documents = checker.preprocess_many(texts[:size])
+        vectors.vector_matrix([document.feature_vector() for document in documents])
+        preprocessing_time = perf_counter() - start
+
+        start = perf_counter()
+        vectors.vector_matrix([vectors.loads(blob) for blob in blobs[:size]])
+        stored_time = perf_counter() - start
+
+        stdout.write(
+            f"{size:>8} {preprocessing_time:>18.3f} {stored_time:>11.3f} {preprocessing_time / stored_time:>9.1f}x"
+        )
+
+
+def python_shingle_hashes(token_hashes, size):
+    """`shingles.shingle_hashes` as a Python loop over every shingle."""
+    mask = 2 ** 64 - 1
+    base = int(shingles.ROLLING_BASE)
+    hashes = []
+    for position in range(len(token_hashes) - size + 1):
+        value = 0
+        for token_hash in token_hashes[position:position + size]:
+            value = (value * base + token_hash) & mask
+        value ^= value >> 30
+        value = (value * 0xBF58476D1CE4E5B9) & mask
+        value ^= value >> 27
+        value = (value * 0x94D049BB133111EB) & mask
+        hashes.append(value ^ (value >> 31))
+    return hashes
+
+
+def python_winnow(hashes, window):
+    """`shingles.winnow`, robust winnowing, as a Python loop over the
+    windows."""
+    if len(hashes) <= window:
+        if not hashes:
+            return []
+        position = min(range(len(hashes)), key=lambda i: (hashes[i], -i))
+        return [(hashes[position], position)]
+
+    fingerprints = []
+    selected = -1
+    for start in range(len(hashes) - window + 1):
+        if selected < start:
+            selected = min(range(start, start + window), key=lambda i: (hashes[i], -i))
+            fingerprints.append((hashes[selected], selected))
+        elif hashes[start + window - 1] <= hashes[selected]:
+            selected = start + window - 1
+            fingerprints.append((hashes[selected], selected))
+    return fingerprints
+
+
+def benchmark_shingling(checker, options, stdout):
+    shingle_size = settings.PLAGIARISM_WINNOWING_SHINGLE_SIZE
+    window = settings.PLAGIARISM_WINNOWING_WINDOW
+
+    texts = synthetic_texts(max(options["sizes"]), words=options["words"], seed=options["seed"])
+    documents = checker.preprocess_many(texts)
+    stdout.write(f"{'docs':>6} {'step':>7} {'Python (s)':>11} {'NumPy (s)':>10} {'shingles/s':>12} {'speed-up':>9}")
+
+    for size in options["sizes"]:
+        sample = documents[:size]
+        token_hashes = [checker.vocabulary.term_hashes()[document.tokens].tolist() for document in sample]
+        count = sum(max(len(document) - shingle_size + 1, 0) for document in sample)
+
+        def row(step, python_time, numpy_time):
+            stdout.write(
+                f"{size:>6} {step:>7} {python_time:>11.3f} {numpy_time:>10.3f} "
+                f"{count / numpy_time:>12.0f} {python_time / numpy_time:>8.1f}x"
+            )
+
+        start = perf_counter()
+        [python_shingle_hashes(values, shingle_size) for values in token_hashes]
+        python_time = perf_counter() - start
+
+        start = perf_counter()
+        hashes = [document.shingle_hashes(shingle_size) for document in sample]
+        row("hash", python_time, perf_counter() - start)
+
+        python_hashes = [values.tolist() for values in hashes]
+        start = perf_counter()
+        [python_winnow(values, window) for values in python_hashes]
+        python_time = perf_counter() - start
+
+        start = perf_counter()
+        [shingles.winnow(values, window) for values in hashes]
+        row("winnow", python_time, perf_counter() - start)
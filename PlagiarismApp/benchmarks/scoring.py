@@ -0,0 +1,75 @@
+"""Time of scoring one text against its peers, and all pairs of an
+assignment, serially and over the process pool."""
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+from django.conf import settings
+from django.test.utils import override_settings
+from sklearn.preprocessing import normalize
+
+from ..services.join import blocked_pairs
+from ..services.synthetic import synthetic_texts
+
+
+def benchmark_scoring(checker, options, stdout):
+    stdout.write(f"{'peers':>8} {'pairwise (s)':>14} {'corpus (s)':>12} {'speed-up':>10}")
+
+    for size in options["sizes"]:
+        texts = synthetic_texts(size + 1, words=options["words"], seed=options["seed"])
+        text, peers = texts[0], texts[1:]
+
+        start = perf_counter()
+        for peer in peers:
+            checker.compare_texts(text, peer)
+        pairwise_time = perf_counter() - start
+
+        start = perf_counter()
+        checker.compare_with_corpus(text, peers)
+        corpus_time = perf_counter() - start
+
+        stdout.write(f"{size:>8} {pairwise_time:>14.3f} {corpus_time:>12.3f} {pairwise_time / corpus_time:>9.1f}x")
+
+
+def benchmark_batch(checker, options, stdout):
+    threshold = options["threshold"]
+    block_size = settings.PLAGIARISM_BATCH_BLOCK_SIZE
+
+    stdout.write(f"{'docs':>8} {'flagged':>8} {'vectorize (s)':>14} {'score (s)':>10} {'peak (MB)':>10}")
+
+    for size in options["sizes"]:
+        texts = synthetic_texts(size, words=options["words"], seed=options["seed"])
+        documents = checker.preprocess_many(texts)
+
+        start = perf_counter()
+        matrix = normalize(checker.vectorize_documents(documents).astype(np.float64), norm="l2")
+        vectorize_time = perf_counter() - start
+
+        tracemalloc.start()
+        start = perf_counter()
+        flagged = sum(len(rows) for rows, _, _ in blocked_pairs(matrix, threshold, block_size))
+        score_time = perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stdout.write(f"{size:>8} {flagged:>8} {vectorize_time:>14.3f} {score_time:>10.3f} {peak / 2 ** 20:>10.1f}")
+
+
+def benchmark_parallel(checker, options, stdout):
+    stdout.write(f"{'peers':>8} {'workers':>8} {'time (s)':>9} {'speed-up':>9}")
+
+    for size in options["sizes"]:
+        texts = synthetic_texts(size + 1, words=options["words"], seed=options["seed"])
+
+        start = perf_counter()
+        with override_settings(PLAGIARISM_WORKERS=1):
+            checker.compare_with_corpus(texts[0], texts[1:])
+        serial_time = perf_counter() - start
+        stdout.write(f"{size:>8} {1:>8} {serial_time:>9.3f} {1:>8.1f}x")
+
+        for workers in options["workers"]:
+            start = perf_counter()
+            with override_settings(PLAGIARISM_WORKERS=workers):
+                checker.compare_with_corpus(texts[0], texts[1:])
+            elapsed = perf_counter() - start
+            stdout.write(f"{size:>8} {workers:>8} {elapsed:>9.3f} {serial_time / elapsed:>8.1f}x")
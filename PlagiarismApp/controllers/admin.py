@@ -1,4 +1,5 @@
 from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
 from django.views.decorators.http import require_POST, require_GET
 from django.contrib import messages
 from django.shortcuts import render, redirect
@@ -12,9 +13,12 @@ from ..models import (
     CustomUser,
     Preferences,
     Student,
+    PlagiarismCheckRun,
 )
 from ..services.utils import ACADEMIC_YEAR
 from ..helpers.authenticated_roles import admin_required
+from datetime import timedelta
+import numpy as np
 
 
 @require_GET
@@ -313,3 +317,74 @@ def delete_lecturer(request):
         return JsonResponse({"message": "Lecturer does not exist"}, status=404)
     except Exception as e:
         return JsonResponse({"message": f"Failed to delete lecturer: {str(e)}"}, status=400)
+
+
+@require_GET
+@admin_required
+def check_latency(request):
+    """p50 and p95 queue wait and processing time of the plagiarism checks
+    of each course over the last `?days=` days (7 by default)."""
+    preferences = Preferences.objects.get(user=request.user)
+    try:
+        days = max(int(request.GET.get("days", 7)), 1)
+    except ValueError:
+        days = 7
+
+    runs = PlagiarismCheckRun.objects.filter(queued_at__gte=timezone.now() - timedelta(days=days))
+    stats = {}
+    for course_id, outcome, queued_at, started_at, finished_at, candidates, pairs in runs.values_list(
+        "course_id", "outcome", "queued_at", "started_at", "finished_at", "candidates_after", "pairs_scored"
+    ):
+        course = stats.setdefault(course_id, {
+            "runs": 0, "waiting": 0, "failed": 0, "waits": [], "processing": [], "candidates": [], "pairs": [],
+        })
+        course["runs"] += 1
+        course["waiting"] += outcome == "queued"
+        course["failed"] += outcome == "failed"
+        if started_at is not None:
+            course["waits"].append(max((started_at - queued_at).total_seconds(), 0))
+        if started_at is not None and finished_at is not None:
+            course["processing"].append((finished_at - started_at).total_seconds())
+        if candidates is not None:
+            course["candidates"].append(candidates)
+        if pairs is not None:
+            course["pairs"].append(pairs)
+
+    def percentiles(values):
+        if not values:
+            return None, None
+        p50, p95 = np.percentile(values, [50, 95])
+        return round(p50, 2), round(p95, 2)
+
+    courses = Course.objects.in_bulk(list(stats))
+    latency = []
+    for course_id, course in stats.items():
+        wait_p50, wait_p95 = percentiles(course["waits"])
+        processing_p50, processing_p95 = percentiles(course["processing"])
+        latency.append({
+            "course": courses[course_id],
+            "runs": course["runs"],
+            "waiting": course["waiting"],
+            "failed": course["failed"],
+            "wait_p50": wait_p50,
+            "wait_p95": wait_p95,
+            "processing_p50": processing_p50,
+            "processing_p95": processing_p95,
+            "candidates": round(np.mean(course["candidates"])) if course["candidates"] else None,
+            "pairs": round(np.mean(course["pairs"])) if course["pairs"] else None,
+        })
+    latency.sort(key=lambda row: row["wait_p95"] or 0, reverse=True)
+
+    return render(
+        request,
+        "admin/check_latency.html",
+        {
+            "title": "e-Classroom: Plagiarism Check Latency",
+            "admin": True,
+            "data": {
+                "days": days,
+                "latency": latency,
+                "preferences": preferences,
+            },
+        },
+    )
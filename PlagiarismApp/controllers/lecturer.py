@@ -1,8 +1,10 @@
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST, require_GET
 from django.http import JsonResponse
+from django.db.models import F
 from django.utils import timezone
 from django.utils.encoding import smart_str
 from ..models import (
@@ -14,14 +16,15 @@ from ..models import (
     Lecturer,
     Submission,
     Preferences,
-    PlagiarismReport,
-    Notification
+    SimilarityEdge,
 )
+from ..services import blobs
 from ..services.utils import ACADEMIC_YEAR, HTMLToPdf
 from ..helpers.authenticated_roles import lecturer_required
+from ..tasks import notify_course_students, schedule_plagiarism_check
 from datetime import datetime
+from kombu.exceptions import OperationalError as BrokerError
 from uuid import uuid4
-import base64
 
 
 
@@ -129,23 +132,26 @@ def create_assignment(request):
         assignment_course = Course.objects.get(id=assignment_course_id)
 
         if assignment_file:
-            assignment_file_data = base64.b64encode(assignment_file.read())
+            file_sha256, file_size = blobs.put_upload(assignment_file)
             assignment = Assignment.objects.create(
                 title=assignment_title,
                 total=int(assignment_total),
                 due_date=input_date,
-                file=assignment_file_data,
+                file_sha256=file_sha256,
+                file_size=file_size,
                 is_group_assignment=is_group_assignment,
                 plagiarism_checker=plagiarism_checker,
                 course=assignment_course,
                 lecturer=Lecturer.objects.get(user=request.user),
             )
         else:
+            file_sha256, file_size = blobs.put(HTMLToPdf(assignment_content))
             assignment = Assignment.objects.create(
                 title=assignment_title,
                 total=int(assignment_total),
                 due_date=input_date,
-                file=HTMLToPdf(assignment_content),
+                file_sha256=file_sha256,
+                file_size=file_size,
                 is_group_assignment=is_group_assignment,
                 plagiarism_checker=plagiarism_checker,
                 course=assignment_course,
@@ -155,15 +161,12 @@ def create_assignment(request):
         # Send notification to all students enrolled in the course
         programs = Program.objects.filter(course=assignment_course)
         if programs.exists():
-            students = Student.objects.filter(program__in=programs)
-            for student in students:
-                Notification.objects.create(
-                    recipient=student.user,
-                    sender=request.user,
-                    message=f"A new assignment has been created: {assignment.title}",
-                    link=f"/student/assignments/{assignment_course.code}/{assignment.id}/",
-                    notification_type='green'
-                )
+            notify_course_students.delay(
+                assignment_course.id,
+                request.user.id,
+                f"A new assignment has been created: {assignment.title}",
+                f"/student/assignments/{assignment_course.code}/{assignment.id}/",
+            )
         else:
             return JsonResponse({"message": "No programs associated with the course"}, status=400)
 
@@ -186,6 +189,18 @@ def get_all_submissions(request):
     submissions = Submission.objects.filter(assignment__in=assignments)
     preferences = Preferences.objects.get(user=request.user)
 
+    # ?min_similarity=<percent> keeps submissions scoring at least that much,
+    # ?sort=similarity lists the highest scores first
+    min_similarity = request.GET.get("min_similarity", "")
+    if min_similarity:
+        try:
+            submissions = submissions.filter(max_similarity__gte=float(min_similarity))
+        except ValueError:
+            min_similarity = ""
+    sort = request.GET.get("sort", "")
+    if sort == "similarity":
+        submissions = submissions.order_by(F("max_similarity").desc(nulls_last=True))
+
     return render(
         request,
         "lecturer/submissions.html",
@@ -194,7 +209,8 @@ def get_all_submissions(request):
             "data": {
                 "submissions": submissions,
                 "preferences": preferences,
-                "with_id": uuid4()
+                "with_id": uuid4(),
+                "filters": {"sort": sort, "min_similarity": min_similarity},
             },
         },
     )
@@ -206,18 +222,10 @@ def get_submission_with_id(request, submission_id: str):
     submission = Submission.objects.filter(id=submission_id).first()
     submission_status = SubmissionStatus.objects.get(submission=submission)
     preferences: Preferences = Preferences.objects.get(user=request.user)
-    report = PlagiarismReport.objects.filter(submission=submission).first()
-
-    if report is not None:
-        # Sort the list based on the similarity_percentage in descending order
-        sorted_results = sorted(report.similarity_results, key=lambda x: x['similarity_percentage'], reverse=True)
-
-        # Slice the list to contain only the item with the highest similarity percentage
-        highest_similarity_result = sorted_results[:1]
 
     try:
-        plagiarism_percentage = round(highest_similarity_result[0]['similarity_percentage'], 2)
-    except:
+        plagiarism_percentage = round(submission.max_similarity or 0, 2)
+    except AttributeError:
         plagiarism_percentage = 0
 
     return render(
@@ -241,34 +249,26 @@ def get_submission_with_id(request, submission_id: str):
 def get_plagiarism_report_for_submission(request, submission_id: int):
     submission = get_object_or_404(Submission, id=submission_id)
     preferences = get_object_or_404(Preferences, user=request.user)
-    report = PlagiarismReport.objects.filter(submission=submission).first()
-    
+    edges = (
+        SimilarityEdge.objects.filter(submission=submission)
+        .select_related("other_submission__student__user")
+        .order_by("-score")
+    )
+
     highest_similarity_submission = None  # Initialize variable to store highest similarity submission
     highest_similarity_percentage = None  # Initialize variable to store highest similarity percentage
     sources = []  # Initialize sources list
 
-    if report is not None:
-        # Sort the list based on the similarity_percentage in descending order
-        sorted_results = sorted(report.similarity_results, key=lambda x: x['similarity_percentage'], reverse=True)
-
-        # Get the highest similarity result
-        highest_similarity_result = sorted_results[0]
-
-        # Retrieve the submission instance of the highest similarity score
-        highest_similarity_submission = get_object_or_404(Submission, id=highest_similarity_result['other_submission_id'])
-
-        # Retrieve the similarity percentage of the highest similarity result
-        highest_similarity_percentage = highest_similarity_result['similarity_percentage']
-
-        # Extract other_submission_ids and their similarity percentages from all similarity results
-        for result in sorted_results:
-            other_submission_id = result['other_submission_id']
-            similarity_percentage = result['similarity_percentage']
-            submission_obj = get_object_or_404(Submission, id=other_submission_id)
-            sources.append({
-                'submission': submission_obj,
-                'percentage': round(similarity_percentage, 2)
-            })
+    # One indexed query on (submission, -score), highest score first
+    for edge in edges:
+        if highest_similarity_submission is None:
+            highest_similarity_submission = edge.other_submission
+            highest_similarity_percentage = edge.score
+        sources.append({
+            'submission': edge.other_submission,
+            'percentage': round(edge.score, 2),
+            'passages': edge.passages,
+        })
 
     return render(
         request,
@@ -288,6 +288,32 @@ def get_plagiarism_report_for_submission(request, submission_id: int):
 
 
 
+@lecturer_required
+@require_POST
+def recheck_submission(request, submission_id: str):
+    try:
+        # Only submissions to the lecturer's own courses
+        submission = Submission.objects.select_related("assignment", "student").get(
+            id=submission_id,
+            assignment__course__lecturers=Lecturer.objects.get(user=request.user),
+        )
+    except (Submission.DoesNotExist, ValidationError):
+        return JsonResponse({"message": "Submission not found"}, status=404)
+
+    try:
+        schedule_plagiarism_check(
+            submission.assignment.course_id,
+            submission.assignment,
+            submission.id,
+            submission.student.user_id,
+            submission.sha256,
+            priority=True,
+        )
+    except BrokerError:
+        return JsonResponse({"message": "The check could not be queued, try again later"}, status=503)
+    return JsonResponse({"message": "Plagiarism check queued"}, status=200)
+
+
 @lecturer_required
 @require_POST
 def return_assignment(request, submission_id: str):
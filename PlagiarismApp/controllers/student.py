@@ -9,13 +9,16 @@ from ..models import (
     SubmissionStatus,
     Preferences,
     Submission,
+    SubmissionText,
+    Fingerprint,
+    SubmissionVector,
     Notification
 )
+from ..services import blobs
 from ..services.utils import ACADEMIC_YEAR
-from ..tasks import check_for_plagiarism
+from ..tasks import schedule_plagiarism_check
 from ..helpers.authenticated_roles import student_required
 import uuid
-import base64
 
 notifications = [
     {
@@ -409,7 +412,7 @@ def submit_assignment(request, course_code: str, assignment_id: uuid):
             if not upload:
                 return JsonResponse({"message": "No file attached"}, status=400)
 
-            upload_data = base64.b64encode(upload.read())
+            upload_hash, upload_size = blobs.put_upload(upload)
 
             student = Student.objects.get(user=request.user)
 
@@ -420,17 +423,21 @@ def submit_assignment(request, course_code: str, assignment_id: uuid):
 
             if old_submission.exists():
                 latest_submission = old_submission.first()
-                old_submission.update(file=upload_data)
+                SubmissionText.objects.filter(submission__in=old_submission).delete()
+                Fingerprint.objects.filter(submission__in=old_submission).delete()
+                SubmissionVector.objects.filter(submission__in=old_submission).delete()
+                old_submission.update(sha256=upload_hash, size=upload_size)
 
                 if assignment.plagiarism_checker:
-                    check_for_plagiarism.apply_async(args=(course.id, latest_submission.id, request.user.id), countdown=3)
+                    schedule_plagiarism_check(course.id, assignment, latest_submission.id, request.user.id, upload_hash)
 
                 return JsonResponse(
                     {"message": "Assignment re-submitted successfully"}, status=200
                 )
 
             submission = Submission.objects.create(
-                file=upload_data,
+                sha256=upload_hash,
+                size=upload_size,
                 assignment=assignment,
                 student=student,
             )
@@ -438,7 +445,7 @@ def submit_assignment(request, course_code: str, assignment_id: uuid):
             _ = SubmissionStatus.objects.create(submission=submission)
 
             if assignment.plagiarism_checker:
-                check_for_plagiarism.apply_async(args=(course.id, submission.id, request.user.id), countdown=5)
+                schedule_plagiarism_check(course.id, assignment, submission.id, request.user.id, upload_hash)
 
             return JsonResponse(
                 {"message": "Assignment submitted successfully"}, status=200
@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from PlagiarismApp.benchmarks import accuracy, checker, corpus, extraction, preprocessing, scoring
+from PlagiarismApp.services.utils import PlagiarismCheckerService
+
+# Each suite takes a checker without a course, the options and the output
+SUITES = {
+    "scoring": scoring.benchmark_scoring,
+    "batch": scoring.benchmark_batch,
+    "extraction": extraction.benchmark_extraction,
+    "parallel": scoring.benchmark_parallel,
+    "preprocessing": preprocessing.benchmark_preprocessing,
+    "documents": preprocessing.benchmark_documents,
+    "shingling": preprocessing.benchmark_shingling,
+    "vectors": preprocessing.benchmark_vectors,
+    "corpus": corpus.benchmark_corpus,
+    "microbatch": corpus.benchmark_microbatch,
+    "uploads": corpus.benchmark_uploads,
+    "checker": checker.benchmark_checker,
+    "accuracy": accuracy.benchmark_accuracy,
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the plagiarism checker on synthetic courses"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "suite",
+            choices=list(SUITES),
+            help="scoring: pairwise vs corpus scoring time by course size; "
+            "batch: blocked all-pairs scoring time and memory by assignment size; "
+            "extraction: time and peak memory of PDF text extraction; "
+            "parallel: process-pool speed-up of corpus scoring over the serial path; "
+            "preprocessing: tokens per second on the Python documentation with a "
+            "cold and a warm stem cache; "
+            "documents: memory per document and vectorizing time of stem strings "
+            "against token-ID documents; "
+            "shingling: shingles per second of NumPy hashing and winnowing "
+            "against Python loops; "
+            "vectors: time to build the term matrix from stored feature vectors "
+            "against preprocessing the texts; "
+            "corpus: private memory and time per check of a matrix built in each "
+            "worker against the memory-mapped course corpus; "
+            "microbatch: time per upload of a deadline burst checked one by one "
+            "against one micro-batch, each scoring the uploads stored so far beside "
+            "the published corpus; "
+            "uploads: time per check of a sequence of uploads to a course made by "
+            "generate_corpus with the memory-mapped corpus, publishes included, "
+            "against the matrix built in memory; "
+            "checker: time of each checker step and of a full check on courses made "
+            "by generate_corpus; "
+            "accuracy: precision and recall of each engine against compare_texts on a "
+            "course made by generate_corpus, with its throughput, memory and index size",
+        )
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10, 50, 100, 300])
+        parser.add_argument("--words", type=int, default=1500)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=settings.PLAGIARISM_SIMILARITY_THRESHOLD,
+            help="Similarity threshold for the batch suite",
+        )
+        parser.add_argument("--pages", type=int, default=250, help="Pages of the generated thesis")
+        parser.add_argument("--pdf", help="Measure extraction of this PDF instead of a generated one")
+        parser.add_argument("--workers", nargs="+", type=int, default=[2, 4], help="Pool sizes of the parallel suite")
+        parser.add_argument(
+            "--burst", type=int, default=50, help="Uploads of the microbatch suite's burst and of the uploads suite"
+        )
+        parser.add_argument(
+            "--courses",
+            nargs="+",
+            default=["SYN100", "SYN1000", "SYN10000"],
+            help="Courses of the checker and uploads suites",
+        )
+        parser.add_argument("--sample", type=int, default=20, help="Submissions the checker suite times each step on")
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Delete the stored texts and vectors of each course first, so that its first check extracts all",
+        )
+        parser.add_argument(
+            "--labels", help="Labels written by generate_corpus of the course the accuracy suite checks"
+        )
+        parser.add_argument(
+            "--engines",
+            nargs="+",
+            choices=list(accuracy.ENGINES),
+            default=[engine for engine in accuracy.ENGINES if engine != "pairwise"],
+            help="Engines of the accuracy suite; pairwise runs compare_texts on every pair and is left out by default",
+        )
+        parser.add_argument("--json", help="Also write the checker or accuracy suite's results to this file")
+
+    def handle(self, *args, **options):
+        course_checker = PlagiarismCheckerService(course_id=None, submission_id=None, student_id=None)
+        SUITES[options["suite"]](course_checker, options, self.stdout)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from PlagiarismApp.models import Assignment
+from PlagiarismApp.services.utils import AssignmentPlagiarismService
+
+
+class Command(BaseCommand):
+    help = "Runs the all-pairs plagiarism check for one assignment"
+
+    def add_arguments(self, parser):
+        parser.add_argument("assignment_id")
+
+    def handle(self, *args, **options):
+        assignment_id = options["assignment_id"]
+        if not Assignment.objects.filter(id=assignment_id).exists():
+            raise CommandError(f"Assignment {assignment_id} does not exist")
+
+        checker = AssignmentPlagiarismService(assignment_id=assignment_id)
+        checker.compare_all_pairs()
+        result = checker.store_similarity_results()
+
+        self.stdout.write(self.style.SUCCESS(result["message"]))
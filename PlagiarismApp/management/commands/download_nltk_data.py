@@ -0,0 +1,17 @@
+import nltk
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+NLTK_PACKAGES = ["punkt", "stopwords"]
+
+
+class Command(BaseCommand):
+    help = "Downloads the NLTK data used by the plagiarism checker into PLAGIARISM_NLTK_DATA"
+
+    def handle(self, *args, **options):
+        data_dir = settings.PLAGIARISM_NLTK_DATA
+        for package in NLTK_PACKAGES:
+            if not nltk.download(package, download_dir=data_dir, quiet=True):
+                raise CommandError(f"Could not download {package} into {data_dir}")
+
+        self.stdout.write(self.style.SUCCESS(f"NLTK data ready in {data_dir}"))
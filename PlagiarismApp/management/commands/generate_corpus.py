@@ -0,0 +1,140 @@
+import json
+import os
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from PlagiarismApp.models import (
+    Assignment,
+    Course,
+    CustomUser,
+    Department,
+    Lecturer,
+    Student,
+    Submission,
+    SubmissionStatus,
+)
+from PlagiarismApp.services import blobs
+from PlagiarismApp.services.synthetic import KINDS, synthetic_submissions, text_pdf
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Creates a course with one assignment and N synthetic PDF submissions of known overlap"
+
+    def add_arguments(self, parser):
+        parser.add_argument("submissions", type=int)
+        parser.add_argument("--course-code", help="Code of the created course, SYN<submissions> by default")
+        parser.add_argument("--words", type=int, default=1500, help="Words per submission")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--copies", type=float, default=0.05, help="Share of exact copies")
+        parser.add_argument("--paraphrases", type=float, default=0.1, help="Share of word-swapped paraphrases")
+        parser.add_argument("--partials", type=float, default=0.1, help="Share of essays with a pasted passage")
+        parser.add_argument("--swap-rate", type=float, default=0.15, help="Share of words a paraphrase replaces")
+        parser.add_argument("--passage", type=float, default=0.3, help="Share of the source a partial copy pastes")
+        parser.add_argument("--labels", help="Write the kind and source of every submission to this JSON file")
+        parser.add_argument("--pdf-dir", help="Also write every generated PDF to this directory")
+
+    def handle(self, *args, **options):
+        count = options["submissions"]
+        code = options["course_code"] or f"SYN{count}"
+        if count < 1:
+            raise CommandError("Generate at least one submission")
+        if options["copies"] + options["paraphrases"] + options["partials"] > 1:
+            raise CommandError("The shares of copies, paraphrases and partials add up to more than 1")
+        if Course.objects.filter(code=code).exists():
+            raise CommandError(f"Course {code} already exists")
+
+        essays = synthetic_submissions(
+            count,
+            words=options["words"],
+            copies=options["copies"],
+            paraphrases=options["paraphrases"],
+            partials=options["partials"],
+            swap_rate=options["swap_rate"],
+            passage=options["passage"],
+            seed=options["seed"],
+        )
+        if options["pdf_dir"]:
+            os.makedirs(options["pdf_dir"], exist_ok=True)
+
+        with transaction.atomic():
+            department, _ = Department.objects.get_or_create(name="Synthetic")
+            lecturer = Lecturer.objects.create(
+                employee_id=f"E/{code}",
+                department=department,
+                user=CustomUser.objects.create(
+                    username=f"E/{code}", password=make_password(None), is_staff=True
+                ),
+            )
+            course = Course.objects.create(name=f"Synthetic corpus {code}", code=code, credits="0", semester="I")
+            course.lecturers.add(lecturer)
+            assignment = Assignment.objects.create(
+                title=f"Synthetic essays {code}",
+                total=100,
+                due_date=timezone.now() + timedelta(days=7),
+                course=course,
+                lecturer=lecturer,
+                # Checked by the benchmarks, not by the deadline batch run
+                plagiarism_checker=False,
+            )
+
+            submission_ids = []
+            for start in range(0, count, BATCH_SIZE):
+                batch = essays[start:start + BATCH_SIZE]
+                numbers = range(start, start + len(batch))
+                users = CustomUser.objects.bulk_create([
+                    CustomUser(username=f"S/{code}/{number:05d}", password=make_password(None))
+                    for number in numbers
+                ])
+                students = Student.objects.bulk_create([
+                    Student(registration_number=user.username, user=user) for user in users
+                ])
+
+                submissions = []
+                for number, student, essay in zip(numbers, students, batch):
+                    pdf = text_pdf(essay["text"])
+                    if options["pdf_dir"]:
+                        with open(os.path.join(options["pdf_dir"], f"{number:05d}.pdf"), "wb") as file:
+                            file.write(pdf)
+                    sha256, size = blobs.put(pdf)
+                    submissions.append(Submission(
+                        sha256=sha256,
+                        size=size,
+                        assignment=assignment,
+                        student=student,
+                    ))
+                Submission.objects.bulk_create(submissions)
+                # As submit_assignment does, for the lecturer's marking views
+                SubmissionStatus.objects.bulk_create([
+                    SubmissionStatus(submission=submission) for submission in submissions
+                ])
+                submission_ids.extend(submission.id for submission in submissions)
+                self.stdout.write(f"{start + len(batch)} of {count} submissions created")
+
+        if options["labels"]:
+            labels = {
+                "course_id": course.id,
+                "course_code": code,
+                "assignment_id": str(assignment.id),
+                "submissions": [
+                    {
+                        "submission_id": str(submission_id),
+                        "kind": essay["kind"],
+                        "source_id": None if essay["source"] is None else str(submission_ids[essay["source"]]),
+                    }
+                    for submission_id, essay in zip(submission_ids, essays)
+                ],
+            }
+            with open(options["labels"], "w") as file:
+                json.dump(labels, file, indent=2)
+
+        kinds = {kind: sum(essay["kind"] == kind for essay in essays) for kind in KINDS}
+        self.stdout.write(self.style.SUCCESS(
+            f"Course {code} (id {course.id}) created with {count} submissions: "
+            + ", ".join(f"{number} {kind}" for kind, number in kinds.items())
+        ))
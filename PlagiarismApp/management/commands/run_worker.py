@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from PlagiarismChecker.celery import app
+
+
+class Command(BaseCommand):
+    help = "Starts a Celery worker for one queue with the settings of PLAGIARISM_WORKER_QUEUES"
+
+    def add_arguments(self, parser):
+        parser.add_argument("queue", choices=list(settings.PLAGIARISM_WORKER_QUEUES))
+        parser.add_argument("--loglevel", default="info")
+
+    def handle(self, *args, **options):
+        queue = options["queue"]
+        config = settings.PLAGIARISM_WORKER_QUEUES[queue]
+
+        argv = [
+            "worker",
+            f"--loglevel={options['loglevel']}",
+            f"--queues={queue}",
+            f"--hostname={queue}@%h",
+            f"--concurrency={config['concurrency']}",
+            f"--prefetch-multiplier={config['prefetch_multiplier']}",
+        ]
+        if config["max_tasks_per_child"]:
+            argv.append(f"--max-tasks-per-child={config['max_tasks_per_child']}")
+        if config["max_memory_per_child"]:
+            argv.append(f"--max-memory-per-child={config['max_memory_per_child']}")
+
+        app.worker_main(argv)
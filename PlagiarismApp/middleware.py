@@ -4,6 +4,10 @@ from django.utils.deprecation import MiddlewareMixin
 
 class AuthenticationEnforcementMiddleware(MiddlewareMixin):
     def process_request(self, request):
+        # Scraped by Prometheus, which has no session
+        if request.path == reverse('metrics'):
+            return None
+
         if request.user.is_authenticated:
             # Redirect authenticated users away from login and forgot password pages
             if request.path in [reverse('login'), reverse('forgot_password'), reverse('register')]:
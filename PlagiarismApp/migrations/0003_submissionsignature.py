@@ -0,0 +1,26 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PlagiarismApp', '0002_submissiontext'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionSignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('num_perm', models.IntegerField()),
+                ('shingle_size', models.IntegerField()),
+                ('hashvalues', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='signature', to='PlagiarismApp.submission')),
+            ],
+        ),
+    ]
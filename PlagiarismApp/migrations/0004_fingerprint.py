@@ -0,0 +1,27 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PlagiarismApp', '0003_submissionsignature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.BigIntegerField()),
+                ('position', models.IntegerField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='PlagiarismApp.course')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='PlagiarismApp.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', 'hash'], name='PlagiarismA_course__0c7a65_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PlagiarismApp', '0004_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='batch_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
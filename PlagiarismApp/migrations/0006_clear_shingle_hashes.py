@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def clear_shingle_hashes(apps, schema_editor):
+    """Drop the fingerprints and MinHash signatures hashed with blake2b
+    shingle strings; checks rebuild them with the rolling hash."""
+    apps.get_model('PlagiarismApp', 'Fingerprint').objects.all().delete()
+    apps.get_model('PlagiarismApp', 'SubmissionSignature').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PlagiarismApp', '0005_assignment_batch_checked_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_shingle_hashes, migrations.RunPython.noop),
+    ]
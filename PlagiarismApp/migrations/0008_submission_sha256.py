@@ -0,0 +1,46 @@
+# Generated by Django 5.0.3 on 2026-10-18 10:16
+
+import base64
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_submissions(apps, schema_editor):
+    """Fill in the SHA-256 of the files submitted before it was stored."""
+    Submission = apps.get_model('PlagiarismApp', 'Submission')
+    submissions = Submission.objects.filter(sha256__isnull=True, file__isnull=False).only('id', 'file')
+    hashed = []
+    for submission in submissions.iterator(chunk_size=100):
+        submission.sha256 = hashlib.sha256(base64.b64decode(submission.file)).hexdigest()
+        hashed.append(submission)
+        if len(hashed) == 100:
+            Submission.objects.bulk_update(hashed, ['sha256'])
+            hashed = []
+    Submission.objects.bulk_update(hashed, ['sha256'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PlagiarismApp', '0007_submissionvector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='sha256',
+            field=models.CharField(db_index=True, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='submissiontext',
+            name='content_hash',
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='submissionvector',
+            name='content_hash',
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+        migrations.RunPython(hash_submissions, migrations.RunPython.noop),
+    ]
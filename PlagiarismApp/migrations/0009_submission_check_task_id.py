@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PlagiarismApp', '0008_submission_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='check_task_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.0.3 on 2026-10-18 10:20
+
+import django.db.models.deletion
+import json.encoder
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def copy_reports_to_edges(apps, schema_editor):
+    """Create the edges of the results stored in plagiarism reports and the
+    maximum score of every submission that has any."""
+    Submission = apps.get_model('PlagiarismApp', 'Submission')
+    PlagiarismReport = apps.get_model('PlagiarismApp', 'PlagiarismReport')
+    SimilarityEdge = apps.get_model('PlagiarismApp', 'SimilarityEdge')
+
+    submission_ids = {str(submission_id) for submission_id in Submission.objects.values_list('id', flat=True)}
+    edges = {}
+    for report in PlagiarismReport.objects.all().iterator():
+        submission_id = str(report.submission_id)
+        for result in report.similarity_results:
+            other_id = result.get('other_submission_id')
+            if other_id in submission_ids and other_id != submission_id:
+                edges[submission_id, other_id] = SimilarityEdge(
+                    submission_id=submission_id,
+                    other_submission_id=other_id,
+                    score=result['similarity_percentage'],
+                    passages=result.get('passages', []),
+                    engine_version='',
+                )
+    SimilarityEdge.objects.bulk_create(edges.values(), batch_size=500)
+
+    Submission.objects.update(
+        max_similarity=Subquery(
+            SimilarityEdge.objects.filter(submission=OuterRef('pk'))
+            .values('submission')
+            .annotate(max_score=Max('score'))
+            .values('max_score')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PlagiarismApp', '0009_submission_check_task_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='max_similarity',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SimilarityEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('passages', models.JSONField(default=list, encoder=json.encoder.JSONEncoder)),
+                ('engine_version', models.CharField(max_length=32)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('other_submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_similarity_edges', to='PlagiarismApp.submission')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_edges', to='PlagiarismApp.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['submission', '-score'], name='PlagiarismA_submiss_f37bc8_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similarityedge',
+            constraint=models.UniqueConstraint(fields=('submission', 'other_submission'), name='unique_similarity_edge'),
+        ),
+        migrations.RunPython(copy_reports_to_edges, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.3 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PlagiarismApp', '0010_similarityedge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlagiarismCheckRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(max_length=255, unique=True)),
+                ('engine', models.CharField(blank=True, max_length=64)),
+                ('outcome', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('superseded', 'Superseded'), ('discarded', 'Discarded'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('queued_at', models.DateTimeField()),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('candidates_before', models.IntegerField(blank=True, null=True)),
+                ('candidates_after', models.IntegerField(blank=True, null=True)),
+                ('pairs_scored', models.IntegerField(blank=True, null=True)),
+                ('bytes_extracted', models.BigIntegerField(default=0)),
+                ('assignment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='check_runs', to='PlagiarismApp.assignment')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plagiarism_check_runs', to='PlagiarismApp.course')),
+                ('submission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='check_runs', to='PlagiarismApp.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', 'queued_at'], name='PlagiarismA_course__69f8b6_idx')],
+            },
+        ),
+    ]
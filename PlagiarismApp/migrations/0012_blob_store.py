@@ -0,0 +1,120 @@
+# Generated by Django 5.0.3 on 2026-10-18 11:07
+
+import base64
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import migrations, models
+
+# (model, base64 field, hash field, size field) of every file moved
+BLOB_FIELDS = [
+    ('Submission', 'file', 'sha256', 'size'),
+    ('Assignment', 'file', 'file_sha256', 'file_size'),
+    ('CustomUser', 'image', 'image_sha256', None),
+]
+
+
+def blob_path(sha256):
+    return os.path.join(settings.BLOB_STORE_DIR, sha256[:2], sha256[2:4], sha256)
+
+
+def put_blob(data):
+    """Store a file under the SHA-256 of its bytes, as the blob store does
+    as of this migration, and return its (SHA-256, size)."""
+    sha256 = hashlib.sha256(data).hexdigest()
+    destination = blob_path(sha256)
+    if not os.path.exists(destination):
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(prefix='tmp-', dir=settings.BLOB_STORE_DIR)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, destination)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+    return sha256, len(data)
+
+
+def move_to_blob_store(apps, schema_editor):
+    """Write every base64 file and image into the blob store, leaving its
+    hash and size on the row."""
+    for model_name, field, hash_field, size_field in BLOB_FIELDS:
+        Model = apps.get_model('PlagiarismApp', model_name)
+        rows = Model.objects.filter(**{f'{field}__isnull': False}).only('pk', field)
+        updated_fields = [hash_field, size_field] if size_field else [hash_field]
+        moved = []
+        for row in rows.iterator(chunk_size=100):
+            sha256, size = put_blob(base64.b64decode(getattr(row, field)))
+            setattr(row, hash_field, sha256)
+            if size_field:
+                setattr(row, size_field, size)
+            moved.append(row)
+            if len(moved) == 100:
+                Model.objects.bulk_update(moved, updated_fields)
+                moved = []
+        Model.objects.bulk_update(moved, updated_fields)
+
+
+def move_to_database(apps, schema_editor):
+    """Read the stored files back into their base64 fields."""
+    for model_name, field, hash_field, _ in BLOB_FIELDS:
+        Model = apps.get_model('PlagiarismApp', model_name)
+        rows = Model.objects.filter(**{f'{hash_field}__isnull': False}).only('pk', hash_field)
+        moved = []
+        for row in rows.iterator(chunk_size=100):
+            with open(blob_path(getattr(row, hash_field)), 'rb') as file:
+                setattr(row, field, base64.b64encode(file.read()))
+            moved.append(row)
+            if len(moved) == 100:
+                Model.objects.bulk_update(moved, [field])
+                moved = []
+        Model.objects.bulk_update(moved, [field])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PlagiarismApp', '0011_plagiarismcheckrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='file_sha256',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='file_size',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='image_sha256',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='size',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(move_to_blob_store, move_to_database),
+        migrations.RemoveField(
+            model_name='assignment',
+            name='file',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='image',
+        ),
+        migrations.RemoveField(
+            model_name='submission',
+            name='file',
+        ),
+    ]
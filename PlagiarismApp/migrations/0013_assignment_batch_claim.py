@@ -0,0 +1,23 @@
+# Generated by Django 5.0.3 on 2026-10-18 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PlagiarismApp', '0012_blob_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='batch_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='batch_task_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.0.3 on 2026-10-18 11:42
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PlagiarismApp', '0013_assignment_batch_claim'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='PlagiarismReport',
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.0.3 on 2026-10-18 12:07
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PlagiarismApp', '0014_delete_plagiarismreport'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='SubmissionSignature',
+        ),
+    ]
@@ -9,7 +9,8 @@ class CustomUser(AbstractUser):
     bio = models.TextField(null=True, blank=True)
     dob = models.DateField(null=True, blank=True)
     phone = models.CharField(max_length=25, null=True, blank=True)
-    image = models.BinaryField(null=True)
+    # SHA-256 of the profile image in the blob store
+    image_sha256 = models.CharField(max_length=64, null=True, blank=True)
     
     class Meta(AbstractUser.Meta):
         # Override the Meta class of AbstractUser
@@ -104,9 +105,15 @@ class Assignment(models.Model):
     total = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
     due_date = models.DateTimeField()
-    file = models.BinaryField(null=True)
+    # SHA-256 and size of the assignment's PDF in the blob store
+    file_sha256 = models.CharField(max_length=64, null=True)
+    file_size = models.BigIntegerField(null=True)
     is_group_assignment = models.BooleanField(default=False)
     plagiarism_checker = models.BooleanField(default=True)
+    batch_checked_at = models.DateTimeField(null=True, blank=True)
+    # Batch check run holding the assignment, and when it claimed it
+    batch_task_id = models.CharField(max_length=255, null=True, blank=True)
+    batch_claimed_at = models.DateTimeField(null=True, blank=True)
 
     course = models.ForeignKey(
         Course, on_delete=models.CASCADE, related_name="assignments"
@@ -131,7 +138,14 @@ class GroupAssignment(models.Model):
 class Submission(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     date_submitted = models.DateTimeField(auto_now_add=True)
-    file = models.BinaryField(null=True)
+    # SHA-256 and size of the submitted PDF in the blob store, shared by
+    # byte-identical uploads
+    sha256 = models.CharField(max_length=64, null=True, db_index=True)
+    size = models.BigIntegerField(null=True)
+    # Celery task id of the one check allowed to report on this submission
+    check_task_id = models.CharField(max_length=255, null=True, blank=True)
+    # Highest score of the submission's similarity edges, None before any
+    max_similarity = models.FloatField(null=True, blank=True, db_index=True)
     assignment = models.ForeignKey(
         Assignment, on_delete=models.CASCADE, related_name="submissions"
     )
@@ -156,16 +170,115 @@ class SubmissionStatus(models.Model):
         return self.status
 
 
+class SubmissionText(models.Model):
+    content_hash = models.CharField(max_length=64, db_index=True)
+    text = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    submission = models.OneToOneField(
+        Submission, on_delete=models.CASCADE, related_name="extracted_text"
+    )
+
+    def __str__(self):
+        return f"Extracted text for Submission: {self.submission_id}"
+
+
+class SubmissionVector(models.Model):
+    content_hash = models.CharField(max_length=64, db_index=True)
+    engine_version = models.CharField(max_length=32)
+    vector = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    submission = models.OneToOneField(
+        Submission, on_delete=models.CASCADE, related_name="vector"
+    )
+
+    def __str__(self):
+        return f"Feature vector for Submission: {self.submission_id}"
 
-class PlagiarismReport(models.Model):
-    similarity_results = models.JSONField(encoder=JSONEncoder)
 
+class Fingerprint(models.Model):
+    hash = models.BigIntegerField()
+    position = models.IntegerField()
+
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="fingerprints"
+    )
     submission = models.ForeignKey(
-        Submission, on_delete=models.CASCADE, related_name="plagiarism_reports"
+        Submission, on_delete=models.CASCADE, related_name="fingerprints"
     )
 
+    class Meta:
+        indexes = [models.Index(fields=["course", "hash"])]
+
+
+class SimilarityEdge(models.Model):
+    """One direction of a pair of submissions scoring above the threshold.
+    Every pair is stored in both directions."""
+
+    score = models.FloatField()
+    passages = models.JSONField(encoder=JSONEncoder, default=list)
+    engine_version = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    submission = models.ForeignKey(
+        Submission, on_delete=models.CASCADE, related_name="similarity_edges"
+    )
+    other_submission = models.ForeignKey(
+        Submission, on_delete=models.CASCADE, related_name="incoming_similarity_edges"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["submission", "other_submission"], name="unique_similarity_edge"),
+        ]
+        indexes = [models.Index(fields=["submission", "-score"])]
+
+    def __str__(self):
+        return f"Similarity of Submission {self.submission_id} to {self.other_submission_id}"
+
+
+class PlagiarismCheckRun(models.Model):
+    """One queued plagiarism check, from when it became due to its outcome."""
+
+    outcome_choices = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("superseded", "Superseded"),
+        ("discarded", "Discarded"),
+        ("failed", "Failed"),
+    ]
+
+    task_id = models.CharField(max_length=255, unique=True)
+    engine = models.CharField(max_length=64, blank=True)
+    outcome = models.CharField(max_length=20, choices=outcome_choices, default="queued")
+    # Due after the upload's check delay; micro-batched checks are due at
+    # upload, so their queue wait includes the batching window
+    queued_at = models.DateTimeField()
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Peers in the course, and those left to score after candidate pruning
+    candidates_before = models.IntegerField(null=True, blank=True)
+    candidates_after = models.IntegerField(null=True, blank=True)
+    pairs_scored = models.IntegerField(null=True, blank=True)
+    bytes_extracted = models.BigIntegerField(default=0)
+
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="plagiarism_check_runs"
+    )
+    submission = models.ForeignKey(
+        Submission, on_delete=models.SET_NULL, null=True, blank=True, related_name="check_runs"
+    )
+    assignment = models.ForeignKey(
+        Assignment, on_delete=models.SET_NULL, null=True, blank=True, related_name="check_runs"
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["course", "queued_at"])]
+
     def __str__(self):
-        return f"Plagiarism Report for Submission: {self.submission.id}"
+        return f"Plagiarism check {self.task_id}: {self.outcome}"
     
 
 class Notification(models.Model):
@@ -0,0 +1,84 @@
+"""Content-addressed store of uploaded files on local disk.
+
+Every file is written once, under the SHA-256 of its bytes, to
+`BLOB_STORE_DIR/ab/cd/abcd...`, and never modified afterwards: rows refer
+to a file by its hash, identical uploads share one file, and readers need
+no locks.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Bytes read or written at a time when streaming a file
+CHUNK_SIZE = 64 * 1024
+
+
+def path(sha256: str) -> str:
+    return os.path.join(settings.BLOB_STORE_DIR, sha256[:2], sha256[2:4], sha256)
+
+
+def put_chunks(chunks):
+    """Store a file given as byte chunks, hashing it on the way, and return
+    its (SHA-256, size). Storing a file already present changes nothing."""
+    os.makedirs(settings.BLOB_STORE_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+
+    # Written beside the store and renamed into place, so that a file is
+    # never seen half written
+    descriptor, temporary = tempfile.mkstemp(prefix="tmp-", dir=settings.BLOB_STORE_DIR)
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            for chunk in chunks:
+                digest.update(chunk)
+                file.write(chunk)
+                size += len(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+
+        sha256 = digest.hexdigest()
+        destination = path(sha256)
+        if not os.path.exists(destination):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, destination)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return sha256, size
+
+
+def put(data: bytes):
+    return put_chunks([data])
+
+
+def put_upload(upload):
+    """`put` of an uploaded file, read a chunk at a time."""
+    return put_chunks(upload.chunks(CHUNK_SIZE))
+
+
+def open_file(sha256: str):
+    """The stored file, opened for reading."""
+    return open(path(sha256), "rb")
+
+
+@contextmanager
+def map_file(file_path: str):
+    """Memory-map a file read-only. The map reads like a binary file and
+    like bytes, and pages in only what is read."""
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            # An empty file cannot be mapped
+            yield b""
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def mapped(sha256: str):
+    """`map_file` of a stored file."""
+    return map_file(path(sha256))
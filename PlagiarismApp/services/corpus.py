@@ -0,0 +1,378 @@
+"""Per-course term matrices published as versioned `.npy` files and opened
+with `np.memmap`, so that the worker processes of a host share one copy of
+a course's corpus through the page cache instead of building their own.
+
+Layout of the directory of one course:
+
+    CURRENT         name of the published generation
+    publish.lock    held exclusively while a generation is built or collected
+    <generation>/
+        lock        held shared by readers and exclusively by the collector
+        meta.json   latest `updated_at` of the stored vectors it was built from
+        data.npy indices.npy indptr.npy norms.npy features.npy ids.npy
+
+A generation is never modified once published. Vectors stored after it was
+built are read by every check and scored from memory beside it, in place of
+the rows they replace, until there are more than
+`PLAGIARISM_CORPUS_OVERLAY_SIZE` of them; the check that finds more writes
+a new generation beside it and replaces CURRENT atomically. Generations
+that are not current are removed as soon as no reader holds them.
+"""
+import fcntl
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from functools import cached_property
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+
+from ..models import SubmissionVector
+from . import vectors
+
+ARRAYS = ("data", "indices", "indptr", "norms", "features", "ids")
+# Times a reader retries a generation collected as it opened it before it
+# gives up, so that the next check publishes a new one
+OPEN_ATTEMPTS = 3
+
+
+def _write_file(path, write):
+    with open(path, "wb") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _rows(feature_vectors):
+    """Float matrix of feature vectors, the sorted feature hash of each of
+    its columns and the norm of each of its rows."""
+    matrix, features = vectors.feature_matrix(feature_vectors)
+    if matrix is None:
+        matrix, features = sparse.csr_matrix((len(feature_vectors), 0)), np.zeros(0, dtype=np.uint64)
+
+    matrix = matrix.astype(np.float64)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    return matrix, features, norms
+
+
+def _score_rows(feature_vectors, matrix, features, norms):
+    """Cosine similarities of many feature vectors with every row of a
+    matrix over `features`, as a dense (vectors, rows) array computed with
+    one sparse product."""
+    scores = np.zeros((len(feature_vectors), matrix.shape[0]))
+    if not len(features) or not feature_vectors:
+        return scores
+
+    rows, columns, counts, query_norms = [], [], [], []
+    for row, (query_features, query_counts) in enumerate(feature_vectors):
+        found = np.minimum(np.searchsorted(features, query_features), len(features) - 1)
+        present = features[found] == query_features
+        rows.append(np.full(present.sum(), row))
+        columns.append(found[present])
+        counts.append(query_counts[present])
+        query_norms.append(np.linalg.norm(query_counts.astype(np.float64)))
+    queries = sparse.csr_matrix(
+        (np.concatenate(counts).astype(np.float64), (np.concatenate(rows), np.concatenate(columns))),
+        shape=(len(feature_vectors), len(features)),
+    )
+
+    products = (queries @ matrix.T).toarray()
+    norms = np.outer(query_norms, norms)
+    scored = norms > 0
+    scores[scored] = products[scored] / norms[scored]
+    return scores
+
+
+class CorpusSnapshot:
+    """One published generation, memory-mapped read-only, with the vectors
+    stored since it was built laid over it by `add_overlay`.
+
+    The generation is kept from collection until `close`, so a snapshot
+    should be used as a context manager for the length of one check.
+    """
+
+    def __init__(self, path: str, lock: int) -> None:
+        self.path = path
+        self.lock = lock
+
+        with open(os.path.join(path, "meta.json")) as file:
+            self.meta = json.load(file)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+
+        self.matrix = sparse.csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=tuple(self.meta["shape"]),
+            copy=False,
+        )
+        self.norms = arrays["norms"]
+        self.features = arrays["features"]
+        self.ids = arrays["ids"]
+
+        # Rows of the generation still scored, None for all of them
+        self.kept = None
+        self.overlay_ids = []
+        self.overlay = _rows([])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        kept = self.matrix.shape[0] if self.kept is None else len(self.kept)
+        return kept + len(self.overlay_ids)
+
+    def close(self):
+        if self.lock is not None:
+            self.matrix = self.norms = self.features = self.ids = None
+            os.close(self.lock)
+            self.lock = None
+
+    @cached_property
+    def generation_ids(self):
+        return [uuid.UUID(bytes=row.tobytes()) for row in self.ids]
+
+    def add_overlay(self, submission_ids, feature_vectors, removed=()):
+        """Score the feature vectors of `submission_ids` from memory too,
+        in place of the generation's rows of the same submissions and of
+        the `removed` ones."""
+        self.overlay_ids = list(submission_ids)
+        self.overlay = _rows(list(feature_vectors))
+
+        replaced = set(self.overlay_ids).union(removed)
+        if replaced.isdisjoint(self.generation_ids):
+            self.kept = None
+        else:
+            self.kept = np.array(
+                [row for row, submission_id in enumerate(self.generation_ids) if submission_id not in replaced],
+                dtype=np.intp,
+            )
+
+    def submission_ids(self):
+        ids = self.generation_ids
+        if self.kept is not None:
+            ids = [ids[row] for row in self.kept]
+        return ids + self.overlay_ids
+
+    def score(self, vector):
+        """Cosine similarity of a feature vector with every row, equal to
+        `PlagiarismCheckerService.score_vectors` against the same rows."""
+        return self.score_many([vector])[0]
+
+    def score_many(self, feature_vectors):
+        """Cosine similarities of many feature vectors with every row, in the
+        order of `submission_ids`, as a dense (vectors, rows) array."""
+        scores = _score_rows(feature_vectors, self.matrix, self.features, self.norms)
+        if self.kept is not None:
+            scores = scores[:, self.kept]
+        return np.hstack([scores, _score_rows(feature_vectors, *self.overlay)])
+
+
+class CourseCorpus:
+    """The published term matrix of the stored vectors of one course.
+
+    Files live under `PLAGIARISM_CORPUS_DIR`, keyed by
+    `VECTOR_ENGINE_VERSION`, so vectors of another engine are never read.
+    """
+
+    def __init__(self, course_id: int) -> None:
+        self.course_id = course_id
+        self.path = os.path.join(
+            settings.PLAGIARISM_CORPUS_DIR, f"v{vectors.VECTOR_ENGINE_VERSION}", f"course-{course_id}"
+        )
+
+    def stored_vectors(self):
+        return SubmissionVector.objects.filter(
+            submission__assignment__course__id=self.course_id,
+            engine_version=vectors.VECTOR_ENGINE_VERSION,
+        )
+
+    def open(self) -> CorpusSnapshot:
+        """Open the published generation with the vectors stored since it
+        was built laid over it, publishing a new generation first when there
+        is none or when more than `PLAGIARISM_CORPUS_OVERLAY_SIZE` vectors
+        would have to be."""
+        os.makedirs(self.path, exist_ok=True)
+        limit = settings.PLAGIARISM_CORPUS_OVERLAY_SIZE
+
+        snapshot = self.open_current()
+        if snapshot is not None:
+            if self.load_overlay(snapshot, limit):
+                return snapshot
+            snapshot.close()
+
+        lock = os.open(os.path.join(self.path, "publish.lock"), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another worker may have published while we waited
+            snapshot = self.open_current()
+            if snapshot is None or not self.load_overlay(snapshot, limit):
+                if snapshot is not None:
+                    snapshot.close()
+                self.publish()
+                snapshot = self.open_current()
+                # Only what was stored while it was being built
+                self.load_overlay(snapshot)
+            self.collect()
+        finally:
+            os.close(lock)
+        return snapshot
+
+    def load_overlay(self, snapshot: CorpusSnapshot, limit=None) -> bool:
+        """Lay the vectors stored since the snapshot's generation was built
+        over it. Returns False, leaving the snapshot as it was, when there
+        are more than `limit` of them."""
+        stored = self.stored_vectors()
+        watermark = snapshot.meta.get("watermark")
+        if watermark is None:
+            changed = stored
+        else:
+            watermark = datetime.fromisoformat(watermark)
+            changed = stored.filter(updated_at__gt=watermark)
+
+        rows = changed.values_list("submission_id", "vector")
+        rows = list(rows if limit is None else rows[:limit + 1])
+        if limit is not None and len(rows) > limit:
+            return False
+
+        # Every row of the generation that was not replaced is still stored
+        # as it was, unless vectors were removed since or committed late,
+        # with an older updated_at; those are found by comparing the ids
+        generation_ids = set(snapshot.generation_ids)
+        overlay_ids = {submission_id for submission_id, _ in rows}
+        unchanged = 0 if watermark is None else stored.filter(updated_at__lte=watermark).count()
+        removed = set()
+        if unchanged != len(generation_ids - overlay_ids):
+            stored_ids = set(stored.values_list("submission_id", flat=True))
+            removed = generation_ids - stored_ids
+            late = stored_ids - generation_ids - overlay_ids
+            rows += stored.filter(submission_id__in=late).values_list("submission_id", "vector")
+            if limit is not None and len(rows) > limit:
+                return False
+
+        snapshot.add_overlay(
+            [submission_id for submission_id, _ in rows],
+            [vectors.loads(vector) for _, vector in rows],
+            removed,
+        )
+        return True
+
+    def current_generation(self):
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def open_current(self):
+        """Open the current generation, or return None when there is none
+        or it could not be opened in `OPEN_ATTEMPTS` tries."""
+        for _ in range(OPEN_ATTEMPTS):
+            generation = self.current_generation()
+            if generation is None:
+                return None
+
+            path = os.path.join(self.path, generation)
+            try:
+                lock = os.open(os.path.join(path, "lock"), os.O_RDONLY)
+            except FileNotFoundError:
+                # Collected after being replaced; CURRENT has moved on
+                continue
+
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            if os.fstat(lock).st_nlink == 0:
+                os.close(lock)
+                continue
+
+            try:
+                return CorpusSnapshot(path, lock)
+            except FileNotFoundError:
+                os.close(lock)
+        return None
+
+    def publish(self):
+        """Write a generation from the stored vectors and make it current.
+        Must be called with the publish lock held."""
+        rows = list(self.stored_vectors().values_list("submission_id", "vector", "updated_at"))
+        self.write_generation(
+            [submission_id for submission_id, _, _ in rows],
+            [vectors.loads(vector) for _, vector, _ in rows],
+            max((updated_at for _, _, updated_at in rows), default=None),
+        )
+
+    def write_generation(self, submission_ids, feature_vectors, watermark=None):
+        """Publish the matrix of the given feature vectors as the current
+        generation, with one row per submission, built from the vectors
+        stored up to `watermark`."""
+        matrix, features, norms = _rows(feature_vectors)
+        # One index dtype for both, or scipy copies them on every open
+        index_dtype = np.int32 if matrix.nnz < 2 ** 31 else np.int64
+        arrays = {
+            "data": matrix.data,
+            "indices": matrix.indices.astype(index_dtype),
+            "indptr": matrix.indptr.astype(index_dtype),
+            "norms": norms,
+            "features": features,
+            "ids": np.frombuffer(
+                b"".join(submission_id.bytes for submission_id in submission_ids), dtype=np.uint8
+            ).reshape(-1, 16),
+        }
+        meta = {"watermark": watermark and watermark.isoformat(), "shape": list(matrix.shape)}
+
+        generation = f"{time.time_ns()}-{os.getpid()}"
+        temporary = os.path.join(self.path, f"tmp-{generation}")
+        os.mkdir(temporary)
+        for name, array in arrays.items():
+            _write_file(os.path.join(temporary, f"{name}.npy"), lambda file: np.save(file, array))
+        _write_file(os.path.join(temporary, "meta.json"), lambda file: file.write(json.dumps(meta).encode()))
+        _write_file(os.path.join(temporary, "lock"), lambda file: None)
+
+        os.rename(temporary, os.path.join(self.path, generation))
+        current = os.path.join(self.path, f"CURRENT.{generation}")
+        _write_file(current, lambda file: file.write(generation.encode()))
+        os.replace(current, os.path.join(self.path, "CURRENT"))
+
+    def collect(self):
+        """Remove every generation no reader holds but the current one.
+        Must be called with the publish lock held."""
+        current = self.current_generation()
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if name == current or not os.path.isdir(path):
+                continue
+            if name.startswith("tmp-"):
+                # Left behind by a publisher that died before renaming it
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+
+            try:
+                lock = os.open(os.path.join(path, "lock"), os.O_RDONLY)
+            except FileNotFoundError:
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            else:
+                # Unlinking the lock file while holding it tells readers
+                # blocked on it that the generation is gone
+                shutil.rmtree(path, ignore_errors=True)
+            finally:
+                os.close(lock)
+
+    def collect_unused(self):
+        """`collect`, unless a publisher holds the lock (it collects itself)."""
+        lock = os.open(os.path.join(self.path, "publish.lock"), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.collect()
+        except BlockingIOError:
+            pass
+        finally:
+            os.close(lock)
@@ -0,0 +1,91 @@
+"""Preprocessed documents as streams of integer term IDs over a shared
+vocabulary. Like `text`, nothing here touches the ORM."""
+from array import array
+
+import numpy as np
+
+from .shingles import shingle_hashes, term_hash
+
+
+class Vocabulary:
+    """Interned stems of the documents of one check, each mapped to a
+    uint32 ID in order of first appearance."""
+
+    def __init__(self) -> None:
+        self.ids = {}
+        self.terms = []
+        self.hashes = np.zeros(0, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def encode(self, terms):
+        """IDs of `terms`, interning the terms not seen before."""
+        ids = self.ids
+        encoded = array("I")
+        for term in terms:
+            term_id = ids.get(term)
+            if term_id is None:
+                term_id = ids[term] = len(self.terms)
+                self.terms.append(term)
+            encoded.append(term_id)
+        return np.frombuffer(encoded, dtype=np.uint32)
+
+    def document(self, terms, local_ids):
+        """Build a document from the output of `encode_locally`."""
+        return TokenDocument(self, self.encode(terms)[np.frombuffer(local_ids, dtype=np.uint32)])
+
+    def decode(self, token_ids):
+        terms = self.terms
+        return [terms[token_id] for token_id in token_ids.tolist()]
+
+    def term_hashes(self):
+        """Stable 64-bit hash of every term, hashing new terms once."""
+        new_terms = self.terms[len(self.hashes):]
+        if new_terms:
+            self.hashes = np.concatenate([
+                self.hashes,
+                np.fromiter((term_hash(term) for term in new_terms), dtype=np.uint64, count=len(new_terms)),
+            ])
+        return self.hashes
+
+
+class TokenDocument:
+    """Token stream of one preprocessed document with its term counts."""
+
+    __slots__ = ("vocabulary", "tokens", "term_ids", "counts")
+
+    def __init__(self, vocabulary: Vocabulary, tokens) -> None:
+        self.vocabulary = vocabulary
+        self.tokens = tokens
+        self.term_ids, counts = np.unique(tokens, return_counts=True)
+        self.counts = counts.astype(np.uint32)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def stems(self):
+        return self.vocabulary.decode(self.tokens)
+
+    def shingle_hashes(self, size: int):
+        """64-bit hash of every `size`-token shingle, see `shingle_hashes`."""
+        return shingle_hashes(self.vocabulary.term_hashes()[self.tokens], size)
+
+    def feature_vector(self):
+        """(feature hashes, counts) of the terms `CountVectorizer` counts,
+        which skips single-letter terms; see `vectors`."""
+        counted = np.array([len(term) > 1 for term in self.vocabulary.decode(self.term_ids)], dtype=bool)
+        features = self.vocabulary.term_hashes()[self.term_ids[counted]]
+        order = np.argsort(features)
+        return features[order], self.counts[counted][order]
+
+    def nbytes(self):
+        return self.tokens.nbytes + self.term_ids.nbytes + self.counts.nbytes
+
+
+def encode_locally(stems):
+    """Return (terms, local IDs) of a list of stems over a vocabulary of
+    its own, compact to send back from a pool worker."""
+    ids = {}
+    local_ids = array("I", [ids.setdefault(stem, len(ids)) for stem in stems])
+    return list(ids), local_ids
@@ -0,0 +1,91 @@
+"""Wall time, CPU time and peak memory of the stages of a plagiarism check.
+
+Every stage is logged as one JSON line. Stages run within a `context`,
+as the tasks open for each check, are also added to the histograms of
+`metrics`; others, such as those of a benchmark, are only logged.
+
+Peak memory is traced with `tracemalloc` only while
+`PLAGIARISM_TRACE_MEMORY` is on, as tracing slows allocation down.
+"""
+import contextvars
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Fields added to every stage logged within `context`, and the histogram
+# observations it buffers until it exits
+_context = contextvars.ContextVar("plagiarism_stage_context", default=None)
+# Highest traced memory seen so far by each stage open in this context,
+# innermost last
+_open_peaks = contextvars.ContextVar("plagiarism_stage_peaks", default=())
+
+
+@contextmanager
+def context(**fields):
+    """Add `fields` to every stage logged within, and write the histograms
+    of its stages once on exit rather than once per stage."""
+    parent = _context.get()
+    current = {"fields": {**(parent["fields"] if parent else {}), **fields}, "observations": []}
+    token = _context.set(current)
+    try:
+        yield current["fields"]
+    finally:
+        _context.reset(token)
+        if parent is not None:
+            parent["observations"].extend(current["observations"])
+        elif current["observations"]:
+            metrics.observe(current["observations"])
+
+
+@contextmanager
+def stage(name: str, **fields):
+    """Measure the block as one stage. Counts known only inside the block,
+    such as the peers scored, are added to the yielded record."""
+    record = {"stage": name, **fields}
+    trace = settings.PLAGIARISM_TRACE_MEMORY
+    if trace:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        # Resetting the peak for this stage would lose the enclosing
+        # stage's, so that one is handed up first
+        start_memory, peak = tracemalloc.get_traced_memory()
+        peaks = _open_peaks.get()
+        if peaks:
+            peaks = peaks[:-1] + (max(peaks[-1], peak),)
+        tracemalloc.reset_peak()
+        _open_peaks.set(peaks + (start_memory,))
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall_seconds"] = time.perf_counter() - wall
+        record["cpu_seconds"] = time.process_time() - cpu
+        observations = [
+            ("stage_wall_seconds", name, record["wall_seconds"]),
+            ("stage_cpu_seconds", name, record["cpu_seconds"]),
+        ]
+
+        if trace:
+            # Nested stages handed their peaks up; hand this one up in turn
+            _, peak = tracemalloc.get_traced_memory()
+            peaks = _open_peaks.get()
+            peak = max(peak, peaks[-1])
+            peaks = peaks[:-1]
+            _open_peaks.set(peaks[:-1] + (max(peaks[-1], peak),) if peaks else ())
+            record["peak_bytes"] = peak - start_memory
+            observations.append(("stage_peak_bytes", name, record["peak_bytes"]))
+
+        current = _context.get()
+        if current is not None:
+            record = {**current["fields"], **record}
+            current["observations"].extend(observations)
+        logger.info(json.dumps({"event": "plagiarism_stage", **record}, default=str))
@@ -0,0 +1,7 @@
+def blocked_pairs(matrix, threshold: float, block_size: int):
+    """Yield (i, j, score) arrays of the pairs i < j of L2-normalised rows
+    scoring above the threshold, multiplying `block_size` rows at a time."""
+    for start in range(0, matrix.shape[0], block_size):
+        scores = (matrix[start:start + block_size] @ matrix.T).tocoo()
+        keep = (scores.data > threshold) & (scores.row + start < scores.col)
+        yield scores.row[keep] + start, scores.col[keep], scores.data[keep]
@@ -0,0 +1,103 @@
+"""Counters and histograms of the plagiarism pipeline, kept in Redis hashes
+so that every web and worker process adds to the same totals."""
+import logging
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "plagiarism:metrics"
+HISTOGRAMS_KEY = "plagiarism:histograms"
+
+# Upper bounds of the buckets of each histogram, by name, with its help text
+HISTOGRAMS = {
+    "stage_wall_seconds": (
+        "Wall time of each stage of a plagiarism check",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    ),
+    "stage_cpu_seconds": (
+        "CPU time of each stage of a plagiarism check",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    ),
+    "stage_peak_bytes": (
+        "Peak traced memory of each stage of a plagiarism check",
+        tuple(2 ** exponent for exponent in range(16, 33, 2)),
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def client() -> redis.Redis:
+    return redis.Redis.from_url(settings.PLAGIARISM_METRICS_REDIS_URL)
+
+
+def increment(name: str, amount: int = 1):
+    """Add to a counter. A metrics outage is logged, never raised."""
+    try:
+        client().hincrby(METRICS_KEY, name, amount)
+    except redis.RedisError:
+        logger.warning("Could not update the %s metric", name, exc_info=True)
+
+
+def counters():
+    """Every counter by name. A metrics outage is logged and reads as no
+    counters."""
+    try:
+        values = client().hgetall(METRICS_KEY)
+    except redis.RedisError:
+        logger.warning("Could not read the counters", exc_info=True)
+        return {}
+    return {name.decode(): int(value) for name, value in values.items()}
+
+
+def observe(observations):
+    """Add (histogram, stage, value) observations to their histograms in
+    one round trip. A metrics outage is logged, never raised."""
+    pipeline = client().pipeline(transaction=False)
+    for name, stage, value in observations:
+        for bound in HISTOGRAMS[name][1]:
+            if value <= bound:
+                pipeline.hincrby(HISTOGRAMS_KEY, f"{name}:{stage}:{bound}", 1)
+        pipeline.hincrby(HISTOGRAMS_KEY, f"{name}:{stage}:+Inf", 1)
+        pipeline.hincrbyfloat(HISTOGRAMS_KEY, f"{name}:{stage}:sum", value)
+    try:
+        pipeline.execute()
+    except redis.RedisError:
+        logger.warning("Could not update the stage histograms", exc_info=True)
+
+
+def exposition():
+    """All counters and histograms in the Prometheus text format, or None
+    when they could not be read. A metrics outage is logged, never raised."""
+    pipeline = client().pipeline(transaction=False)
+    pipeline.hgetall(METRICS_KEY)
+    pipeline.hgetall(HISTOGRAMS_KEY)
+    try:
+        counter_values, histogram_values = pipeline.execute()
+    except redis.RedisError:
+        logger.warning("Could not read the metrics", exc_info=True)
+        return None
+
+    lines = []
+    for name, value in sorted(counter_values.items()):
+        lines.append(f"# TYPE plagiarism_{name.decode()}_total counter")
+        lines.append(f"plagiarism_{name.decode()}_total {int(value)}")
+
+    histograms = {}
+    for field, value in histogram_values.items():
+        name, stage, bound = field.decode().split(":")
+        histograms.setdefault(name, {}).setdefault(stage, {})[bound] = value.decode()
+
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        if name not in histograms:
+            continue
+        lines.append(f"# HELP plagiarism_{name} {help_text}")
+        lines.append(f"# TYPE plagiarism_{name} histogram")
+        for stage, values in sorted(histograms[name].items()):
+            for bound in [*map(str, bounds), "+Inf"]:
+                lines.append(f'plagiarism_{name}_bucket{{stage="{stage}",le="{bound}"}} {values.get(bound, 0)}')
+            lines.append(f'plagiarism_{name}_sum{{stage="{stage}"}} {values.get("sum", 0)}')
+            lines.append(f'plagiarism_{name}_count{{stage="{stage}"}} {values.get("+Inf", 0)}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,54 @@
+"""Uploads of the deadline burst waiting to be checked together.
+
+Pending checks are kept in one Redis sorted set, scored by the time they
+were queued. The first check queued into an empty set arms a timer; the
+flush scheduled with it takes the whole set at once, so every upload is
+taken by the first flush after it, at most one window later.
+"""
+import json
+import time
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+PENDING_KEY = "plagiarism:microbatch:pending"
+TIMER_KEY = "plagiarism:microbatch:timer"
+
+
+@lru_cache(maxsize=None)
+def client() -> redis.Redis:
+    return redis.Redis.from_url(settings.PLAGIARISM_MICROBATCH_REDIS_URL)
+
+
+def enqueue(course_id: int, submission_id, task_id: str, content_hash: str):
+    """Queue the check of an upload.
+
+    Returns (armed, size): whether this check armed the timer, so its
+    caller must schedule the flush, and the number of checks now pending.
+    """
+    queued_at = time.time()
+    entry = json.dumps({
+        "course_id": course_id,
+        "submission_id": str(submission_id),
+        "task_id": task_id,
+        "content_hash": content_hash,
+    })
+    pipeline = client().pipeline()
+    pipeline.zadd(PENDING_KEY, {entry: queued_at})
+    pipeline.zcard(PENDING_KEY)
+    # Expires on its own should the flush it stands for be lost
+    pipeline.set(TIMER_KEY, queued_at, nx=True, ex=2 * settings.PLAGIARISM_MICROBATCH_WINDOW)
+    _, size, armed = pipeline.execute()
+    return bool(armed), size
+
+
+def take():
+    """Remove and return every pending check, oldest first, each with the
+    time it was queued, and disarm the timer."""
+    pipeline = client().pipeline()
+    pipeline.delete(TIMER_KEY)
+    pipeline.zrange(PENDING_KEY, 0, -1, withscores=True)
+    pipeline.delete(PENDING_KEY)
+    _, pending, _ = pipeline.execute()
+    return [dict(json.loads(entry), queued_at=queued_at) for entry, queued_at in pending]
@@ -0,0 +1,45 @@
+from django.conf import settings
+from joblib import Parallel, delayed, parallel_config
+
+from . import blobs, text
+from .documents import encode_locally
+
+
+def preprocess_chunk(texts, nltk_data=None):
+    """Stems of every text as (terms, local IDs), see `encode_locally`."""
+    text.resources(nltk_data)
+    return [encode_locally(text.preprocess_tokens(item)) for item in texts]
+
+
+def extract_chunk(paths, max_pages=None):
+    """Text of each of the blob store files at `paths`, memory-mapped."""
+    texts = []
+    for path in paths:
+        with blobs.map_file(path) as pdf:
+            texts.append(text.extract_text_from_pdf(pdf, max_pages))
+    return texts
+
+
+def map_chunks(function, items, *args):
+    """Apply `function` to chunks of `items` and return the flattened
+    results in input order.
+
+    With `PLAGIARISM_WORKERS` above 1 the chunks are spread over a loky
+    process pool, which also works inside daemonic Celery prefork workers,
+    and every pool worker is limited to `PLAGIARISM_BLAS_THREADS` BLAS and
+    OpenMP threads so that the pool does not oversubscribe the cores.
+    """
+    chunk_size = settings.PLAGIARISM_WORKER_CHUNK_SIZE
+    chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+    if settings.PLAGIARISM_WORKERS <= 1 or len(chunks) <= 1:
+        results = [function(chunk, *args) for chunk in chunks]
+    else:
+        with parallel_config(
+            backend="loky",
+            n_jobs=settings.PLAGIARISM_WORKERS,
+            inner_max_num_threads=settings.PLAGIARISM_BLAS_THREADS,
+        ):
+            results = Parallel()(delayed(function)(chunk, *args) for chunk in chunks)
+
+    return [result for chunk in results for result in chunk]
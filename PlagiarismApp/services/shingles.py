@@ -0,0 +1,59 @@
+"""Vectorized k-gram hashing and winnowing over token streams.
+Like `text`, nothing here touches the ORM."""
+import hashlib
+
+import numpy as np
+
+# Bumped whenever the hash values below change, so that fingerprints stored
+# by an earlier version are never compared with new ones
+SHINGLE_HASH_VERSION = 2
+
+# Odd multiplier of the polynomial rolling hash, modulo 2 ** 64
+ROLLING_BASE = np.uint64(0x9E3779B97F4A7C15)
+
+
+def term_hash(term: str) -> int:
+    """Stable unsigned 64-bit hash of one term."""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def mix(values):
+    """splitmix64 finalizer, spreading every input bit over the output."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def shingle_hashes(token_hashes, size: int):
+    """Unsigned 64-bit hash of every `size`-token shingle, in token order:
+    the polynomial sum(h[p + i] * BASE ** (size - 1 - i)) mod 2 ** 64 of
+    the term hashes, mixed. Computed with `size` passes over the array."""
+    token_hashes = np.asarray(token_hashes, dtype=np.uint64)
+    count = len(token_hashes) - size + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64)
+
+    hashes = token_hashes[:count].copy()
+    for offset in range(1, size):
+        hashes *= ROLLING_BASE
+        hashes += token_hashes[offset:offset + count]
+    return mix(hashes)
+
+
+def winnow(hashes, window: int):
+    """Select (hashes, positions) fingerprints by robust winnowing: the
+    minimum hash of every window, taking the rightmost on ties and
+    recording each selected position once."""
+    hashes = np.asarray(hashes)
+    if not len(hashes):
+        return hashes[:0], np.zeros(0, dtype=np.int64)
+
+    window = min(window, len(hashes))
+    windows = np.lib.stride_tricks.sliding_window_view(hashes, window)
+    # argmin returns the first minimum, so search each window reversed
+    positions = np.arange(len(windows)) + window - 1 - np.argmin(windows[:, ::-1], axis=1)
+    positions = np.unique(positions)
+    return hashes[positions], positions
+
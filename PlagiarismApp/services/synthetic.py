@@ -0,0 +1,130 @@
+"""Synthetic essays and submissions with known overlap, for the benchmark
+and corpus generator commands. Like `text`, nothing here touches the ORM."""
+import io
+from random import Random
+
+import pydyf
+
+# How a generated submission relates to its source
+KINDS = ("copy", "paraphrase", "partial", "unrelated")
+
+# Layout of the generated PDFs, in points on an A4 page
+PAGE_SIZE = (595, 842)
+MARGIN = 50
+FONT_SIZE = 10
+LEADING = 13
+WORDS_PER_LINE = 13
+
+
+def synthetic_vocabulary(size: int, rng: Random):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+
+def synthetic_texts(count: int, words: int = 1500, vocabulary_size: int = 20000, seed: int = 0):
+    """Generate `count` essays of Zipf-distributed words, a fifth of which
+    reuse a large part of an earlier essay."""
+    rng = Random(seed)
+    vocabulary = synthetic_vocabulary(vocabulary_size, rng)
+    weights = [1 / rank for rank in range(1, vocabulary_size + 1)]
+
+    texts = []
+    for index in range(count):
+        essay = rng.choices(vocabulary, weights=weights, k=words)
+        if texts and index % 5 == 0:
+            source = rng.choice(texts).split()
+            start = rng.randrange(words // 2)
+            essay[start:start + words // 2] = source[start:start + words // 2]
+        texts.append(" ".join(essay))
+    return texts
+
+
+def synthetic_submissions(
+    count: int,
+    words: int = 1500,
+    copies: float = 0.05,
+    paraphrases: float = 0.1,
+    partials: float = 0.1,
+    swap_rate: float = 0.15,
+    passage: float = 0.3,
+    vocabulary_size: int = 20000,
+    seed: int = 0,
+):
+    """Generate `count` essays with controlled overlap, as a list of
+    {"kind", "source", "text"}, where "source" is the index of the earlier
+    unrelated essay a derived one was made from.
+
+    Each essay is, with the given probabilities, an exact copy of its
+    source, a paraphrase replacing `swap_rate` of the source's words, or an
+    unrelated essay with a `passage` share of the source pasted in; the
+    rest are unrelated.
+    """
+    rng = Random(seed)
+    vocabulary = synthetic_vocabulary(vocabulary_size, rng)
+    weights = [1 / rank ** 0.6 for rank in range(1, vocabulary_size + 1)]
+
+    submissions, originals = [], []
+    for index in range(count):
+        draw = rng.random()
+        if not originals or draw >= copies + paraphrases + partials:
+            kind = "unrelated"
+        elif draw < copies:
+            kind = "copy"
+        elif draw < copies + paraphrases:
+            kind = "paraphrase"
+        else:
+            kind = "partial"
+
+        if kind == "unrelated":
+            originals.append(index)
+            essay = rng.choices(vocabulary, weights=weights, k=words)
+            submissions.append({"kind": kind, "source": None, "text": " ".join(essay)})
+            continue
+
+        source = rng.choice(originals)
+        essay = submissions[source]["text"].split()
+        if kind == "paraphrase":
+            for position in rng.sample(range(len(essay)), int(len(essay) * swap_rate)):
+                essay[position] = rng.choices(vocabulary, weights=weights)[0]
+        elif kind == "partial":
+            length = int(len(essay) * passage)
+            start = rng.randrange(len(essay) - length + 1)
+            pasted = essay[start:start + length]
+            essay = rng.choices(vocabulary, weights=weights, k=words)
+            at = rng.randrange(words - length + 1)
+            essay[at:at + length] = pasted
+        submissions.append({"kind": kind, "source": source, "text": " ".join(essay)})
+    return submissions
+
+
+def text_pdf(text: str) -> bytes:
+    """A plain PDF of `text` in Helvetica, as many A4 pages as it fills,
+    from which PyPDF2 extracts the same words."""
+    words = text.split()
+    lines = [" ".join(words[start:start + WORDS_PER_LINE]) for start in range(0, len(words), WORDS_PER_LINE)]
+    lines_per_page = (PAGE_SIZE[1] - 2 * MARGIN) // LEADING
+    pages = [lines[start:start + lines_per_page] for start in range(0, len(lines), lines_per_page)] or [[]]
+
+    pdf = pydyf.PDF()
+    font = pydyf.Dictionary({"Type": "/Font", "Subtype": "/Type1", "BaseFont": "/Helvetica"})
+    pdf.add_object(font)
+    for page_lines in pages:
+        content = pydyf.Stream()
+        content.begin_text()
+        content.set_font_size("F1", FONT_SIZE)
+        for number, line in enumerate(page_lines):
+            content.text_matrix(1, 0, 0, 1, MARGIN, PAGE_SIZE[1] - MARGIN - number * LEADING)
+            content.show_text(pydyf.String(line))
+        content.end_text()
+        pdf.add_object(content)
+        pdf.add_page(pydyf.Dictionary({
+            "Type": "/Page",
+            "Parent": pdf.pages.reference,
+            "MediaBox": pydyf.Array([0, 0, *PAGE_SIZE]),
+            "Contents": content.reference,
+            "Resources": pydyf.Dictionary({"Font": pydyf.Dictionary({"F1": font.reference})}),
+        }))
+
+    with io.BytesIO() as buffer:
+        pdf.write(buffer)
+        return buffer.getvalue()
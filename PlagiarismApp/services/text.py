@@ -0,0 +1,110 @@
+"""Text extraction and preprocessing shared by the checker and its worker
+processes. Nothing here touches the ORM, so process-pool workers can import
+it without setting Django up."""
+import io
+from functools import lru_cache
+
+import nltk
+import PyPDF2
+from nltk.corpus import stopwords
+from nltk.stem import PorterStemmer
+from nltk.tokenize.destructive import NLTKWordTokenizer
+
+# NLTK models loaded once per process by `load_resources`
+RESOURCES = {}
+
+# Distinct words whose stems are kept per process
+STEM_CACHE_SIZE = 2 ** 16
+
+
+def load_resources(data_dir=None):
+    """Load the sentence tokenizer, word tokenizer, stemmer and stopword
+    list, reading NLTK data from `data_dir` first. Nothing is downloaded;
+    run `manage.py download_nltk_data` to fill the directory."""
+    if data_dir and str(data_dir) not in nltk.data.path:
+        nltk.data.path.insert(0, str(data_dir))
+
+    stemmer = PorterStemmer()
+    RESOURCES.update(
+        sentence_tokenizer=nltk.data.load("tokenizers/punkt/english.pickle"),
+        word_tokenizer=NLTKWordTokenizer(),
+        stemmer=stemmer,
+        stem=lru_cache(maxsize=STEM_CACHE_SIZE)(stemmer.stem),
+        stopwords=frozenset(stopwords.words("english")),
+    )
+    return RESOURCES
+
+
+def resources(data_dir=None):
+    """Return the loaded models, loading them on first use."""
+    return RESOURCES or load_resources(data_dir)
+
+
+def word_tokenize(text):
+    """Same tokens as `nltk.word_tokenize`, with the loaded models."""
+    loaded = resources()
+    return [
+        token
+        for sentence in loaded["sentence_tokenizer"].tokenize(text)
+        for token in loaded["word_tokenizer"].tokenize(sentence)
+    ]
+
+
+def alpha_tokens(text):
+    """Alphabetic tokens of `text`, from `nltk.word_tokenize`."""
+    return [token for token in word_tokenize(text) if token.isalpha()]
+
+
+def iter_pdf_pages(pdf, max_pages=None):
+    """Yield the text of each page in turn, up to `max_pages` pages, of a
+    PDF given as bytes or as a binary file, such as a memory-mapped blob.
+    Stopping the iteration early skips the remaining pages."""
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf) if isinstance(pdf, bytes) else pdf)
+    page_count = len(pdf_reader.pages)
+    if max_pages:
+        page_count = min(page_count, max_pages)
+
+    for page_num in range(page_count):
+        yield pdf_reader.pages[page_num].extract_text()
+
+
+def extract_text_from_pdf(pdf, max_pages=None):
+    return ''.join(iter_pdf_pages(pdf, max_pages))
+
+
+def preprocess_tokens(text):
+    stem = resources()["stem"]
+    return [stem(token) for token in alpha_tokens(text)]
+
+
+def preprocess_text(text):
+    stemmed_tokens = preprocess_tokens(text)
+    preprocessed_text = ' '.join(stemmed_tokens)
+    return preprocessed_text
+
+
+def iter_page_tokens(pages):
+    """Yield the stemmed tokens of each page of a stream of page texts,
+    such as `iter_pdf_pages`, without joining the pages first.
+
+    Pages are joined without a separator on extraction, and a sentence
+    may run on to the next page, so the last sentence of each page is
+    carried over to the next one. Punkt then sees the word after a
+    page's last period, as it does in the joined text, and reads an
+    abbreviation ending a page ("Mr.", "etc.") as one.
+    """
+    sentence_tokenizer = resources()["sentence_tokenizer"]
+    carried = ''
+    for page in pages:
+        page = carried + page
+        spans = list(sentence_tokenizer.span_tokenize(page))
+        split_at = spans[-1][0] if spans else 0
+        page, carried = page[:split_at], page[split_at:]
+        yield preprocess_tokens(page)
+
+    yield preprocess_tokens(carried)
+
+
+def preprocess_pages(pages):
+    """`preprocess_text` of a stream of page texts, page by page."""
+    return ' '.join(token for tokens in iter_page_tokens(pages) for token in tokens)
@@ -1,22 +1,42 @@
 import datetime
 import os
-import base64
-import PyPDF2
 import uuid
-import io
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.stem import PorterStemmer
+import numpy as np
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.functional import cached_property
 from weasyprint import HTML
 from pylovepdf.tools.officepdf import OfficeToPdf
 from dotenv import load_dotenv
-from ..models import Submission, PlagiarismReport
-from django.core.exceptions import ValidationError
+from ..models import (
+    Assignment,
+    Submission,
+    SubmissionText,
+    SubmissionVector,
+    SimilarityEdge,
+)
+from . import blobs as blob_store
+from . import instrumentation
+from . import shingles
+from . import text as text_processing
+from . import vectors
+from .corpus import CourseCorpus
+from .documents import TokenDocument, Vocabulary
+from .join import blocked_pairs
+from .parallel import extract_chunk, map_chunks, preprocess_chunk
+from .winnowing import FingerprintIndex, passages
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 
 load_dotenv()
 
+# Values of PLAGIARISM_SCORING_MODE, see settings.py
+SCORING_MODES = ("corpus", "winnowing", "pairwise")
+
 out_dir = os.path.join(os.getcwd(), "temp_dir")
 if not os.path.exists(out_dir):
     os.mkdir(out_dir)
@@ -41,19 +61,60 @@ class HTMLToPdf(HTML):
     def __new__(cls, *args, **kwargs):
         instance = super().__new__(cls)
         instance.__init__(*args, **kwargs)
-        return instance.base64_pdf
+        return instance.pdf_bytes
 
     def __init__(self, string):
         super().__init__(string=string)
-        pdf_bytes = self._generate_pdf()
-        self.base64_pdf = base64.b64encode(pdf_bytes)
+        self.pdf_bytes = self._generate_pdf()
 
     def _generate_pdf(self):
         return super().write_pdf(bytes=True)
 
 
+def mirror_passages(found):
+    """The passages of a pair as seen from the other submission."""
+    return sorted(
+        (
+            {
+                "start": passage["other_start"],
+                "end": passage["other_end"],
+                "other_start": passage["start"],
+                "other_end": passage["end"],
+            }
+            for passage in found
+        ),
+        key=lambda passage: passage["start"],
+    )
+
+
+def write_similarity_edges(edges, submission_ids, update_fields):
+    """Upsert similarity edges in one bulk write and refresh the maximum
+    score of the given submissions."""
+    SimilarityEdge.objects.bulk_create(
+        edges,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["submission", "other_submission"],
+        update_fields=update_fields,
+    )
+    Submission.objects.filter(id__in=submission_ids).update(
+        max_similarity=Subquery(
+            SimilarityEdge.objects.filter(submission=OuterRef("pk"))
+            .values("submission")
+            .annotate(max_score=Max("score"))
+            .values("max_score")
+        )
+    )
+
+
 class PlagiarismCheckerService:
     def __init__(self, course_id: int, submission_id: uuid.UUID, student_id: uuid.UUID) -> None:
+        if settings.PLAGIARISM_SCORING_MODE not in SCORING_MODES:
+            raise ImproperlyConfigured(
+                f"Unknown PLAGIARISM_SCORING_MODE {settings.PLAGIARISM_SCORING_MODE!r}; "
+                f"use one of {', '.join(SCORING_MODES)}"
+            )
+
         self.course_id = course_id
         self.submission_id = submission_id
         self.student_id = student_id
@@ -62,29 +123,335 @@ class PlagiarismCheckerService:
             assignment__course__id=self.course_id
         ).exclude(id=self.submission_id)
 
-        self.current_submission = Submission.objects.get(id=self.submission_id)
-
         self.report = []
 
-        nltk.download("punkt")
-        nltk.download("stopwords")
+        # Loaded once per process, normally by the worker_process_init hook
+        text_processing.resources(settings.PLAGIARISM_NLTK_DATA)
+
+    @cached_property
+    def current_submission(self):
+        return Submission.objects.get(id=self.submission_id)
+
+    @cached_property
+    def stats(self):
+        """Counts of this check, written to its `PlagiarismCheckRun`."""
+        return {
+            "engine": "",
+            "candidates_before": None,
+            "candidates_after": None,
+            "pairs_scored": None,
+            "bytes_extracted": 0,
+        }
+
+    @cached_property
+    def vocabulary(self):
+        """Term IDs shared by every document preprocessed in this check."""
+        return Vocabulary()
 
-    def extract_text_from_pdf(self, pdf_data):
-        pdf_data = base64.b64decode(pdf_data)
+    def iter_pdf_pages(self, pdf, max_pages=None):
+        """Yield the text of each page in turn, up to `max_pages` pages
+        (`PLAGIARISM_MAX_PAGES` by default)."""
+        return text_processing.iter_pdf_pages(pdf, max_pages or settings.PLAGIARISM_MAX_PAGES)
 
-        with io.BytesIO(pdf_data) as file_buffer:
-            pdf_reader = PyPDF2.PdfReader(file_buffer)
-            text = ''
-            for page_num in range(len(pdf_reader.pages)):
-                text += pdf_reader.pages[page_num].extract_text()
+    def extract_text_from_pdf(self, pdf):
+        """Text of a PDF given as bytes or as a binary file, such as a
+        memory-mapped blob."""
+        self.stats["bytes_extracted"] += len(pdf)
+        with instrumentation.stage("extraction", documents=1, bytes=len(pdf)) as record:
+            text = "".join(text_processing.iter_pdf_pages(pdf, settings.PLAGIARISM_MAX_PAGES))
+            record["characters"] = len(text)
         return text
 
+    def extract_blob_text(self, sha256):
+        """`extract_text_from_pdf` of a file in the blob store, memory-mapped
+        rather than read into memory."""
+        with blob_store.mapped(sha256) as pdf:
+            return self.extract_text_from_pdf(pdf)
+
+    def extract_blob_document(self, sha256):
+        """Extract a file in the blob store page by page, tokenizing each
+        page as it is read, and return (text, `TokenDocument`)."""
+        pages, stems = [], []
+        with blob_store.mapped(sha256) as pdf:
+            self.stats["bytes_extracted"] += len(pdf)
+
+            def read_pages():
+                for page in text_processing.iter_pdf_pages(pdf, settings.PLAGIARISM_MAX_PAGES):
+                    pages.append(page)
+                    yield page
+
+            with instrumentation.stage("extraction", documents=1, bytes=len(pdf)) as record:
+                for tokens in text_processing.iter_page_tokens(read_pages()):
+                    stems.extend(tokens)
+                record["characters"] = sum(len(page) for page in pages)
+        return "".join(pages), TokenDocument(self.vocabulary, self.vocabulary.encode(stems))
+
+    def submission_hash(self, submission):
+        """SHA-256 of a submission's file, its key in the blob store."""
+        return submission.sha256
+
+    def get_submission_text(self, submission):
+        """Return the extracted text of a submission, extracting it only when
+        no stored text exists for the submission's current file, nor for a
+        byte-identical file of another submission."""
+        content_hash = self.submission_hash(submission)
+        stored = SubmissionText.objects.filter(submission=submission).first()
+
+        if stored is not None and stored.content_hash == content_hash:
+            return stored.text
+
+        text = SubmissionText.objects.filter(content_hash=content_hash).values_list("text", flat=True).first()
+        if text is None:
+            text = self.extract_blob_text(content_hash)
+        SubmissionText.objects.update_or_create(
+            submission=submission,
+            defaults={"content_hash": content_hash, "text": text},
+        )
+        return text
+
+    def get_submission_document(self, submission):
+        """Return a submission preprocessed into a `TokenDocument`. A file
+        with no stored text is tokenized while it is extracted, and its text
+        stored on the way."""
+        content_hash = self.submission_hash(submission)
+        if SubmissionText.objects.filter(content_hash=content_hash).exists():
+            return self.preprocess_document(self.get_submission_text(submission))
+
+        text, document = self.extract_blob_document(content_hash)
+        SubmissionText.objects.update_or_create(
+            submission=submission,
+            defaults={"content_hash": content_hash, "text": text},
+        )
+        return document
+
+    def fingerprint_matches(self, current_text):
+        """Fingerprint the current submission into the course's inverted
+        index and look up the peers sharing its fingerprints.
+
+        Returns the current fingerprints and
+        {other_submission_id: [(position, other_position), ...]}.
+        """
+        index = FingerprintIndex(self.course_id)
+        fingerprints = index.update(self.current_submission, self.preprocess_document(current_text))
+
+        indexed = index.indexed_submission_ids()
+        for submission in self.all_submissions.exclude(id__in=indexed):
+            index.update(submission, self.get_submission_document(submission))
+
+        return fingerprints, index.matches(self.current_submission.id, fingerprints)
+
+    def get_peer_texts(self, submissions=None):
+        """Yield (submission, text) for every peer submission, reading stored
+        texts in one query and extracting only the peers that have none."""
+        if submissions is None:
+            submissions = self.all_submissions
+
+        stored_texts = dict(
+            SubmissionText.objects.filter(
+                submission__in=submissions
+            ).values_list("submission_id", "text")
+        )
+
+        submissions = list(submissions)
+        missing = [submission.id for submission in submissions if submission.id not in stored_texts]
+        if missing:
+            stored_texts.update(self.extract_submission_texts(missing))
+
+        for submission in submissions:
+            yield submission, stored_texts[submission.id]
+
+    def extract_submission_texts(self, submission_ids):
+        """Extract and store the texts of the given submissions, spread over
+        the process pool when `PLAGIARISM_WORKERS` is above 1.
+
+        Each distinct file is extracted once, and not at all when the text
+        of a byte-identical file is already stored.
+        """
+        hashes, sizes = {}, {}
+        for submission_id, content_hash, size in Submission.objects.filter(
+            id__in=submission_ids
+        ).values_list("id", "sha256", "size"):
+            hashes[submission_id] = content_hash
+            sizes[content_hash] = size
+        texts = dict(
+            SubmissionText.objects.filter(content_hash__in=sizes).values_list("content_hash", "text")
+        )
+
+        pending = [content_hash for content_hash in sizes if content_hash not in texts]
+        if pending:
+            with instrumentation.stage("extraction", documents=len(pending)):
+                extracted = map_chunks(
+                    extract_chunk,
+                    [blob_store.path(content_hash) for content_hash in pending],
+                    settings.PLAGIARISM_MAX_PAGES,
+                )
+            self.stats["bytes_extracted"] += sum(sizes[content_hash] for content_hash in pending)
+            texts.update(zip(pending, extracted))
+
+        with transaction.atomic():
+            SubmissionText.objects.filter(submission_id__in=hashes).delete()
+            SubmissionText.objects.bulk_create(
+                [
+                    SubmissionText(submission_id=submission_id, content_hash=content_hash, text=texts[content_hash])
+                    for submission_id, content_hash in hashes.items()
+                ],
+                batch_size=500,
+            )
+
+        return {submission_id: texts[content_hash] for submission_id, content_hash in hashes.items()}
+
+    def get_submission_vector(self, submission):
+        """Return the feature vector of a submission, reusing the stored one
+        while the file and `VECTOR_ENGINE_VERSION` are unchanged, or the one
+        stored for a byte-identical file."""
+        content_hash = self.submission_hash(submission)
+        stored = SubmissionVector.objects.filter(
+            submission=submission,
+            content_hash=content_hash,
+            engine_version=vectors.VECTOR_ENGINE_VERSION,
+        ).values_list("vector", flat=True).first()
+        if stored is not None:
+            return vectors.loads(stored)
+
+        blob = SubmissionVector.objects.filter(
+            content_hash=content_hash,
+            engine_version=vectors.VECTOR_ENGINE_VERSION,
+        ).values_list("vector", flat=True).first()
+        if blob is None:
+            document = self.get_submission_document(submission)
+            with instrumentation.stage("vectorization", documents=1):
+                vector = document.feature_vector()
+                blob = vectors.dumps(vector)
+        else:
+            vector = vectors.loads(blob)
+
+        SubmissionVector.objects.update_or_create(
+            submission=submission,
+            defaults={
+                "content_hash": content_hash,
+                "engine_version": vectors.VECTOR_ENGINE_VERSION,
+                "vector": blob,
+            },
+        )
+        return vector
+
+    def get_peer_vectors(self, submissions=None):
+        """Yield (submission, vector) for every peer submission, reading
+        stored vectors in one query. Only peers without a vector of the
+        current engine version are preprocessed, and their vectors stored."""
+        if submissions is None:
+            submissions = self.all_submissions
+
+        stored_vectors = {
+            submission_id: vectors.loads(vector)
+            for submission_id, vector in SubmissionVector.objects.filter(
+                submission__in=submissions,
+                engine_version=vectors.VECTOR_ENGINE_VERSION,
+            ).values_list("submission_id", "vector")
+        }
+
+        submissions = list(submissions)
+        missing = [submission.id for submission in submissions if submission.id not in stored_vectors]
+        if missing:
+            stored_vectors.update(self.build_submission_vectors(missing))
+
+        for submission in submissions:
+            yield submission, stored_vectors[submission.id]
+
+    def build_submission_vectors(self, submission_ids):
+        """Store the feature vectors of the given submissions, preprocessing
+        each distinct file once and reusing the vectors already stored for
+        byte-identical files."""
+        hashes = dict(Submission.objects.filter(id__in=submission_ids).values_list("id", "sha256"))
+        blobs = dict(
+            SubmissionVector.objects.filter(
+                content_hash__in=[content_hash for content_hash in hashes.values() if content_hash],
+                engine_version=vectors.VECTOR_ENGINE_VERSION,
+            ).values_list("content_hash", "vector")
+        )
+        built = {content_hash: vectors.loads(blob) for content_hash, blob in blobs.items()}
+
+        unvectorized = [submission_id for submission_id, content_hash in hashes.items() if content_hash not in blobs]
+        if unvectorized:
+            peers = list(self.get_peer_texts(Submission.objects.filter(id__in=unvectorized)))
+            hashes.update(
+                SubmissionText.objects.filter(
+                    submission_id__in=unvectorized
+                ).values_list("submission_id", "content_hash")
+            )
+            distinct = {}
+            for submission, text in peers:
+                distinct.setdefault(hashes[submission.id], text)
+            documents = self.preprocess_many(distinct.values())
+            with instrumentation.stage("vectorization", documents=len(documents)):
+                for content_hash, document in zip(distinct, documents):
+                    built[content_hash] = document.feature_vector()
+                    blobs[content_hash] = vectors.dumps(built[content_hash])
+
+        with transaction.atomic():
+            SubmissionVector.objects.filter(submission_id__in=hashes).delete()
+            SubmissionVector.objects.bulk_create(
+                [
+                    SubmissionVector(
+                        submission_id=submission_id,
+                        content_hash=content_hash,
+                        engine_version=vectors.VECTOR_ENGINE_VERSION,
+                        vector=blobs[content_hash],
+                    )
+                    for submission_id, content_hash in hashes.items()
+                ],
+                batch_size=500,
+            )
+
+        return {submission_id: built[content_hash] for submission_id, content_hash in hashes.items()}
+
+    def score_with_course_corpus(self, vector, candidates, threshold):
+        """Yield (submission, score) for the candidates scoring above the
+        threshold against the course's memory-mapped corpus.
+
+        Candidates without a stored vector are vectorized first, so that the
+        published corpus covers all of them.
+        """
+        missing = list(
+            candidates.exclude(vector__engine_version=vectors.VECTOR_ENGINE_VERSION).values_list("id", flat=True)
+        )
+        if missing:
+            self.build_submission_vectors(missing)
+
+        corpus = CourseCorpus(self.course_id)
+        with instrumentation.stage("corpus_scoring") as record, corpus.open() as snapshot:
+            ids = snapshot.submission_ids()
+            flagged = {
+                submission_id: score
+                for submission_id, score in zip(ids, snapshot.score(vector).tolist())
+                if score > threshold
+            }
+            # The submission's own row, once stored, is scored but no peer
+            record["peers"] = self.stats["pairs_scored"] = len(ids) - (self.current_submission.id in ids)
+        corpus.collect_unused()
+
+        for submission in candidates.filter(id__in=list(flagged)):
+            yield submission, flagged[submission.id]
+
     def preprocess_text(self, text):
-        tokens = word_tokenize(text)
-        stemmer = PorterStemmer()
-        stemmed_tokens = [stemmer.stem(token) for token in tokens if token.isalpha()]
-        preprocessed_text = ' '.join(stemmed_tokens)
-        return preprocessed_text
+        return text_processing.preprocess_text(text)
+
+    def preprocess_pages(self, pages):
+        return text_processing.preprocess_pages(pages)
+
+    def preprocess_document(self, text):
+        """Preprocess a text into a `TokenDocument` over the check's vocabulary."""
+        with instrumentation.stage("tokenization", documents=1):
+            stems = text_processing.preprocess_tokens(text)
+            return TokenDocument(self.vocabulary, self.vocabulary.encode(stems))
+
+    def preprocess_many(self, texts):
+        """Preprocess many texts into `TokenDocument`s, spread over the
+        process pool when `PLAGIARISM_WORKERS` is above 1."""
+        texts = list(texts)
+        with instrumentation.stage("tokenization", documents=len(texts)):
+            encoded = map_chunks(preprocess_chunk, texts, settings.PLAGIARISM_NLTK_DATA)
+            return [self.vocabulary.document(terms, local_ids) for terms, local_ids in encoded]
 
     def compare_texts(self, text1, text2):
         preprocessed_texts = self.preprocess_text(text1), self.preprocess_text(text2)
@@ -92,20 +459,110 @@ class PlagiarismCheckerService:
         similarity_matrix = cosine_similarity(vectorizer)
         return similarity_matrix[0][1]
 
+    def vectorize_documents(self, documents):
+        """Count matrix of `TokenDocument`s, equal to the matrix
+        `CountVectorizer` fits on their stems up to the column order, or
+        None when no document has a single token."""
+        return vectors.vector_matrix([document.feature_vector() for document in documents])
+
+    def compare_with_corpus(self, text, comparison_texts):
+        """Score one text against many with a single shared vocabulary.
+
+        Every text is preprocessed and vectorized once, and all comparison
+        texts are scored with one sparse matrix-vector product. The scores
+        are the same cosine similarities that `compare_texts` returns pair
+        by pair.
+        """
+        documents = self.preprocess_many([text, *comparison_texts])
+        return self.score_vectors(
+            documents[0].feature_vector(), [document.feature_vector() for document in documents[1:]]
+        )
+
+    def score_vectors(self, vector, comparison_vectors):
+        """Cosine similarity of one feature vector with each of many."""
+        matrix = vectors.vector_matrix([vector, *comparison_vectors])
+        if matrix is None:
+            return np.zeros(len(comparison_vectors))
+
+        matrix = normalize(matrix.astype(np.float64), norm="l2", copy=False)
+        scores = matrix[1:] @ matrix[0].T
+        return scores.toarray().ravel()
+
+    def exact_duplicates(self):
+        """Peers whose file is byte-identical to the current submission's."""
+        return self.all_submissions.filter(sha256=self.submission_hash(self.current_submission))
+
     def compare_with_all_submissions(self):
         self.report = []
-        current_text = self.extract_text_from_pdf(self.current_submission.file)
-        
-        for submission in self.all_submissions:
-            comparison_text = self.extract_text_from_pdf(submission.file)
-            similarity_percentage = self.compare_texts(current_text, comparison_text)
-            if similarity_percentage > 0.35:  # similarity_threshold in decimal
-                similarity_report = {
-                    "current_submission_id": str(self.current_submission.id),
-                    "other_submission_id": str(submission.id),
-                    "similarity_percentage": similarity_percentage * 100,
-                }
-                self.report.append(similarity_report)
+        threshold = settings.PLAGIARISM_SIMILARITY_THRESHOLD
+        matches = None
+        self.stats["engine"] = self.engine_version()
+        self.stats["candidates_before"] = self.all_submissions.count()
+
+        # Byte-identical files are reported at 100% without being scored
+        duplicates = list(self.exact_duplicates())
+        for submission in duplicates:
+            self.report.append({
+                "current_submission_id": str(self.current_submission.id),
+                "other_submission_id": str(submission.id),
+                "similarity_percentage": 100.0,
+            })
+        duplicate_ids = [submission.id for submission in duplicates]
+
+        current_text = self.get_submission_text(self.current_submission)
+
+        with instrumentation.stage("scoring", mode=settings.PLAGIARISM_SCORING_MODE) as record:
+            if settings.PLAGIARISM_SCORING_MODE == "winnowing":
+                fingerprints, matches = self.fingerprint_matches(current_text)
+                peers = self.all_submissions.filter(id__in=list(matches)).exclude(id__in=duplicate_ids)
+                record["peers"] = self.stats["candidates_after"] = self.stats["pairs_scored"] = len(matches)
+                scored = (
+                    (submission, len({p for p, _ in matches[submission.id]}) / len(fingerprints))
+                    for submission in peers
+                )
+            else:
+                candidates = self.all_submissions.exclude(id__in=duplicate_ids)
+                self.stats["candidates_after"] = self.stats["pairs_scored"] = candidates.count()
+
+                if settings.PLAGIARISM_SCORING_MODE == "corpus" and settings.PLAGIARISM_CORPUS_DIR:
+                    current_vector = self.get_submission_vector(self.current_submission)
+                    scored = self.score_with_course_corpus(current_vector, candidates, threshold)
+                elif settings.PLAGIARISM_SCORING_MODE == "corpus":
+                    current_vector = self.get_submission_vector(self.current_submission)
+                    peers = list(self.get_peer_vectors(candidates))
+                    record["peers"] = len(peers)
+                    scores = self.score_vectors(current_vector, [vector for _, vector in peers])
+                    scored = ((submission, score) for (submission, _), score in zip(peers, scores))
+                else:
+                    scored = (
+                        (submission, self.compare_texts(current_text, comparison_text))
+                        for submission, comparison_text in self.get_peer_texts(candidates)
+                    )
+
+            for submission, similarity_percentage in scored:
+                if similarity_percentage > threshold:
+                    similarity_report = {
+                        "current_submission_id": str(self.current_submission.id),
+                        "other_submission_id": str(submission.id),
+                        "similarity_percentage": similarity_percentage * 100,
+                    }
+                    self.report.append(similarity_report)
+            record["reported"] = len(self.report)
+
+        if self.report and settings.PLAGIARISM_WINNOWING_PASSAGES:
+            self.add_passages(current_text, matches)
+
+    def add_passages(self, current_text, matches=None):
+        """Record the matching passages of every reported pair, looking the
+        fingerprint matches up unless the check already has them."""
+        if matches is None:
+            _, matches = self.fingerprint_matches(current_text)
+        with instrumentation.stage("passages", pairs=len(self.report)):
+            for similarity_report in self.report:
+                similarity_report["passages"] = passages(
+                    matches.get(uuid.UUID(similarity_report["other_submission_id"]), []),
+                    settings.PLAGIARISM_WINNOWING_SHINGLE_SIZE,
+                )
 
     def store_similarity_results(self):
         try:
@@ -117,19 +574,11 @@ class PlagiarismCheckerService:
                     "current_submission_id": current_submission_id,
                     "other_submission_id": report["other_submission_id"],
                     "similarity_percentage": report["similarity_percentage"],
+                    "passages": report.get("passages", []),
                 })
 
-            existing_report = PlagiarismReport.objects.filter(submission_id=current_submission_id).first()
-
-            if existing_report:
-                existing_report.similarity_results = similarity_results
-                existing_report.save()
-            else:
-                plagiarism_report = PlagiarismReport(
-                    similarity_results=similarity_results,
-                    submission_id=current_submission_id,
-                )
-                plagiarism_report.save()
+            with instrumentation.stage("report_write", results=len(similarity_results)), transaction.atomic():
+                self.update_similarity_edges(similarity_results)
 
             return {"message": "Similarity results stored successfully."}
 
@@ -141,6 +590,237 @@ class PlagiarismCheckerService:
             error_message = "An error occurred while storing similarity results: " + str(e)
             return {"message": error_message}
 
+    def engine_version(self):
+        """Scoring mode and version of the scores this check writes."""
+        if settings.PLAGIARISM_SCORING_MODE == "winnowing":
+            return f"winnowing:{shingles.SHINGLE_HASH_VERSION}"
+        return f"{settings.PLAGIARISM_SCORING_MODE}:{vectors.VECTOR_ENGINE_VERSION}"
+
+    def update_similarity_edges(self, similarity_results):
+        """Write the current submission's results as similarity edges in both
+        directions, dropping its edges to peers no longer above the
+        threshold."""
+        current_submission_id = self.current_submission.id
+        engine_version = self.engine_version()
+
+        edges = []
+        for result in similarity_results:
+            other_submission_id = uuid.UUID(result["other_submission_id"])
+            edges.append(SimilarityEdge(
+                submission_id=current_submission_id,
+                other_submission_id=other_submission_id,
+                score=result["similarity_percentage"],
+                passages=result["passages"],
+                engine_version=engine_version,
+            ))
+            edges.append(SimilarityEdge(
+                submission_id=other_submission_id,
+                other_submission_id=current_submission_id,
+                score=result["similarity_percentage"],
+                passages=mirror_passages(result["passages"]),
+                engine_version=engine_version,
+            ))
+        peer_ids = {edge.other_submission_id for edge in edges[::2]}
+
+        stale = SimilarityEdge.objects.filter(
+            Q(submission_id=current_submission_id) | Q(other_submission_id=current_submission_id)
+        ).exclude(Q(submission_id__in=peer_ids) | Q(other_submission_id__in=peer_ids))
+        previous_peer_ids = set(stale.values_list("submission_id", flat=True))
+        previous_peer_ids.update(stale.values_list("other_submission_id", flat=True))
+        stale.delete()
+
+        write_similarity_edges(
+            edges,
+            peer_ids | previous_peer_ids | {current_submission_id},
+            ["score", "passages", "engine_version", "updated_at"],
+        )
+
+
+class AssignmentPlagiarismService(PlagiarismCheckerService):
+    """All-pairs plagiarism check of every submission of one assignment.
+
+    The term matrix of the assignment is built once and multiplied with
+    itself in blocks of `PLAGIARISM_BATCH_BLOCK_SIZE` rows, so memory stays
+    bounded by one block of scores however many submissions there are.
+    """
+
+    def __init__(self, assignment_id: uuid.UUID) -> None:
+        self.assignment_id = assignment_id
+        self.submissions = Submission.objects.filter(assignment__id=assignment_id)
+        self.results = {}
+
+    def compare_all_pairs(self):
+        threshold = settings.PLAGIARISM_SIMILARITY_THRESHOLD
+        block_size = settings.PLAGIARISM_BATCH_BLOCK_SIZE
+
+        peers = list(self.get_peer_vectors(self.submissions))
+        self.results = {str(submission.id): [] for submission, _ in peers}
+        self.stats.update(
+            engine=f"batch:{vectors.VECTOR_ENGINE_VERSION}",
+            candidates_before=len(peers),
+            candidates_after=len(peers),
+            pairs_scored=len(peers) * (len(peers) - 1) // 2,
+        )
+        matrix = vectors.vector_matrix([vector for _, vector in peers])
+        if matrix is None:
+            return
+
+        matrix = normalize(matrix.astype(np.float64), norm="l2", copy=False)
+        ids = [str(submission.id) for submission, _ in peers]
+
+        with instrumentation.stage("scoring", mode="batch", peers=len(peers)) as record:
+            for rows, columns, scores in blocked_pairs(matrix, threshold, block_size):
+                for row, column, score in zip(rows.tolist(), columns.tolist(), scores.tolist()):
+                    first, second = ids[row], ids[column]
+                    self.results[first].append({
+                        "current_submission_id": first,
+                        "other_submission_id": second,
+                        "similarity_percentage": score * 100,
+                    })
+                    self.results[second].append({
+                        "current_submission_id": second,
+                        "other_submission_id": first,
+                        "similarity_percentage": score * 100,
+                    })
+            record["reported"] = sum(len(results) for results in self.results.values()) // 2
+
+    def store_similarity_results(self):
+        """Write the similarity edges of every submission of the assignment
+        in bulk.
+
+        Edges to submissions of other assignments and the passages found by
+        earlier single checks are kept.
+        """
+        with instrumentation.stage("report_write", results=len(self.results)), transaction.atomic():
+            self.update_similarity_edges()
+            Assignment.objects.filter(id=self.assignment_id).update(batch_checked_at=timezone.now())
+
+        return {"message": f"Similarity results stored for {len(self.results)} submissions."}
+
+    def update_similarity_edges(self):
+        """Write every scored pair of the assignment as similarity edges,
+        dropping the edges between its submissions that no longer score
+        above the threshold. Passages found by earlier single checks are
+        kept."""
+        engine_version = f"batch:{vectors.VECTOR_ENGINE_VERSION}"
+        edges = [
+            SimilarityEdge(
+                submission_id=result["current_submission_id"],
+                other_submission_id=result["other_submission_id"],
+                score=result["similarity_percentage"],
+                engine_version=engine_version,
+            )
+            for results in self.results.values()
+            for result in results
+        ]
+        scored = {(str(edge.submission_id), str(edge.other_submission_id)) for edge in edges}
+
+        existing = SimilarityEdge.objects.filter(
+            submission__in=self.submissions, other_submission__in=self.submissions
+        ).values_list("id", "submission_id", "other_submission_id")
+        SimilarityEdge.objects.filter(
+            id__in=[
+                edge_id for edge_id, submission_id, other_submission_id in existing
+                if (str(submission_id), str(other_submission_id)) not in scored
+            ]
+        ).delete()
+
+        write_similarity_edges(edges, list(self.results), ["score", "engine_version", "updated_at"])
+
+
+class MicroBatchPlagiarismService(PlagiarismCheckerService):
+    """Check of several uploads of one course at once, as collected during a
+    deadline burst.
+
+    Every upload is scored against the course's memory-mapped corpus with
+    one sparse matrix-matrix product, so the corpus and the vectors stored
+    since it was published are read once per batch rather than once per
+    upload. Each upload gets the report
+    the "corpus" mode writes when it is checked alone, scoring every peer.
+    """
+
+    def __init__(self, course_id: int, submission_ids) -> None:
+        self.course_id = course_id
+        self.submission_ids = [uuid.UUID(str(submission_id)) for submission_id in submission_ids]
+        self.all_submissions = Submission.objects.filter(assignment__course__id=course_id)
+        self.checkers = {}
+
+        text_processing.resources(settings.PLAGIARISM_NLTK_DATA)
+
+    def compare_batch(self):
+        threshold = settings.PLAGIARISM_SIMILARITY_THRESHOLD
+        batch = list(self.all_submissions.filter(id__in=self.submission_ids))
+        self.checkers = {}
+        if not batch:
+            return
+
+        # Peers without a stored vector are vectorized first, so that the
+        # published corpus covers all of them
+        missing = list(
+            self.all_submissions.exclude(
+                vector__engine_version=vectors.VECTOR_ENGINE_VERSION
+            ).values_list("id", flat=True)
+        )
+        if missing:
+            self.build_submission_vectors(missing)
+        batch_vectors = [self.get_submission_vector(submission) for submission in batch]
+
+        # Byte-identical files are reported at 100% without being scored
+        hashes = {submission.id: self.submission_hash(submission) for submission in batch}
+        duplicates = {}
+        for submission_id, content_hash in self.all_submissions.filter(
+            sha256__in=set(hashes.values())
+        ).values_list("id", "sha256"):
+            duplicates.setdefault(content_hash, set()).add(submission_id)
+
+        corpus = CourseCorpus(self.course_id)
+        with instrumentation.stage("corpus_scoring", documents=len(batch)) as record, corpus.open() as snapshot:
+            ids = snapshot.submission_ids()
+            scores = snapshot.score_many(batch_vectors)
+            record["peers"] = len(ids)
+        corpus.collect_unused()
+
+        for submission, row in zip(batch, scores):
+            checker = PlagiarismCheckerService(self.course_id, submission.id, submission.student_id)
+            checker.current_submission = submission
+            peers = len(ids) - (submission.id in ids)
+            checker.stats.update(
+                engine=checker.engine_version(),
+                candidates_before=peers,
+                candidates_after=peers,
+                pairs_scored=peers,
+                # What the batch extracted is counted once, on its first upload
+                bytes_extracted=0 if self.checkers else self.stats["bytes_extracted"],
+            )
+            current_submission_id = str(submission.id)
+            excluded = duplicates.get(hashes[submission.id], set()) | {submission.id}
+
+            for other_id in excluded - {submission.id}:
+                checker.report.append({
+                    "current_submission_id": current_submission_id,
+                    "other_submission_id": str(other_id),
+                    "similarity_percentage": 100.0,
+                })
+            for other_id, score in zip(ids, row.tolist()):
+                if score > threshold and other_id not in excluded:
+                    checker.report.append({
+                        "current_submission_id": current_submission_id,
+                        "other_submission_id": str(other_id),
+                        "similarity_percentage": score * 100,
+                    })
+
+            if checker.report and settings.PLAGIARISM_WINNOWING_PASSAGES:
+                checker.add_passages(checker.get_submission_text(submission))
+            self.checkers[submission.id] = checker
+
+    def store_submission_results(self, submission_id):
+        """Store the report of one upload of the batch as similarity edges
+        in both directions, like a single check's."""
+        checker = self.checkers.get(uuid.UUID(str(submission_id)))
+        if checker is None:
+            return {"message": "Submission not found in the batch."}
+        return checker.store_similarity_results()
+
 
 ACADEMIC_YEAR = (
     f"{datetime.datetime.now().year} - {int(datetime.datetime.now().year) + 1}"
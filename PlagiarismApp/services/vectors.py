@@ -0,0 +1,57 @@
+"""Hashed-feature term vectors stored per submission as `.npz` blobs.
+
+A vector is a pair of arrays: the sorted 64-bit hashes of the counted
+terms of a document and their counts. Vectors of any documents can be
+stacked into one matrix without a shared vocabulary, so a check can build
+the matrix of a whole course from stored vectors alone.
+"""
+import io
+
+import numpy as np
+from scipy import sparse
+
+# Bumped whenever preprocessing or the feature hashes change; stored
+# vectors of another version are recomputed on their next use
+VECTOR_ENGINE_VERSION = "1"
+
+
+def dumps(vector) -> bytes:
+    features, counts = vector
+    with io.BytesIO() as buffer:
+        np.savez_compressed(buffer, features=features, counts=counts)
+        return buffer.getvalue()
+
+
+def loads(blob):
+    with np.load(io.BytesIO(bytes(blob))) as arrays:
+        return arrays["features"], arrays["counts"]
+
+
+def vector_matrix(vectors):
+    """Count matrix with one row per vector and one column per feature
+    present in any of them, or None when the vectors have no features."""
+    matrix, _ = feature_matrix(vectors)
+    return matrix
+
+
+def feature_matrix(vectors):
+    """`vector_matrix` and the sorted feature hash of each of its columns."""
+    if not vectors:
+        return None, None
+
+    features = np.concatenate([vector[0] for vector in vectors])
+    if not len(features):
+        return None, None
+
+    columns, indices = np.unique(features, return_inverse=True)
+    lengths = [len(vector[0]) for vector in vectors]
+    matrix = sparse.csr_matrix(
+        (
+            np.concatenate([vector[1] for vector in vectors]).astype(np.int64),
+            indices.ravel(),
+            np.concatenate([[0], np.cumsum(lengths)]),
+        ),
+        shape=(len(vectors), len(columns)),
+    )
+    matrix.sort_indices()
+    return matrix, columns
@@ -0,0 +1,104 @@
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from ..models import Fingerprint
+from .shingles import winnow
+
+# SQLite caps the number of variables in one statement
+LOOKUP_BATCH_SIZE = 500
+
+
+def fingerprint_document(document):
+    """Winnowed (hash, position) fingerprints of a document, with the
+    hashes signed to fit `Fingerprint.hash`."""
+    hashes = document.shingle_hashes(settings.PLAGIARISM_WINNOWING_SHINGLE_SIZE)
+    hashes, positions = winnow(hashes, settings.PLAGIARISM_WINNOWING_WINDOW)
+    return list(zip(hashes.view(np.int64).tolist(), positions.tolist()))
+
+
+def passages(matches, shingle_size: int):
+    """Merge (position, other_position) fingerprint matches into passages of
+    token ranges that run in step in both documents."""
+    found = []
+    in_step = sorted(matches, key=lambda match: (match[1] - match[0], match[0]))
+    for position, other_position in in_step:
+        if found:
+            last = found[-1]
+            if (
+                other_position - position == last["other_start"] - last["start"]
+                and position <= last["end"]
+            ):
+                last["end"] = max(last["end"], position + shingle_size)
+                last["other_end"] = max(last["other_end"], other_position + shingle_size)
+                continue
+        found.append({
+            "start": position,
+            "end": position + shingle_size,
+            "other_start": other_position,
+            "other_end": other_position + shingle_size,
+        })
+    return sorted(found, key=lambda passage: passage["start"])
+
+
+class FingerprintIndex:
+    """Inverted index of winnowed fingerprints (hash -> submission, position)
+    for one course, stored on `Fingerprint`."""
+
+    def __init__(self, course_id: int) -> None:
+        self.course_id = course_id
+
+    def indexed_submission_ids(self):
+        return set(
+            Fingerprint.objects.filter(course_id=self.course_id)
+            .values_list("submission_id", flat=True)
+            .distinct()
+        )
+
+    def update(self, submission, document):
+        """Replace the fingerprints of a submission and return them."""
+        fingerprints = fingerprint_document(document)
+        with transaction.atomic():
+            self.remove(submission.id)
+            Fingerprint.objects.bulk_create(
+                [
+                    Fingerprint(
+                        hash=value,
+                        position=position,
+                        course_id=self.course_id,
+                        submission=submission,
+                    )
+                    for value, position in fingerprints
+                ],
+                batch_size=LOOKUP_BATCH_SIZE,
+            )
+        return fingerprints
+
+    def remove(self, submission_id):
+        Fingerprint.objects.filter(submission_id=submission_id).delete()
+
+    def matches(self, submission_id, fingerprints):
+        """Return {other_submission_id: [(position, other_position), ...]}
+        for every indexed fingerprint shared with `fingerprints`."""
+        positions = defaultdict(list)
+        for value, position in fingerprints:
+            positions[value].append(position)
+
+        found = defaultdict(list)
+        hashes = list(positions)
+        for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+            rows = (
+                Fingerprint.objects.filter(
+                    course_id=self.course_id,
+                    hash__in=hashes[start:start + LOOKUP_BATCH_SIZE],
+                )
+                .exclude(submission_id=submission_id)
+                .values_list("submission_id", "hash", "position")
+            )
+            for other_submission_id, value, other_position in rows:
+                found[other_submission_id].extend(
+                    (position, other_position) for position in positions[value]
+                )
+        return found
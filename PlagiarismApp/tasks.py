@@ -1,14 +1,349 @@
-from celery import shared_task
-from .services.utils import PlagiarismCheckerService
+from datetime import timedelta
+from celery import chain, shared_task
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from threadpoolctl import threadpool_limits
+from .models import Assignment, Notification, PlagiarismCheckRun, Program, Student, Submission
+from .services import instrumentation, metrics, microbatch
+from .services.utils import AssignmentPlagiarismService, MicroBatchPlagiarismService, PlagiarismCheckerService
+import logging
+import time
 import uuid
 
+logger = logging.getLogger(__name__)
+
+
+def in_deadline_burst(assignment: Assignment) -> bool:
+    """Whether an upload now falls in the burst before the assignment's due
+    date that its batch check will cover."""
+    window = settings.PLAGIARISM_DEADLINE_BATCH_WINDOW
+    now = timezone.now()
+    return bool(
+        window
+        and assignment.batch_checked_at is None
+        and now <= assignment.due_date <= now + timedelta(seconds=window)
+    )
+
+
+def micro_batching() -> bool:
+    """Whether burst uploads are checked in micro-batches rather than left
+    to the batch check of their assignment."""
+    return bool(
+        settings.PLAGIARISM_MICROBATCH_WINDOW
+        and settings.PLAGIARISM_SCORING_MODE == "corpus"
+        and settings.PLAGIARISM_CORPUS_DIR
+    )
+
+
+def schedule_plagiarism_check(
+    course_id: int,
+    assignment: Assignment,
+    submission_id: uuid,
+    student_id: uuid,
+    content_hash: str,
+    priority: bool = False,
+):
+    """Queue the check of an upload, superseding any check still pending for
+    the submission.
+
+    The text is extracted on the "extraction" queue first, then scored on
+    the "scoring" queue; `priority` checks (requested by a lecturer) run
+    both steps on the "priority" queue without delay. The id of the new
+    check is stored on the submission and the previous one is revoked; a
+    superseded check that runs anyway finds another id there and drops its
+    work. Uploads in the deadline burst have their text extracted and join
+    the pending micro-batch, or queue nothing when micro-batching is off.
+    """
+    burst = in_deadline_burst(assignment) and not priority
+    previous = Submission.objects.filter(id=submission_id).values_list("check_task_id", flat=True).first()
+    task_id = None if burst and not micro_batching() else str(uuid.uuid4())
+    Submission.objects.filter(id=submission_id).update(check_task_id=task_id)
+
+    if previous:
+        check_for_plagiarism.app.control.revoke(previous)
+        PlagiarismCheckRun.objects.filter(task_id=previous, outcome="queued").update(
+            outcome="superseded", finished_at=timezone.now()
+        )
+        metrics.increment("checks_revoked")
+
+    if task_id is None:
+        metrics.increment("checks_deferred_to_batch")
+        return None
+
+    if burst:
+        queue_check_run(task_id, course_id, submission_id=submission_id, assignment_id=assignment.id)
+        extract_submission_text.delay(submission_id, content_hash)
+        armed, size = microbatch.enqueue(course_id, submission_id, task_id, content_hash)
+        metrics.increment("checks_micro_batched")
+        if settings.PLAGIARISM_MICROBATCH_MAX_SIZE and size % settings.PLAGIARISM_MICROBATCH_MAX_SIZE == 0:
+            return flush_micro_batch.delay()
+        if armed:
+            return flush_micro_batch.apply_async(countdown=settings.PLAGIARISM_MICROBATCH_WINDOW)
+        return None
+
+    metrics.increment("checks_scheduled")
+    extract = extract_submission_text.si(submission_id, content_hash)
+    check = check_for_plagiarism.si(course_id, submission_id, student_id, content_hash=content_hash).set(
+        task_id=task_id
+    )
+    if priority:
+        queue_check_run(task_id, course_id, submission_id=submission_id, assignment_id=assignment.id)
+        return chain(extract.set(queue="priority"), check.set(queue="priority")).apply_async()
+
+    queue_check_run(
+        task_id,
+        course_id,
+        queued_at=timezone.now() + timedelta(seconds=settings.PLAGIARISM_CHECK_DELAY),
+        submission_id=submission_id,
+        assignment_id=assignment.id,
+    )
+    return chain(extract, check).apply_async(countdown=settings.PLAGIARISM_CHECK_DELAY)
+
+
+def queue_check_run(task_id: str, course_id: int, queued_at=None, **fields):
+    """Record a check as queued, due at `queued_at` (now by default)."""
+    PlagiarismCheckRun.objects.create(
+        task_id=task_id, course_id=course_id, queued_at=queued_at or timezone.now(), **fields
+    )
+
+
+def start_check_run(task_id: str):
+    PlagiarismCheckRun.objects.filter(task_id=task_id).update(started_at=timezone.now(), outcome="running")
+
+
+def finish_check_run(task_id: str, outcome: str, checker=None):
+    """Record the outcome of a check, with the counts of its checker."""
+    fields = {"finished_at": timezone.now(), "outcome": outcome}
+    if checker is not None:
+        fields.update(checker.stats)
+    PlagiarismCheckRun.objects.filter(task_id=task_id).update(**fields)
+
+
+def is_superseded(submission_id: uuid, task_id: str, content_hash: str = None) -> bool:
+    """Whether a newer upload or check has replaced this one."""
+    submission = Submission.objects.filter(id=submission_id).values("check_task_id", "sha256").first()
+    if submission is None:
+        return True
+    if submission["check_task_id"] is not None and submission["check_task_id"] != task_id:
+        return True
+    return content_hash is not None and submission["sha256"] != content_hash
+
 
 @shared_task
-def check_for_plagiarism(course_id: int, submission_id: uuid, student_id: uuid):
+def extract_submission_text(submission_id: uuid, content_hash: str = None):
+    """Extract and store the text of an upload ahead of its check, so the
+    scoring workers only read it; the scoring modes that compare feature
+    vectors also get the upload's vector, tokenized page by page as the
+    text is extracted. Skipped once the file has changed."""
+    submission = Submission.objects.filter(id=submission_id).first()
+    if submission is None or (content_hash is not None and submission.sha256 != content_hash):
+        return None
+
+    checker = PlagiarismCheckerService(course_id=None, submission_id=submission_id, student_id=None)
+    with instrumentation.context(submission_id=submission_id):
+        if settings.PLAGIARISM_SCORING_MODE == "corpus":
+            checker.get_submission_vector(submission)
+        else:
+            checker.get_submission_text(submission)
 
+
+@shared_task(bind=True)
+def check_for_plagiarism(self, course_id: int, submission_id: uuid, student_id: uuid, content_hash: str = None):
+    if is_superseded(submission_id, self.request.id, content_hash):
+        logger.info("Plagiarism check %s of submission %s superseded", self.request.id, submission_id)
+        finish_check_run(self.request.id, "superseded")
+        metrics.increment("checks_superseded")
+        return {"message": "Superseded by a newer check."}
+
+    start_check_run(self.request.id)
+    started = time.perf_counter()
     checker = PlagiarismCheckerService(
         course_id=course_id, submission_id=submission_id, student_id=student_id
     )
-    checker.compare_with_all_submissions()        
+    logger.info(
+        "Plagiarism check for submission %s started in %.3fs",
+        submission_id, time.perf_counter() - started,
+    )
+    try:
+        with instrumentation.context(task_id=self.request.id, course_id=course_id, submission_id=submission_id):
+            with instrumentation.stage("check"):
+                with threadpool_limits(limits=settings.PLAGIARISM_BLAS_THREADS):
+                    checker.compare_with_all_submissions()
 
-    return checker.store_similarity_results()
\ No newline at end of file
+                # The file may have changed while the check ran
+                if is_superseded(submission_id, self.request.id, content_hash):
+                    logger.info(
+                        "Plagiarism check %s of submission %s superseded while running",
+                        self.request.id, submission_id,
+                    )
+                    finish_check_run(self.request.id, "discarded", checker)
+                    metrics.increment("checks_discarded")
+                    return {"message": "Superseded by a newer check."}
+
+                result = checker.store_similarity_results()
+    except Exception:
+        finish_check_run(self.request.id, "failed", checker)
+        raise
+
+    Submission.objects.filter(id=submission_id, check_task_id=self.request.id).update(check_task_id=None)
+    finish_check_run(self.request.id, "completed", checker)
+    metrics.increment("checks_completed")
+    return result
+
+
+@shared_task
+def flush_micro_batch():
+    """Check every upload pending in the micro-batch, scoring the uploads of
+    each course together, and store each one's report."""
+    pending = microbatch.take()
+    if not pending:
+        return {"message": "No pending checks."}
+
+    started = time.perf_counter()
+    courses = {}
+    for entry in pending:
+        if is_superseded(entry["submission_id"], entry["task_id"], entry["content_hash"]):
+            finish_check_run(entry["task_id"], "superseded")
+            metrics.increment("checks_superseded")
+            continue
+        courses.setdefault(entry["course_id"], {})[entry["submission_id"]] = entry
+
+    # A course that fails leaves the checks of the others to run
+    failed = 0
+    for course_id, entries in courses.items():
+        unfinished = dict(entries)
+        for entry in entries.values():
+            start_check_run(entry["task_id"])
+        checker = MicroBatchPlagiarismService(course_id=course_id, submission_ids=list(entries))
+        try:
+            with instrumentation.context(course_id=course_id), instrumentation.stage("check", documents=len(entries)):
+                with threadpool_limits(limits=settings.PLAGIARISM_BLAS_THREADS):
+                    checker.compare_batch()
+
+            for submission_id, entry in entries.items():
+                submission_checker = checker.checkers.get(uuid.UUID(submission_id))
+                # The file may have changed while the batch ran
+                if is_superseded(submission_id, entry["task_id"], entry["content_hash"]):
+                    finish_check_run(entry["task_id"], "discarded", submission_checker)
+                    metrics.increment("checks_discarded")
+                else:
+                    with instrumentation.context(
+                        task_id=entry["task_id"], course_id=course_id, submission_id=submission_id
+                    ):
+                        checker.store_submission_results(submission_id)
+                    Submission.objects.filter(id=submission_id, check_task_id=entry["task_id"]).update(
+                        check_task_id=None
+                    )
+                    finish_check_run(entry["task_id"], "completed", submission_checker)
+                    metrics.increment("checks_completed")
+                del unfinished[submission_id]
+        except Exception:
+            logger.exception(
+                "Micro-batch check of %d submissions in course %s failed", len(unfinished), course_id
+            )
+            for entry in unfinished.values():
+                finish_check_run(entry["task_id"], "failed")
+            failed += len(unfinished)
+
+    checked = sum(len(entries) for entries in courses.values()) - failed
+    logger.info(
+        "Micro-batch of %d submissions in %d courses checked in %.3fs, %d failed, oldest queued %.1fs ago",
+        checked, len(courses), time.perf_counter() - started, failed, time.time() - pending[0]["queued_at"],
+    )
+    return {"message": f"Similarity results stored for {checked} submissions, {failed} failed."}
+
+
+def claim_assignment(assignment_id: uuid, task_id: str) -> bool:
+    """Let the batch check `task_id` hold an assignment that is not checked
+    yet and not held by a run claimed within the claim timeout."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.PLAGIARISM_BATCH_CLAIM_TIMEOUT)
+    return bool(
+        Assignment.objects.filter(id=assignment_id, batch_checked_at__isnull=True)
+        .filter(Q(batch_claimed_at__isnull=True) | Q(batch_claimed_at__lt=stale))
+        .update(batch_task_id=task_id, batch_claimed_at=now)
+    )
+
+
+def start_assignment_run(assignment_id: uuid, task_id: str) -> bool:
+    """Start the batch check `task_id` if it still holds the assignment and
+    no other delivery of it has started."""
+    holds = Assignment.objects.filter(
+        id=assignment_id, batch_task_id=task_id, batch_checked_at__isnull=True
+    ).exists()
+    if not holds:
+        PlagiarismCheckRun.objects.filter(task_id=task_id, outcome="queued").update(
+            outcome="superseded", finished_at=timezone.now()
+        )
+        return False
+    return bool(
+        PlagiarismCheckRun.objects.filter(task_id=task_id, outcome="queued").update(
+            started_at=timezone.now(), outcome="running"
+        )
+    )
+
+
+@shared_task(bind=True)
+def check_assignment_for_plagiarism(self, assignment_id: uuid):
+    # A late redelivery or a run whose claim lapsed finds the assignment
+    # held by another run, or already checked
+    if not start_assignment_run(assignment_id, self.request.id):
+        logger.info("Batch check %s of assignment %s skipped: held by another run", self.request.id, assignment_id)
+        return {"message": "Another run holds or has finished the batch check."}
+
+    started = time.perf_counter()
+    checker = AssignmentPlagiarismService(assignment_id=assignment_id)
+    logger.info(
+        "Plagiarism check for assignment %s started in %.3fs",
+        assignment_id, time.perf_counter() - started,
+    )
+    try:
+        with instrumentation.context(assignment_id=assignment_id), instrumentation.stage("batch_check"):
+            with threadpool_limits(limits=settings.PLAGIARISM_BLAS_THREADS):
+                checker.compare_all_pairs()
+
+            result = checker.store_similarity_results()
+    except Exception:
+        finish_check_run(self.request.id, "failed", checker)
+        # Release the claim so the next due-assignment run retries
+        Assignment.objects.filter(id=assignment_id, batch_task_id=self.request.id).update(batch_claimed_at=None)
+        raise
+
+    finish_check_run(self.request.id, "completed", checker)
+    return result
+
+
+@shared_task
+def check_due_assignments():
+    due_assignments = Assignment.objects.filter(
+        plagiarism_checker=True,
+        due_date__lte=timezone.now(),
+        batch_checked_at__isnull=True,
+    ).values_list("id", "course_id")
+
+    for assignment_id, course_id in due_assignments:
+        task_id = str(uuid.uuid4())
+        if not claim_assignment(assignment_id, task_id):
+            continue
+        queue_check_run(task_id, course_id, assignment_id=assignment_id)
+        check_assignment_for_plagiarism.apply_async((assignment_id,), task_id=task_id)
+
+
+@shared_task
+def notify_course_students(course_id: int, sender_id: int, message: str, link: str):
+    """Send one notification to every student of the course's programs."""
+    students = Student.objects.filter(program__in=Program.objects.filter(course__id=course_id))
+    Notification.objects.bulk_create(
+        [
+            Notification(
+                recipient_id=student.user_id,
+                sender_id=sender_id,
+                message=message,
+                link=link,
+                notification_type="green",
+            )
+            for student in students
+        ],
+        batch_size=500,
+    )
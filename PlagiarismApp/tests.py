@@ -1,3 +1,1328 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import nltk
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings, tag
+from django.urls import reverse
+from django.utils import timezone
+from nltk.stem import PorterStemmer
+from pydoc_data.topics import topics
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from . import views
+from .benchmarks.accuracy import flagged_pairs
+from .benchmarks.preprocessing import python_shingle_hashes, python_winnow
+from .models import (
+    Assignment,
+    Course,
+    CustomUser,
+    Department,
+    Fingerprint,
+    Lecturer,
+    PlagiarismCheckRun,
+    Preferences,
+    SimilarityEdge,
+    Student,
+    Submission,
+    SubmissionStatus,
+    SubmissionText,
+    SubmissionVector,
+)
+from .services import blobs, instrumentation, metrics, shingles, vectors
+from .services import text as text_processing
+from .services.corpus import CourseCorpus
+from .services.join import blocked_pairs
+from .services.parallel import extract_chunk, map_chunks
+from .services.synthetic import synthetic_texts, text_pdf
+from .services.utils import AssignmentPlagiarismService, MicroBatchPlagiarismService, PlagiarismCheckerService
+from .services.winnowing import passages
+from .tasks import (
+    check_assignment_for_plagiarism,
+    check_due_assignments,
+    check_for_plagiarism,
+    flush_micro_batch,
+    queue_check_run,
+    schedule_plagiarism_check,
+)
+
+
+class PreprocessingTests(SimpleTestCase):
+    """Cached stems give the output of `nltk.word_tokenize` and a fresh
+    `PorterStemmer`."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        text_processing.resources(settings.PLAGIARISM_NLTK_DATA)
+
+    def uncached(self, text):
+        stemmer = PorterStemmer()
+        return " ".join(stemmer.stem(token) for token in nltk.word_tokenize(text) if token.isalpha())
+
+    def test_python_documentation(self):
+        # Prose mixed with code, quotes, contractions and abbreviations,
+        # read twice so that the second pass is served from the cache
+        stem = text_processing.resources()["stem"]
+        stem.cache_clear()
+        for _ in range(2):
+            for key in sorted(topics):
+                with self.subTest(topic=key):
+                    self.assertEqual(text_processing.preprocess_text(topics[key]), self.uncached(topics[key]))
+        self.assertGreater(stem.cache_info().hits, 0)
+
+
+class PageExtractionTests(SimpleTestCase):
+    """Pages streamed one at a time give the text and stems of the whole
+    file."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        text_processing.resources(settings.PLAGIARISM_NLTK_DATA)
+        cls.pdf = text_pdf(synthetic_texts(1, words=2000)[0])
+
+    def test_pages_joined(self):
+        pages = list(text_processing.iter_pdf_pages(self.pdf))
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(text_processing.extract_text_from_pdf(self.pdf), "".join(pages))
+        self.assertEqual(list(text_processing.iter_pdf_pages(self.pdf, max_pages=2)), pages[:2])
+
+    def test_stems_across_pages(self):
+        text = text_processing.extract_text_from_pdf(self.pdf)
+        self.assertEqual(
+            text_processing.preprocess_pages(text_processing.iter_pdf_pages(self.pdf)),
+            text_processing.preprocess_text(text),
+        )
+
+    def test_abbreviation_at_page_end(self):
+        text = "We met Mr. Smith and the others etc. and then left. Dr. Jones came, i.e. late."
+        # Every page break after a space, most of them after an abbreviation
+        for split_at in [index + 1 for index, character in enumerate(text) if character == " "]:
+            with self.subTest(page=text[:split_at]):
+                pages = [text[:split_at], text[split_at:]]
+                self.assertEqual(text_processing.preprocess_pages(pages), text_processing.preprocess_text(text))
+
+        pages = ["We met Mr. ", "Smith and the others etc. ", "and then left. Dr. ", "Jones came."]
+        self.assertEqual(text_processing.preprocess_pages(pages), text_processing.preprocess_text("".join(pages)))
+
+    def test_blob_document(self):
+        checker = PlagiarismCheckerService(course_id=None, submission_id=None, student_id=None)
+        with tempfile.TemporaryDirectory() as directory, override_settings(BLOB_STORE_DIR=directory):
+            sha256, _ = blobs.put(self.pdf)
+            text, document = checker.extract_blob_document(sha256)
+        self.assertEqual(text, text_processing.extract_text_from_pdf(self.pdf))
+        self.assertEqual(" ".join(document.stems()), text_processing.preprocess_text(text))
+
+
+class ShinglingTests(SimpleTestCase):
+    """The NumPy shingle hashes and winnowing equal their Python loops."""
+
+    def test_shingle_hashes(self):
+        rng = np.random.default_rng(0)
+        for length in [0, 1, 4, 5, 6, 300]:
+            token_hashes = rng.integers(0, 2 ** 64, size=length, dtype=np.uint64)
+            for size in [1, 3, 5]:
+                with self.subTest(length=length, size=size):
+                    self.assertEqual(
+                        shingles.shingle_hashes(token_hashes, size).tolist(),
+                        python_shingle_hashes(token_hashes.tolist(), size),
+                    )
+
+    def test_winnow(self):
+        rng = np.random.default_rng(0)
+        for length in [0, 1, 3, 4, 5, 300]:
+            # Few distinct values, so that windows hold ties
+            for high in [5, 2 ** 63]:
+                hashes = rng.integers(0, high, size=length, dtype=np.int64)
+                for window in [1, 4, 8]:
+                    with self.subTest(length=length, high=high, window=window):
+                        values, positions = shingles.winnow(hashes, window)
+                        self.assertEqual(
+                            list(zip(values.tolist(), positions.tolist())),
+                            python_winnow(hashes.tolist(), window),
+                        )
+
+
+class TokenDocumentTests(SimpleTestCase):
+    """Token-ID documents hold the stems, and count the terms, that the stem
+    strings do."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.checker = PlagiarismCheckerService(course_id=None, submission_id=None, student_id=None)
+        cls.texts = synthetic_texts(12, words=300)
+
+    def test_stems(self):
+        for text, document in zip(self.texts, self.checker.preprocess_many(self.texts)):
+            self.assertEqual(" ".join(document.stems()), self.checker.preprocess_text(text))
+            self.assertEqual(document.stems(), self.checker.preprocess_document(text).stems())
+
+    def test_counts(self):
+        # Hashed features order the columns differently, which leaves every
+        # dot product between rows unchanged
+        expected = CountVectorizer().fit_transform(self.checker.preprocess_text(text) for text in self.texts)
+        matrix = self.checker.vectorize_documents(self.checker.preprocess_many(self.texts))
+        self.assertEqual(matrix.shape, expected.shape)
+        self.assertEqual(((matrix @ matrix.T) != (expected @ expected.T)).nnz, 0)
+
+
+class CorpusScoringTests(SimpleTestCase):
+    """One shared-vocabulary matrix gives the scores of `compare_texts`."""
+
+    def test_scores_equal_pairwise(self):
+        checker = PlagiarismCheckerService(course_id=None, submission_id=None, student_id=None)
+        texts = synthetic_texts(12, words=300)
+        for current in range(len(texts)):
+            others = texts[:current] + texts[current + 1:]
+            scores = checker.compare_with_corpus(texts[current], others)
+            self.assertEqual(len(scores), len(others))
+            for other, score in zip(others, scores):
+                self.assertAlmostEqual(score, checker.compare_texts(texts[current], other), places=12)
+
+    def test_empty_texts(self):
+        checker = PlagiarismCheckerService(course_id=None, submission_id=None, student_id=None)
+        self.assertEqual(list(checker.compare_with_corpus("", ["", "42 !"])), [0, 0])
+
+    @override_settings(PLAGIARISM_SCORING_MODE="copus")
+    def test_unknown_mode(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "'copus'"):
+            PlagiarismCheckerService(course_id=None, submission_id=None, student_id=None)
+
+
+class AccuracyBaselineTests(SimpleTestCase):
+    """The benchmark's one-vocabulary baseline flags the pairs that
+    `compare_texts` flags pair by pair."""
+
+    def test_same_pairs(self):
+        checker = PlagiarismCheckerService(course_id=None, submission_id=None, student_id=None)
+        texts = synthetic_texts(16, words=300)
+        threshold = settings.PLAGIARISM_SIMILARITY_THRESHOLD
+        expected = {
+            (first, second)
+            for first in range(len(texts))
+            for second in range(first + 1, len(texts))
+            if checker.compare_texts(texts[first], texts[second]) > threshold
+        }
+        self.assertTrue(expected)
+        self.assertEqual(flagged_pairs([checker.preprocess_text(text) for text in texts], threshold), expected)
+
+
+class ProcessPoolTests(SimpleTestCase):
+    """Spreading extraction and preprocessing over the process pool changes
+    no result."""
+
+    def test_same_scores(self):
+        checker = PlagiarismCheckerService(course_id=None, submission_id=None, student_id=None)
+        texts = synthetic_texts(20, words=300)
+        serial = checker.compare_with_corpus(texts[0], texts[1:])
+        with override_settings(PLAGIARISM_WORKERS=2, PLAGIARISM_WORKER_CHUNK_SIZE=4):
+            pooled = checker.compare_with_corpus(texts[0], texts[1:])
+        self.assertTrue(np.array_equal(pooled, serial))
+
+    def test_same_texts(self):
+        pdfs = [text_pdf(text) for text in synthetic_texts(6, words=300)]
+        with tempfile.TemporaryDirectory() as directory, override_settings(BLOB_STORE_DIR=directory):
+            paths = [blobs.path(blobs.put(pdf)[0]) for pdf in pdfs]
+            with override_settings(PLAGIARISM_WORKERS=2, PLAGIARISM_WORKER_CHUNK_SIZE=2):
+                pooled = map_chunks(extract_chunk, paths)
+        self.assertEqual(pooled, [text_processing.extract_text_from_pdf(pdf) for pdf in pdfs])
+
+
+class BlockedPairsTests(SimpleTestCase):
+    """The blocked all-pairs product reports exactly the pairs brute force
+    scores above the threshold."""
+
+    def test_all_pairs(self):
+        checker = PlagiarismCheckerService(course_id=None, submission_id=None, student_id=None)
+        matrix = checker.vectorize_documents(checker.preprocess_many(synthetic_texts(40, words=300)))
+        normalized = normalize(matrix.astype(np.float64), norm="l2")
+        scores = (normalized @ normalized.T).toarray()
+
+        for threshold in [0.3, 0.35, 0.5, 0.9]:
+            with self.subTest(threshold=threshold):
+                rows, columns = np.nonzero(np.triu(scores, k=1) > threshold)
+                expected = dict(zip(zip(rows.tolist(), columns.tolist()), scores[rows, columns].tolist()))
+                found = {}
+                for first, second, block_scores in blocked_pairs(normalized, threshold, block_size=7):
+                    found.update(zip(zip(first.tolist(), second.tolist()), block_scores.tolist()))
+                self.assertEqual(found.keys(), expected.keys())
+                for pair, score in found.items():
+                    self.assertAlmostEqual(score, expected[pair], places=12)
+
+
+class StageTests(SimpleTestCase):
+    """Nested stages each report their own peak, and hand it up to the
+    stages around them."""
+
+    MIB = 2 ** 20
+
+    def setUp(self):
+        super().setUp()
+        if not tracemalloc.is_tracing():
+            self.addCleanup(tracemalloc.stop)
+        self.enterContext(override_settings(PLAGIARISM_TRACE_MEMORY=True))
+
+    def allocate(self, size):
+        block = bytearray(size)
+        del block
+
+    def test_peak_before_inner_stage(self):
+        with instrumentation.stage("outer") as outer:
+            self.allocate(4 * self.MIB)
+            with instrumentation.stage("inner") as inner:
+                self.allocate(self.MIB)
+        self.assertGreaterEqual(outer["peak_bytes"], 4 * self.MIB)
+        self.assertGreaterEqual(inner["peak_bytes"], self.MIB)
+        self.assertLess(inner["peak_bytes"], 2 * self.MIB)
+
+    def test_peak_in_inner_stage(self):
+        with instrumentation.stage("outer") as outer:
+            self.allocate(self.MIB)
+            with instrumentation.stage("inner") as inner:
+                self.allocate(4 * self.MIB)
+            with instrumentation.stage("sibling") as sibling:
+                self.allocate(self.MIB)
+        self.assertGreaterEqual(inner["peak_bytes"], 4 * self.MIB)
+        self.assertGreaterEqual(outer["peak_bytes"], inner["peak_bytes"])
+        self.assertLess(sibling["peak_bytes"], 2 * self.MIB)
+
+    def test_observed_once_per_context(self):
+        with mock.patch.object(metrics, "observe") as observe, self.assertLogs(instrumentation.logger) as logs:
+            with instrumentation.context(task_id="outer"):
+                with instrumentation.context(submission_id="inner"), instrumentation.stage("first"):
+                    pass
+                with instrumentation.stage("second"):
+                    pass
+        [(observations,), _] = observe.call_args
+        self.assertEqual(
+            [(name, stage) for name, stage, _ in observations],
+            [(name, stage) for stage in ["first", "second"]
+             for name in ["stage_wall_seconds", "stage_cpu_seconds", "stage_peak_bytes"]],
+        )
+        self.assertIn('"task_id": "outer"', logs.output[0])
+        self.assertIn('"submission_id": "inner"', logs.output[0])
+        self.assertNotIn("submission_id", logs.output[1])
+
+
+@override_settings(PLAGIARISM_METRICS_TOKEN="secret")
+class MetricsEndpointTests(SimpleTestCase):
+    """/metrics is served only with the scraper token, and fails the scrape
+    rather than the request while Redis is down."""
+
+    def setUp(self):
+        super().setUp()
+        metrics.client.cache_clear()
+        self.addCleanup(metrics.client.cache_clear)
+
+    def get(self, **headers):
+        return views.prometheus_metrics(RequestFactory().get("/metrics", headers=headers))
+
+    def stored(self, counters, histograms):
+        pipeline = mock.Mock()
+        pipeline.execute.return_value = [counters, histograms]
+        return mock.patch.object(metrics, "client", return_value=mock.Mock(**{"pipeline.return_value": pipeline}))
+
+    @override_settings(PLAGIARISM_METRICS_TOKEN="")
+    def test_no_token(self):
+        self.assertEqual(self.get(authorization="Bearer ").status_code, 404)
+
+    def test_wrong_token(self):
+        self.assertEqual(self.get().status_code, 401)
+        self.assertEqual(self.get(authorization="Bearer secrets").status_code, 401)
+
+    def test_exposition(self):
+        with self.stored(
+            {b"checks_completed": b"3"},
+            {b"stage_wall_seconds:scoring:0.5": b"2", b"stage_wall_seconds:scoring:+Inf": b"2",
+             b"stage_wall_seconds:scoring:sum": b"0.75"},
+        ):
+            response = self.get(authorization="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn("plagiarism_checks_completed_total 3\n", text)
+        self.assertIn('plagiarism_stage_wall_seconds_bucket{stage="scoring",le="0.25"} 0\n', text)
+        self.assertIn('plagiarism_stage_wall_seconds_bucket{stage="scoring",le="0.5"} 2\n', text)
+        self.assertIn('plagiarism_stage_wall_seconds_sum{stage="scoring"} 0.75\n', text)
+        self.assertIn('plagiarism_stage_wall_seconds_count{stage="scoring"} 2\n', text)
+        self.assertNotIn("stage_cpu_seconds", text)
+
+    @override_settings(PLAGIARISM_METRICS_REDIS_URL="redis://127.0.0.1:1/0")
+    def test_redis_outage(self):
+        with mock.patch.object(metrics, "logger") as logger:
+            self.assertEqual(self.get(authorization="Bearer secret").status_code, 503)
+            self.assertEqual(metrics.counters(), {})
+            metrics.increment("checks_completed")
+            metrics.observe([("stage_wall_seconds", "scoring", 0.1)])
+        self.assertEqual(logger.warning.call_count, 4)
+
+
+class CourseTestCase(TestCase):
+    """A course with one assignment and one submission of each of `TEXTS`,
+    its PDF in a blob store and its corpus in directories of the test."""
+
+    TEXTS = []
+
+    @classmethod
+    def setUpClass(cls):
+        cls.enterClassContext(override_settings(
+            BLOB_STORE_DIR=cls.enterClassContext(tempfile.TemporaryDirectory()),
+            PLAGIARISM_CORPUS_DIR=cls.enterClassContext(tempfile.TemporaryDirectory()),
+            PLAGIARISM_SCORING_MODE="corpus",
+            PLAGIARISM_WINNOWING_PASSAGES=False,
+        ))
+        # Metrics go to Redis, which a test run need not have; an outage
+        # is only logged
+        cls.enterClassContext(mock.patch.object(metrics, "logger"))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Testing")
+        lecturer = Lecturer.objects.create(
+            employee_id="E/TEST",
+            department=department,
+            user=CustomUser.objects.create(username="E/TEST", is_staff=True),
+        )
+        cls.course = Course.objects.create(name="Testing", code="TEST", credits="0", semester="I")
+        cls.course.lecturers.add(lecturer)
+        cls.assignment = Assignment.objects.create(
+            title="Essays",
+            total=100,
+            due_date=timezone.now() + timedelta(days=7),
+            course=cls.course,
+            lecturer=lecturer,
+            plagiarism_checker=False,
+        )
+        cls.submissions = [cls.submit(text) for text in cls.TEXTS]
+
+    @classmethod
+    def submit(cls, text):
+        number = Submission.objects.count()
+        user = CustomUser.objects.create(username=f"S/TEST/{number:05d}")
+        sha256, size = blobs.put(text_pdf(text))
+        return Submission.objects.create(
+            sha256=sha256,
+            size=size,
+            assignment=cls.assignment,
+            student=Student.objects.create(registration_number=user.username, user=user),
+        )
+
+    def check(self, submission):
+        checker = PlagiarismCheckerService(self.course.id, submission.id, submission.student_id)
+        checker.compare_with_all_submissions()
+        return checker
+
+    def reported(self, checker):
+        return {
+            result["other_submission_id"]: result["similarity_percentage"] for result in checker.report
+        }
+
+
+class SubmissionVectorTests(CourseTestCase):
+    """Stored vectors are reused while the file and engine version hold,
+    and recomputed once either changes."""
+
+    TEXTS = synthetic_texts(3, words=300)
+
+    def setUp(self):
+        super().setUp()
+        self.checker = PlagiarismCheckerService(self.course.id, submission_id=None, student_id=None)
+
+    def assertSameVector(self, vector, expected):
+        self.assertTrue(np.array_equal(vector[0], expected[0]))
+        self.assertTrue(np.array_equal(vector[1], expected[1]))
+
+    def fresh_vector(self, submission):
+        return self.checker.preprocess_document(self.checker.get_submission_text(submission)).feature_vector()
+
+    def test_round_trip(self):
+        vector = self.fresh_vector(self.submissions[0])
+        self.assertSameVector(vectors.loads(vectors.dumps(vector)), vector)
+
+    def test_reused(self):
+        submission = self.submissions[0]
+        vector = self.checker.get_submission_vector(submission)
+        self.assertSameVector(vector, self.fresh_vector(submission))
+
+        preprocessed = AssertionError("A stored vector was computed again")
+        with mock.patch.object(PlagiarismCheckerService, "get_submission_document", side_effect=preprocessed), \
+                mock.patch.object(PlagiarismCheckerService, "preprocess_many", side_effect=preprocessed):
+            self.assertSameVector(self.checker.get_submission_vector(submission), vector)
+            [(_, peer_vector)] = self.checker.get_peer_vectors(Submission.objects.filter(id=submission.id))
+            self.assertSameVector(peer_vector, vector)
+
+    def test_stale_version(self):
+        self.checker.build_submission_vectors([submission.id for submission in self.submissions])
+        # Vectors of an older engine hold other features
+        SubmissionVector.objects.update(engine_version="0", vector=vectors.dumps((np.zeros(0), np.zeros(0))))
+
+        submission = self.submissions[0]
+        self.assertSameVector(self.checker.get_submission_vector(submission), self.fresh_vector(submission))
+        peers = dict(self.checker.get_peer_vectors(Submission.objects.filter(assignment=self.assignment)))
+        for peer in self.submissions:
+            self.assertSameVector(peers[peer], self.fresh_vector(peer))
+        self.assertEqual(
+            set(SubmissionVector.objects.values_list("engine_version", flat=True)), {vectors.VECTOR_ENGINE_VERSION}
+        )
+
+    def test_new_version(self):
+        self.checker.build_submission_vectors([submission.id for submission in self.submissions])
+        with mock.patch.object(vectors, "VECTOR_ENGINE_VERSION", "next"):
+            self.checker.get_submission_vector(self.submissions[0])
+        self.assertEqual(SubmissionVector.objects.get(submission=self.submissions[0]).engine_version, "next")
+
+
+class CourseCorpusTests(CourseTestCase):
+    """A published corpus scores what the stored vectors score, with those
+    stored since laid over it, and its replaced generations are collected
+    once no reader holds them."""
+
+    TEXTS = synthetic_texts(5, words=300)
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(PLAGIARISM_CORPUS_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        self.checker = PlagiarismCheckerService(self.course.id, submission_id=None, student_id=None)
+        self.corpus = CourseCorpus(self.course.id)
+        self.checker.build_submission_vectors([submission.id for submission in self.submissions[:3]])
+        # Not stored, so never a row of the corpus
+        query = self.submissions[-1]
+        self.query = self.checker.preprocess_document(self.checker.get_submission_text(query)).feature_vector()
+
+    def store(self, submission):
+        self.checker.build_submission_vectors([submission.id])
+
+    def generations(self):
+        return {name for name in os.listdir(self.corpus.path) if os.path.isdir(os.path.join(self.corpus.path, name))}
+
+    def assertScores(self, snapshot, submissions):
+        self.assertEqual(set(snapshot.submission_ids()), {submission.id for submission in submissions})
+        stored = dict(SubmissionVector.objects.values_list("submission_id", "vector"))
+        ids = snapshot.submission_ids()
+        expected = self.checker.score_vectors(
+            self.query, [vectors.loads(stored[submission_id]) for submission_id in ids]
+        )
+        np.testing.assert_allclose(snapshot.score(self.query), expected, rtol=0, atol=1e-12)
+
+    def test_published(self):
+        self.assertIsNone(self.corpus.current_generation())
+        with self.corpus.open() as snapshot:
+            self.assertEqual(snapshot.overlay_ids, [])
+            self.assertScores(snapshot, self.submissions[:3])
+        self.assertEqual(self.generations(), {self.corpus.current_generation()})
+
+    def test_overlay(self):
+        self.corpus.open().close()
+        generation = self.corpus.current_generation()
+
+        self.store(self.submissions[3])
+        SubmissionVector.objects.filter(submission=self.submissions[0]).delete()
+        with self.corpus.open() as snapshot:
+            self.assertEqual(snapshot.overlay_ids, [self.submissions[3].id])
+            self.assertScores(snapshot, self.submissions[1:4])
+        self.assertEqual(self.corpus.current_generation(), generation)
+
+    @override_settings(PLAGIARISM_CORPUS_OVERLAY_SIZE=0)
+    def test_republished(self):
+        self.corpus.open().close()
+        generation = self.corpus.current_generation()
+
+        self.store(self.submissions[3])
+        with self.corpus.open() as snapshot:
+            self.assertEqual(snapshot.overlay_ids, [])
+            self.assertScores(snapshot, self.submissions[:4])
+        self.assertNotEqual(self.corpus.current_generation(), generation)
+        self.assertEqual(self.generations(), {self.corpus.current_generation()})
+
+    @override_settings(PLAGIARISM_CORPUS_OVERLAY_SIZE=0)
+    def test_held_generation_kept(self):
+        held = self.corpus.open()
+        self.store(self.submissions[3])
+        self.corpus.open().close()
+        self.assertEqual(self.generations(), {os.path.basename(held.path), self.corpus.current_generation()})
+
+        # Still scored by its reader after being replaced
+        with held:
+            self.assertScores(held, self.submissions[:3])
+        self.corpus.collect_unused()
+        self.assertEqual(self.generations(), {self.corpus.current_generation()})
+
+    def test_same_reports(self):
+        for submission in self.submissions:
+            with self.subTest(submission=submission.id):
+                reported = self.reported(self.check(submission))
+                with override_settings(PLAGIARISM_CORPUS_DIR=""):
+                    expected = self.reported(self.check(submission))
+                self.assertEqual(reported.keys(), expected.keys())
+                for other_id, score in reported.items():
+                    self.assertAlmostEqual(score, expected[other_id], places=10)
+
+
+class ExactDuplicateTests(CourseTestCase):
+    """Byte-identical uploads are reported at 100% and processed once."""
+
+    TEXTS = synthetic_texts(3, words=300)[:1] * 2 + synthetic_texts(3, words=300)[1:]
+
+    def test_reported_at_100(self):
+        original, copy, *others = self.submissions
+        self.assertEqual(original.sha256, copy.sha256)
+
+        reported = self.reported(self.check(copy))
+        self.assertEqual(reported[str(original.id)], 100.0)
+        for other in others:
+            self.assertLess(reported.get(str(other.id), 0), 100.0)
+
+    def test_processed_once(self):
+        original, copy, *_ = self.submissions
+        self.check(original)
+
+        extracted = AssertionError("A byte-identical file was extracted again")
+        with mock.patch.object(PlagiarismCheckerService, "extract_blob_text", side_effect=extracted), \
+                mock.patch.object(PlagiarismCheckerService, "extract_blob_document", side_effect=extracted):
+            reported = self.reported(self.check(copy))
+        self.assertEqual(reported[str(original.id)], 100.0)
+
+
+class SupersededCheckTests(CourseTestCase):
+    """A check replaced by a newer one, or by a newer file, writes nothing."""
+
+    TEXTS = synthetic_texts(4, words=300)
+
+    def run_check(self, submission, task_id, content_hash):
+        queue_check_run(task_id, self.course.id, submission_id=submission.id, assignment_id=self.assignment.id)
+        return check_for_plagiarism.apply(
+            args=(self.course.id, submission.id, submission.student_id),
+            kwargs={"content_hash": content_hash},
+            task_id=task_id,
+        ).get()
+
+    def assertOutcome(self, task_id, outcome):
+        self.assertEqual(PlagiarismCheckRun.objects.get(task_id=task_id).outcome, outcome)
+
+    def test_newer_check(self):
+        submission = self.submissions[-1]
+        Submission.objects.filter(id=submission.id).update(check_task_id="newer")
+
+        result = self.run_check(submission, "older", submission.sha256)
+        self.assertEqual(result, {"message": "Superseded by a newer check."})
+        self.assertOutcome("older", "superseded")
+        self.assertFalse(SimilarityEdge.objects.exists())
+        self.assertEqual(Submission.objects.get(id=submission.id).check_task_id, "newer")
+
+    def test_newer_file(self):
+        submission = self.submissions[-1]
+        Submission.objects.filter(id=submission.id).update(check_task_id="current")
+
+        result = self.run_check(submission, "current", "0" * 64)
+        self.assertEqual(result, {"message": "Superseded by a newer check."})
+        self.assertOutcome("current", "superseded")
+        self.assertFalse(SimilarityEdge.objects.exists())
+
+    def test_newer_file_while_running(self):
+        submission = self.submissions[-1]
+        Submission.objects.filter(id=submission.id).update(check_task_id="current")
+
+        def replace_file(checker):
+            Submission.objects.filter(id=submission.id).update(sha256="0" * 64)
+
+        with mock.patch.object(PlagiarismCheckerService, "compare_with_all_submissions", replace_file):
+            result = self.run_check(submission, "current", submission.sha256)
+        self.assertEqual(result, {"message": "Superseded by a newer check."})
+        self.assertOutcome("current", "discarded")
+        self.assertFalse(SimilarityEdge.objects.exists())
+
+    def test_current_check(self):
+        submission = self.submissions[-1]
+        Submission.objects.filter(id=submission.id).update(check_task_id="current")
+
+        result = self.run_check(submission, "current", submission.sha256)
+        self.assertEqual(result, {"message": "Similarity results stored successfully."})
+        self.assertOutcome("current", "completed")
+        self.assertIsNone(Submission.objects.get(id=submission.id).check_task_id)
+
+
+class CheckRunTests(CourseTestCase):
+    """Each queued check records when it ran, what it scored and how it
+    ended."""
+
+    TEXTS = synthetic_texts(4, words=300)
+
+    def run_check(self, task_id):
+        submission = self.submissions[-1]
+        Submission.objects.filter(id=submission.id).update(check_task_id=task_id)
+        queue_check_run(task_id, self.course.id, submission_id=submission.id, assignment_id=self.assignment.id)
+        return check_for_plagiarism.apply(
+            args=(self.course.id, submission.id, submission.student_id),
+            kwargs={"content_hash": submission.sha256},
+            task_id=task_id,
+        )
+
+    def test_completed(self):
+        self.run_check("current").get()
+        run = PlagiarismCheckRun.objects.get(task_id="current")
+        self.assertEqual(run.outcome, "completed")
+        self.assertLessEqual(run.queued_at, run.started_at)
+        self.assertLessEqual(run.started_at, run.finished_at)
+        self.assertTrue(run.engine)
+        self.assertEqual(run.candidates_before, len(self.TEXTS) - 1)
+        # Every peer in the course corpus, without the submission's own row
+        self.assertEqual(run.pairs_scored, len(self.TEXTS) - 1)
+        self.assertEqual(run.pairs_scored, run.candidates_after)
+
+    def test_failed(self):
+        failed = RuntimeError("Scoring failed")
+        with mock.patch.object(PlagiarismCheckerService, "compare_with_all_submissions", side_effect=failed):
+            with self.assertRaises(RuntimeError):
+                self.run_check("current").get()
+        run = PlagiarismCheckRun.objects.get(task_id="current")
+        self.assertEqual(run.outcome, "failed")
+        self.assertIsNotNone(run.finished_at)
+
+    @override_settings(PLAGIARISM_DEADLINE_BATCH_WINDOW=0)
+    def test_requeued(self):
+        submission = self.submissions[-1]
+
+        def schedule():
+            schedule_plagiarism_check(
+                self.course.id, self.assignment, submission.id, submission.student_id, submission.sha256
+            )
+            return Submission.objects.get(id=submission.id).check_task_id
+
+        with mock.patch("PlagiarismApp.tasks.chain"), \
+                mock.patch.object(check_for_plagiarism.app.control, "revoke") as revoke:
+            first = schedule()
+            second = schedule()
+        revoke.assert_called_once_with(first)
+        self.assertEqual(PlagiarismCheckRun.objects.get(task_id=first).outcome, "superseded")
+        run = PlagiarismCheckRun.objects.get(task_id=second)
+        self.assertEqual(run.outcome, "queued")
+        self.assertGreater(run.queued_at, timezone.now())
+
+
+class CheckLatencyTests(CourseTestCase):
+    """The latency page reports the percentiles of the queue wait and
+    processing time of the checks of each course in the period."""
+
+    def setUp(self):
+        super().setUp()
+        admin = CustomUser.objects.create(username="admin", is_superuser=True)
+        Preferences.objects.create(user=admin)
+        self.client.force_login(admin)
+
+    def add_run(self, number, queued_at, wait=None, processing=None, **fields):
+        started_at = None if wait is None else queued_at + timedelta(seconds=wait)
+        PlagiarismCheckRun.objects.create(
+            task_id=f"run-{number}",
+            course=self.course,
+            queued_at=queued_at,
+            started_at=started_at,
+            finished_at=None if processing is None else started_at + timedelta(seconds=processing),
+            **fields,
+        )
+
+    def latency(self, **params):
+        response = self.client.get(reverse("check_latency"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context["data"]["latency"]
+
+    def test_percentiles(self):
+        queued_at = timezone.now() - timedelta(hours=1)
+        for number in range(1, 21):
+            self.add_run(
+                number, queued_at, wait=number, processing=2 * number,
+                outcome="failed" if number == 20 else "completed", candidates_after=number, pairs_scored=number,
+            )
+        self.add_run(21, queued_at)
+        # Started before it was due, as micro-batched checks can be
+        self.add_run(22, queued_at, wait=-5, outcome="running")
+        self.add_run(23, timezone.now() - timedelta(days=8), wait=1000, processing=1000, outcome="completed")
+
+        [row] = self.latency()
+        self.assertEqual(row["course"], self.course)
+        self.assertEqual((row["runs"], row["waiting"], row["failed"]), (22, 1, 1))
+        waits = [*range(1, 21), 0]
+        self.assertEqual((row["wait_p50"], row["wait_p95"]), tuple(np.round(np.percentile(waits, [50, 95]), 2)))
+        self.assertEqual((row["processing_p50"], row["processing_p95"]), (21.0, 38.1))
+        self.assertEqual((row["candidates"], row["pairs"]), (10, 10))
+
+        [row] = self.latency(days=10)
+        self.assertEqual(row["runs"], 23)
+        self.assertEqual((row["processing_p50"], row["processing_p95"]), (22.0, 40.0))
+
+    def test_no_runs(self):
+        self.assertEqual(self.latency(), [])
+        self.assertEqual(self.latency(days="week"), [])
+
+
+class SubmissionListTests(CourseTestCase):
+    """The lecturer's submission list filters by and sorts on the highest
+    similarity, keeping the chosen controls."""
+
+    TEXTS = synthetic_texts(3, words=300)
+
+    def setUp(self):
+        super().setUp()
+        for submission, similarity in zip(self.submissions, [10.0, 80.0, None]):
+            Submission.objects.filter(id=submission.id).update(max_similarity=similarity)
+        lecturer = CustomUser.objects.get(username="E/TEST")
+        Preferences.objects.create(user=lecturer)
+        self.client.force_login(lecturer)
+
+    def test_sorted_and_filtered(self):
+        response = self.client.get(reverse("get_all_submissions"), {"sort": "similarity", "min_similarity": "5"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [submission.id for submission in response.context["data"]["submissions"]],
+            [self.submissions[1].id, self.submissions[0].id],
+        )
+        self.assertContains(response, '<option value="similarity" selected>', html=False)
+        self.assertContains(response, 'value="5"')
+
+    def test_no_match(self):
+        response = self.client.get(reverse("get_all_submissions"), {"min_similarity": "90"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "No submissions to show")
+        self.assertContains(response, 'value="90"')
+
+    def test_invalid_minimum(self):
+        response = self.client.get(reverse("get_all_submissions"), {"min_similarity": "high"})
+        self.assertEqual(len(response.context["data"]["submissions"]), 3)
+        self.assertEqual(response.context["data"]["filters"], {"sort": "", "min_similarity": ""})
+
+
+class SymmetricEdgeTests(CourseTestCase):
+    """A check writes its results into the earlier submissions' edges too."""
+
+    TEXTS = synthetic_texts(5, words=300)
+
+    def edges(self):
+        return {
+            (str(submission_id), str(other_submission_id)): score
+            for submission_id, other_submission_id, score in SimilarityEdge.objects.values_list(
+                "submission_id", "other_submission_id", "score"
+            )
+        }
+
+    def test_added_and_removed_both_ways(self):
+        latest = self.submissions[-1]
+        checker = self.check(latest)
+        checker.store_similarity_results()
+        reported = self.reported(checker)
+        self.assertTrue(reported)
+
+        expected = {}
+        for other_id, score in reported.items():
+            expected[(str(latest.id), other_id)] = expected[(other_id, str(latest.id))] = score
+        self.assertEqual(self.edges(), expected)
+        for submission in self.submissions[:-1]:
+            self.assertEqual(
+                Submission.objects.get(id=submission.id).max_similarity, reported.get(str(submission.id))
+            )
+
+        # A new file sharing no word with the others
+        sha256, size = blobs.put(text_pdf("unrelated " * 300))
+        Submission.objects.filter(id=latest.id).update(sha256=sha256, size=size)
+        checker = self.check(Submission.objects.get(id=latest.id))
+        checker.store_similarity_results()
+        self.assertEqual(checker.report, [])
+        self.assertEqual(self.edges(), {})
+        self.assertFalse(Submission.objects.filter(max_similarity__isnull=False).exists())
+
+
+class MicroBatchTests(CourseTestCase):
+    """A micro-batch reports what a single check of each upload reports."""
+
+    TEXTS = synthetic_texts(6, words=300)[:1] + synthetic_texts(6, words=300)
+
+    def test_same_reports(self):
+        batch = self.submissions[-3:]
+        checker = MicroBatchPlagiarismService(self.course.id, [submission.id for submission in batch])
+        checker.compare_batch()
+
+        for corpus_dir in [settings.PLAGIARISM_CORPUS_DIR, ""]:
+            with self.subTest(corpus_dir=corpus_dir), override_settings(PLAGIARISM_CORPUS_DIR=corpus_dir):
+                for submission in batch:
+                    expected = self.reported(self.check(submission))
+                    reported = self.reported(checker.checkers[submission.id])
+                    self.assertEqual(reported.keys(), expected.keys())
+                    self.assertEqual(checker.checkers[submission.id].stats["pairs_scored"], len(self.TEXTS) - 1)
+                    for other_id, score in reported.items():
+                        self.assertAlmostEqual(score, expected[other_id], places=10)
+
+    def test_score_many(self):
+        self.enterContext(override_settings(PLAGIARISM_CORPUS_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        checker = PlagiarismCheckerService(self.course.id, submission_id=None, student_id=None)
+        stored, uploads = self.submissions[:-3], self.submissions[-3:]
+        upload_vectors = [checker.get_submission_vector(upload) for upload in uploads]
+        corpus = CourseCorpus(self.course.id)
+        os.makedirs(corpus.path)
+        corpus.write_generation(
+            [submission.id for submission in stored], [checker.get_submission_vector(peer) for peer in stored]
+        )
+
+        with corpus.open_current() as snapshot:
+            snapshot.add_overlay([upload.id for upload in uploads], upload_vectors)
+            batched = snapshot.score_many(upload_vectors)
+        # A single check sees the uploads up to its own, not those after it
+        for count, vector in enumerate(upload_vectors, start=1):
+            with self.subTest(upload=count), corpus.open_current() as snapshot:
+                snapshot.add_overlay([upload.id for upload in uploads[:count]], upload_vectors[:count])
+                single = snapshot.score(vector)
+                np.testing.assert_allclose(batched[count - 1, :len(single)], single, rtol=0, atol=1e-12)
+
+    def test_duplicates_in_batch(self):
+        original, copy = self.submissions[:2]
+        checker = MicroBatchPlagiarismService(self.course.id, [original.id, copy.id])
+        checker.compare_batch()
+        self.assertEqual(self.reported(checker.checkers[original.id])[str(copy.id)], 100.0)
+        self.assertEqual(self.reported(checker.checkers[copy.id])[str(original.id)], 100.0)
+
+    def test_failed_course(self):
+        other = Course.objects.create(name="Other", code="OTHER", credits="0", semester="I")
+        pending = []
+        checks = [(other, self.submissions[0]), (self.course, self.submissions[1])]
+        for number, (course, submission) in enumerate(checks):
+            PlagiarismCheckRun.objects.create(task_id=f"batch-{number}", course=course, queued_at=timezone.now())
+            Submission.objects.filter(id=submission.id).update(check_task_id=f"batch-{number}")
+            pending.append({
+                "course_id": course.id,
+                "submission_id": str(submission.id),
+                "task_id": f"batch-{number}",
+                "content_hash": submission.sha256,
+                "queued_at": 0,
+            })
+
+        compare_batch = MicroBatchPlagiarismService.compare_batch
+
+        def fail_other(checker):
+            if checker.course_id == other.id:
+                raise RuntimeError("Scoring failed")
+            return compare_batch(checker)
+
+        failing = mock.patch.object(MicroBatchPlagiarismService, "compare_batch", autospec=True, side_effect=fail_other)
+        with mock.patch("PlagiarismApp.tasks.microbatch.take", return_value=pending), failing, \
+                self.assertLogs("PlagiarismApp.tasks", "ERROR") as logs:
+            result = flush_micro_batch.apply().get()
+
+        [record] = logs.records
+        self.assertIn(f"course {other.id} failed", record.getMessage())
+
+        self.assertEqual(result, {"message": "Similarity results stored for 1 submissions, 1 failed."})
+        self.assertEqual(
+            dict(PlagiarismCheckRun.objects.values_list("task_id", "outcome")),
+            {"batch-0": "failed", "batch-1": "completed"},
+        )
+        self.assertIsNotNone(Submission.objects.get(id=self.submissions[1].id).max_similarity)
+
+
+class GetFileTests(CourseTestCase):
+    """Stored files are served by hash, and a missing one is a 404."""
+
+    TEXTS = synthetic_texts(1, words=300)
+
+    def get(self, submission, **headers):
+        request = RequestFactory().get(
+            "/", {"file_id": str(submission.id), "file_type": "submission"}, headers=headers
+        )
+        return views.get_file(request)
+
+    def test_served(self):
+        submission = self.submissions[0]
+        response = self.get(submission)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], f'"{submission.sha256}"')
+        with blobs.open_file(submission.sha256) as file:
+            self.assertEqual(b"".join(response.streaming_content), file.read())
+        response.file_to_stream.close()
+
+        self.assertEqual(self.get(submission, if_none_match=f'"{submission.sha256}"').status_code, 304)
+
+    def test_missing(self):
+        submission = self.submissions[0]
+        Submission.objects.filter(id=submission.id).update(sha256="0" * 64)
+        response = self.get(submission)
+        self.assertEqual(response.status_code, 404)
+        self.assertJSONEqual(response.content, {"message": "File not found"})
+
+
+class BatchCheckTests(CourseTestCase):
+    """The batch check reports what single checks report, and runs once per
+    assignment however often it is queued or delivered."""
+
+    TEXTS = synthetic_texts(8, words=300)
+
+    def setUp(self):
+        super().setUp()
+        Assignment.objects.filter(id=self.assignment.id).update(
+            due_date=timezone.now() - timedelta(minutes=1), plagiarism_checker=True
+        )
+
+    def due_check(self):
+        """Run `check_due_assignments`, returning the task IDs it queued."""
+        with mock.patch.object(check_assignment_for_plagiarism, "apply_async") as apply_async:
+            check_due_assignments()
+        return [call.kwargs["task_id"] for call in apply_async.call_args_list]
+
+    def run_batch(self, task_id):
+        return check_assignment_for_plagiarism.apply(args=(self.assignment.id,), task_id=task_id).get()
+
+    def test_same_reports(self):
+        checker = AssignmentPlagiarismService(self.assignment.id)
+        checker.compare_all_pairs()
+        self.assertTrue(any(checker.results.values()))
+
+        for submission in self.submissions:
+            expected = self.reported(self.check(submission))
+            reported = {
+                result["other_submission_id"]: result["similarity_percentage"]
+                for result in checker.results[str(submission.id)]
+            }
+            self.assertEqual(reported.keys(), expected.keys())
+            for other_id, score in reported.items():
+                self.assertAlmostEqual(score, expected[other_id], places=10)
+
+    def test_blocks(self):
+        def flagged(checker):
+            checker.compare_all_pairs()
+            return {
+                (result["current_submission_id"], result["other_submission_id"])
+                for results in checker.results.values()
+                for result in results
+            }
+
+        expected = flagged(AssignmentPlagiarismService(self.assignment.id))
+        with override_settings(PLAGIARISM_BATCH_BLOCK_SIZE=3):
+            self.assertEqual(flagged(AssignmentPlagiarismService(self.assignment.id)), expected)
+
+    def test_claimed_once(self):
+        [task_id] = self.due_check()
+        self.assertEqual(Assignment.objects.get(id=self.assignment.id).batch_task_id, task_id)
+        self.assertEqual(PlagiarismCheckRun.objects.get(task_id=task_id).outcome, "queued")
+        # Held by the queued run
+        self.assertEqual(self.due_check(), [])
+
+        result = self.run_batch(task_id)
+        self.assertEqual(result, {"message": f"Similarity results stored for {len(self.TEXTS)} submissions."})
+        self.assertEqual(PlagiarismCheckRun.objects.get(task_id=task_id).outcome, "completed")
+        self.assertIsNotNone(Assignment.objects.get(id=self.assignment.id).batch_checked_at)
+        self.assertTrue(SimilarityEdge.objects.exists())
+        # Checked
+        self.assertEqual(self.due_check(), [])
+
+        # A late redelivery of the same run does nothing
+        self.assertEqual(self.run_batch(task_id), {"message": "Another run holds or has finished the batch check."})
+
+    def test_lapsed_claim(self):
+        [lapsed] = self.due_check()
+        Assignment.objects.filter(id=self.assignment.id).update(
+            batch_claimed_at=timezone.now() - timedelta(seconds=settings.PLAGIARISM_BATCH_CLAIM_TIMEOUT + 1)
+        )
+        [task_id] = self.due_check()
+        self.assertNotEqual(task_id, lapsed)
+
+        # The run whose claim lapsed is superseded when it is delivered
+        self.assertEqual(self.run_batch(lapsed), {"message": "Another run holds or has finished the batch check."})
+        self.assertEqual(PlagiarismCheckRun.objects.get(task_id=lapsed).outcome, "superseded")
+        self.assertFalse(SimilarityEdge.objects.exists())
+
+        self.run_batch(task_id)
+        self.assertEqual(PlagiarismCheckRun.objects.get(task_id=task_id).outcome, "completed")
+
+    def test_failure_releases_claim(self):
+        [task_id] = self.due_check()
+        failed = RuntimeError("Scoring failed")
+        with mock.patch.object(AssignmentPlagiarismService, "compare_all_pairs", side_effect=failed):
+            with self.assertRaises(RuntimeError):
+                self.run_batch(task_id)
+        self.assertEqual(PlagiarismCheckRun.objects.get(task_id=task_id).outcome, "failed")
+        self.assertIsNone(Assignment.objects.get(id=self.assignment.id).batch_claimed_at)
+        self.assertEqual(len(self.due_check()), 1)
+
+
+class PassagesTests(SimpleTestCase):
+    """Fingerprint matches in step are merged into passages."""
+
+    def test_merged_in_step(self):
+        matches = [(3, 13), (20, 5), (0, 10), (1, 11), (9, 19)]
+        self.assertEqual(passages(matches, shingle_size=5), [
+            {"start": 0, "end": 8, "other_start": 10, "other_end": 18},
+            {"start": 9, "end": 14, "other_start": 19, "other_end": 24},
+            {"start": 20, "end": 25, "other_start": 5, "other_end": 10},
+        ])
+
+    def test_no_matches(self):
+        self.assertEqual(passages([], shingle_size=5), [])
+
+
+class WinnowingTests(CourseTestCase):
+    """The "winnowing" mode reports a pasted passage where it was pasted."""
+
+    ESSAYS = [text.split() for text in synthetic_texts(3, words=300)]
+    # 200 words of the first essay pasted into the second at word 60
+    TEXTS = [
+        " ".join(ESSAYS[0]),
+        " ".join(ESSAYS[1][:60] + ESSAYS[0][100:] + ESSAYS[1][60:100]),
+        " ".join(ESSAYS[2]),
+    ]
+
+    @override_settings(PLAGIARISM_SCORING_MODE="winnowing", PLAGIARISM_WINNOWING_PASSAGES=True)
+    def test_pasted_passage(self):
+        source, copy, unrelated = self.submissions
+        checker = self.check(copy)
+        self.assertEqual(checker.stats["engine"], f"winnowing:{shingles.SHINGLE_HASH_VERSION}")
+
+        reported = {result["other_submission_id"]: result for result in checker.report}
+        self.assertEqual(list(reported), [str(source.id)])
+        self.assertGreater(reported[str(source.id)]["similarity_percentage"], 50)
+
+        # Winnowing guarantees a fingerprint in every window of shingles, so
+        # the passage reaches the ends of the pasted words up to one window
+        [passage] = reported[str(source.id)]["passages"]
+        slack = settings.PLAGIARISM_WINNOWING_WINDOW
+        self.assertEqual(passage["other_start"] - passage["start"], 40)
+        self.assertEqual(passage["other_end"] - passage["end"], 40)
+        self.assertTrue(60 <= passage["start"] <= 60 + slack, passage)
+        self.assertTrue(260 - slack <= passage["end"] <= 260, passage)
+
+    @override_settings(PLAGIARISM_SCORING_MODE="winnowing")
+    def test_resubmitted_peer_indexed_again(self):
+        source, copy, unrelated = self.submissions
+        self.assertIn(str(source.id), self.reported(self.check(copy)))
+
+        # A new file drops the stored text and fingerprints, as an upload does
+        sha256, size = blobs.put(text_pdf(" ".join(self.ESSAYS[2][:250] + self.ESSAYS[1][:50])))
+        Submission.objects.filter(id=copy.id).update(sha256=sha256, size=size)
+        SubmissionText.objects.filter(submission=copy).delete()
+        Fingerprint.objects.filter(submission=copy).delete()
+
+        reported = self.reported(self.check(source))
+        self.assertNotIn(str(copy.id), reported)
+        self.assertIn(str(copy.id), self.reported(self.check(unrelated)))
+
+
+class GenerateCorpusTests(TestCase):
+    """Generated submissions can be marked as uploaded ones can."""
+
+    def test_statuses(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(BLOB_STORE_DIR=directory):
+            call_command("generate_corpus", 6, words=100, course_code="GEN", stdout=io.StringIO())
+        submissions = Submission.objects.filter(assignment__course__code="GEN")
+        self.assertEqual(submissions.count(), 6)
+        for submission in submissions:
+            self.assertEqual(SubmissionStatus.objects.get(submission=submission).status, "unmarked")
+
+
+# Submissions per course of the benchmarks, which run only when
+# PLAGIARISM_BENCHMARK is set, e.g.
+#   PLAGIARISM_BENCHMARK=1 python manage.py test PlagiarismApp --tag benchmark
+BENCHMARK_SIZES = [int(size) for size in os.getenv("PLAGIARISM_BENCHMARK_SIZES", "100 1000 10000").split()]
+
+
+@tag("benchmark")
+@skipUnless(os.getenv("PLAGIARISM_BENCHMARK"), "Set PLAGIARISM_BENCHMARK to run the benchmarks")
+class BenchmarkTests(TestCase):
+    """The timing suites of benchmark_checker at each of `BENCHMARK_SIZES`,
+    on courses made by generate_corpus. Their tables go to standard output.
+
+    The extraction, preprocessing and documents suites do not scale with
+    the course and are left to the command, as is the accuracy suite, which
+    forks a process with its own database connection per engine."""
+
+    SUITES = ["scoring", "batch", "parallel", "vectors", "shingling", "corpus", "microbatch"]
+    CODES = [f"SYN{size}" for size in BENCHMARK_SIZES]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.enterClassContext(override_settings(
+            BLOB_STORE_DIR=cls.enterClassContext(tempfile.TemporaryDirectory()),
+            PLAGIARISM_CORPUS_DIR=cls.enterClassContext(tempfile.TemporaryDirectory()),
+        ))
+        cls.enterClassContext(mock.patch.object(metrics, "logger"))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        for size, code in zip(BENCHMARK_SIZES, cls.CODES):
+            call_command("generate_corpus", size, course_code=code, stdout=io.StringIO())
+
+    def benchmark(self, suite, **options):
+        """Run a suite, returning the first column of each row of its table."""
+        output = io.StringIO()
+        call_command("benchmark_checker", suite, stdout=output, **options)
+        sys.stdout.write(f"\n{suite}\n{output.getvalue()}")
+        return [line.split()[0] for line in output.getvalue().splitlines()[1:]]
+
+    def test_sized_suites(self):
+        for suite in self.SUITES:
+            with self.subTest(suite=suite):
+                column = self.benchmark(suite, sizes=BENCHMARK_SIZES)
+                sizes = {int(value) for value in column if value.isdigit()}
+                self.assertEqual(sizes, set(BENCHMARK_SIZES))
+
+    def test_checker(self):
+        with tempfile.NamedTemporaryFile(mode="r", suffix=".json") as file:
+            self.benchmark("checker", courses=self.CODES, json=file.name)
+            results = json.load(file)
+
+        for size, code in zip(BENCHMARK_SIZES, self.CODES):
+            with self.subTest(course=code):
+                course = results["courses"][code]
+                self.assertEqual(course["submissions"], size)
+                # The repeat check reads what the first one stored
+                check = course["compare_with_all_submissions"]
+                self.assertEqual(check["first"]["candidates_before"], size - 1)
+                self.assertGreater(check["first"]["bytes_extracted"], 0)
+                self.assertEqual(check["repeat"]["bytes_extracted"], 0)
+
+    def test_uploads(self):
+        column = self.benchmark("uploads", courses=self.CODES, burst=min(BENCHMARK_SIZES) // 2)
+        self.assertEqual(column, self.CODES)
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Runs the migration `migrate_to` on rows made at `migrate_from`."""
+
+    migrate_from = migrate_to = None
+
+    def setUp(self):
+        super().setUp()
+        self.apps = self.migrate(self.migrate_from)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes("PlagiarismApp"))
+        super().tearDown()
+
+    def migrate(self, name):
+        """Migrate to `name` and return the models as of it."""
+        executor = MigrationExecutor(connection)
+        executor.migrate([("PlagiarismApp", name)])
+        executor.loader.build_graph()
+        return executor.loader.project_state(("PlagiarismApp", name)).apps
+
+    def create_submissions(self, count, **fields):
+        apps = self.apps
+        department = apps.get_model("PlagiarismApp", "Department").objects.create(name="Testing")
+        CustomUser = apps.get_model("PlagiarismApp", "CustomUser")
+        lecturer = apps.get_model("PlagiarismApp", "Lecturer").objects.create(
+            employee_id="E/TEST", department=department, user=CustomUser.objects.create(username="E/TEST")
+        )
+        course = apps.get_model("PlagiarismApp", "Course").objects.create(
+            name="Testing", code="TEST", credits="0", semester="I"
+        )
+        assignment = apps.get_model("PlagiarismApp", "Assignment").objects.create(
+            title="Essays", total=100, due_date=timezone.now(), course=course, lecturer=lecturer
+        )
+        Student = apps.get_model("PlagiarismApp", "Student")
+        return [
+            apps.get_model("PlagiarismApp", "Submission").objects.create(
+                assignment=assignment,
+                student=Student.objects.create(
+                    registration_number=f"S/{number}", user=CustomUser.objects.create(username=f"S/{number}")
+                ),
+                **fields,
+            )
+            for number in range(count)
+        ]
+
+
+class SimilarityEdgeMigrationTests(MigrationTestCase):
+    """Migration 0010 copies the stored reports into similarity edges."""
+
+    migrate_from = "0009_submission_check_task_id"
+    migrate_to = "0010_similarityedge"
+
+    def test_backfill(self):
+        first, second, third = self.create_submissions(3)
+        passages = [{"start": 0, "end": 40, "other_start": 10, "other_end": 50}]
+        PlagiarismReport = self.apps.get_model("PlagiarismApp", "PlagiarismReport")
+        PlagiarismReport.objects.create(submission=first, similarity_results=[
+            {"other_submission_id": str(second.id), "similarity_percentage": 80.0, "passages": passages},
+            {"other_submission_id": str(third.id), "similarity_percentage": 40.0},
+            # Entries naming no other submission of the database are dropped
+            {"other_submission_id": str(first.id), "similarity_percentage": 100.0},
+            {"other_submission_id": "00000000-0000-0000-0000-000000000000", "similarity_percentage": 90.0},
+        ])
+        PlagiarismReport.objects.create(submission=second, similarity_results=[
+            {"other_submission_id": str(first.id), "similarity_percentage": 80.0},
+        ])
+
+        apps = self.migrate(self.migrate_to)
+        edges = {
+            (edge.submission_id, edge.other_submission_id): (edge.score, edge.passages, edge.engine_version)
+            for edge in apps.get_model("PlagiarismApp", "SimilarityEdge").objects.all()
+        }
+        self.assertEqual(edges, {
+            (first.id, second.id): (80.0, passages, ""),
+            (first.id, third.id): (40.0, [], ""),
+            (second.id, first.id): (80.0, [], ""),
+        })
+        maximum = dict(apps.get_model("PlagiarismApp", "Submission").objects.values_list("id", "max_similarity"))
+        self.assertEqual(maximum, {first.id: 80.0, second.id: 80.0, third.id: None})
+
+
+class BlobStoreMigrationTests(MigrationTestCase):
+    """Migration 0012 moves the base64 files into the blob store and back."""
+
+    migrate_from = "0011_plagiarismcheckrun"
+    migrate_to = "0012_blob_store"
+
+    def setUp(self):
+        self.enterContext(override_settings(BLOB_STORE_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        super().setUp()
+
+    def stored(self, sha256):
+        with open(os.path.join(settings.BLOB_STORE_DIR, sha256[:2], sha256[2:4], sha256), "rb") as file:
+            return file.read()
+
+    def test_moved_and_restored(self):
+        pdfs = [text_pdf(text) for text in synthetic_texts(2, words=100)]
+        image = b"\x89PNG\r\n\x1a\n image"
+        submissions = self.create_submissions(3, file=base64.b64encode(pdfs[0]))
+        submissions[2].file = base64.b64encode(pdfs[1])
+        submissions[2].save()
+        submissions[0].assignment.file = base64.b64encode(pdfs[1])
+        submissions[0].assignment.save()
+        user = submissions[0].student.user
+        user.image = base64.b64encode(image)
+        user.save()
+
+        apps = self.migrate(self.migrate_to)
+        Submission = apps.get_model("PlagiarismApp", "Submission")
+        for submission, pdf in zip(submissions, [pdfs[0], pdfs[0], pdfs[1]]):
+            moved = Submission.objects.get(id=submission.id)
+            self.assertEqual((moved.sha256, moved.size), (hashlib.sha256(pdf).hexdigest(), len(pdf)))
+            self.assertEqual(self.stored(moved.sha256), pdf)
+        assignment = apps.get_model("PlagiarismApp", "Assignment").objects.get(id=submissions[0].assignment_id)
+        self.assertEqual(self.stored(assignment.file_sha256), pdfs[1])
+        self.assertEqual(assignment.file_size, len(pdfs[1]))
+        moved_user = apps.get_model("PlagiarismApp", "CustomUser").objects.get(id=user.id)
+        self.assertEqual(self.stored(moved_user.image_sha256), image)
+        self.assertIsNone(
+            apps.get_model("PlagiarismApp", "CustomUser").objects.get(username="E/TEST").image_sha256
+        )
+
+        apps = self.migrate(self.migrate_from)
+        Submission = apps.get_model("PlagiarismApp", "Submission")
+        for submission, pdf in zip(submissions, [pdfs[0], pdfs[0], pdfs[1]]):
+            self.assertEqual(base64.b64decode(Submission.objects.get(id=submission.id).file), pdf)
+        assignment = apps.get_model("PlagiarismApp", "Assignment").objects.get(id=submissions[0].assignment_id)
+        self.assertEqual(base64.b64decode(assignment.file), pdfs[1])
+        moved_user = apps.get_model("PlagiarismApp", "CustomUser").objects.get(id=user.id)
+        self.assertEqual(base64.b64decode(moved_user.image), image)
@@ -28,6 +28,7 @@ urlpatterns = [
     path('admin/lecturers/', views.admin.lectures, name='lecturers'),
     path('admin/lecturers/add_lecturer/', views.admin.add_lecturer, name="add_lecturer"),
     path('admin/lecturers/delete_lecturer/', views.admin.delete_lecturer, name="delete_lecturer"),
+    path('admin/check_latency/', views.admin.check_latency, name="check_latency"),
 
     # Lecturer URLs
     path('lecturer/', views.lecturer.dashboard, name='lecturer_dashboard'),
@@ -39,6 +40,7 @@ urlpatterns = [
     path('lecturer/assignments/submissions/<str:submission_id>/', views.lecturer.get_submission_with_id, name='get_submission_with_id'),
     path('lecturer/assignments/submissions/<str:submission_id>/report/', views.lecturer.get_plagiarism_report_for_submission, name='get_plagiarism_report_for_submission'),
     path('lecturer/assignments/submissions/<str:submission_id>/return/', views.lecturer.return_assignment, name='return_assignment'),
+    path('lecturer/assignments/submissions/<str:submission_id>/recheck/', views.lecturer.recheck_submission, name='recheck_submission'),
     path('lecturer/courses/all/students/', views.lecturer.get_all_students, name='get_all_students'),
 
     # Student URLs
@@ -60,6 +62,7 @@ urlpatterns = [
 
     # API URLs
     path('api/v2/get_file', views.get_file, name='get_file'),
+    path('metrics', views.prometheus_metrics, name='metrics'),
 
 
     # Captcha URL
@@ -1,8 +1,14 @@
+import hmac
+
 from django.contrib.auth import logout as auth_logout
 from django.shortcuts import redirect, get_object_or_404, render
 from django.views.decorators.http import require_POST, require_GET
+from django.views.decorators.clickjacking import xframe_options_sameorigin
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse
+from .services import blobs, metrics
 from .services.utils import PlagiarismCheckerService
 from .models import (
     Student,
@@ -13,11 +19,18 @@ from .models import (
     Submission,
     Assignment,
     Admin,
+    CustomUser,
 )
 from .controllers import admin, student, auth, lecturer
 from .forms import CaptchaForm
 
-import base64
+# Leading bytes of the image formats profile images are served as
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG": "image/png",
+    b"GIF8": "image/gif",
+    b"RIFF": "image/webp",
+}
 
 
 @require_POST
@@ -139,9 +152,8 @@ def update_profile(request):
         # Process image upload
         if "image__upload-btn" in request.FILES:
             image = request.FILES["image__upload-btn"]
-            image_data = base64.b64encode(image.read())
             user = student_object.user if student_object else (lecturer_object.user if lecturer_object else admin_object.user)
-            user.image = image_data
+            user.image_sha256, _ = blobs.put_upload(image)
 
         # Update user information
         user = student_object.user if student_object else (lecturer_object.user if lecturer_object else (admin_object.user if admin_object else None))
@@ -279,14 +291,61 @@ def upload_files(request):
 
 
 @require_GET
+@xframe_options_sameorigin
 def get_file(request):
+    """Stream a submission's or assignment's PDF, or a user's profile image,
+    from the blob store."""
     file_id = request.GET.get("file_id")
     file_type = request.GET.get("file_type")
 
-    if file_id and file_type:
+    sha256 = None
+    try:
         if file_type == "submission":
-            sub = Submission.objects.get(id=file_id)
-            return JsonResponse({"file": sub.file.decode("utf-8")})
-        else:
-            ass = Assignment.objects.get(id=file_id)
-            return JsonResponse({"file": ass.file.decode("utf-8")})
+            sha256 = Submission.objects.filter(id=file_id).values_list("sha256", flat=True).first()
+        elif file_type == "assignment":
+            sha256 = Assignment.objects.filter(id=file_id).values_list("file_sha256", flat=True).first()
+        elif file_type == "image":
+            sha256 = CustomUser.objects.filter(id=file_id).values_list("image_sha256", flat=True).first()
+    except (ValueError, ValidationError):
+        pass
+    if sha256 is None:
+        return JsonResponse({"message": "File not found"}, status=404)
+
+    # A stored file never changes, so its hash is a strong validator
+    etag = f'"{sha256}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        try:
+            file = blobs.open_file(sha256)
+        except FileNotFoundError:
+            return JsonResponse({"message": "File not found"}, status=404)
+        content_type = "application/pdf"
+        if file_type == "image":
+            header = file.read(4)
+            file.seek(0)
+            content_type = next(
+                (image_type for signature, image_type in IMAGE_SIGNATURES.items() if header.startswith(signature)),
+                "application/octet-stream",
+            )
+        response = FileResponse(file, content_type=content_type)
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@require_GET
+def prometheus_metrics(request):
+    token = settings.PLAGIARISM_METRICS_TOKEN
+    if not token:
+        # Not served at all until a scraper token is configured
+        return HttpResponse(status=404)
+    authorization = request.headers.get("Authorization", "").encode()
+    if not hmac.compare_digest(authorization, f"Bearer {token}".encode()):
+        return HttpResponse(status=401)
+
+    exposition = metrics.exposition()
+    if exposition is None:
+        # Redis is down; a failed scrape rather than series that vanish
+        return HttpResponse(status=503)
+    return HttpResponse(exposition, content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,17 @@
+import logging
+import time
+
+from celery.signals import worker_process_init
+from django.conf import settings
+
+from .services import text
+
+logger = logging.getLogger(__name__)
+
+
+@worker_process_init.connect
+def load_nlp_resources(**kwargs):
+    """Load the NLTK models once in every worker process, before any task."""
+    started = time.perf_counter()
+    text.load_resources(settings.PLAGIARISM_NLTK_DATA)
+    logger.info("Loaded NLP resources in %.3fs", time.perf_counter() - started)
@@ -137,6 +137,11 @@ if not DEBUG:
     # and renames the files with unique names for each version to support long-term caching
     STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Uploaded submissions, assignment files and profile images, stored once
+# each under the SHA-256 of their bytes by services.blobs; the web and
+# worker processes must all see the same directory
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", str(BASE_DIR / "blobs"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -149,4 +154,118 @@ CAPTCHA_IMAGE_SIZE = (144, 40)
 
 # Celery settings
 CELERY_BROKER_URL = "redis://localhost:6379"
-CELERY_RESULT_BACKEND = "redis://localhost:6379"
\ No newline at end of file
+CELERY_RESULT_BACKEND = "redis://localhost:6379"
+CELERY_BEAT_SCHEDULE = {
+    "check-due-assignments": {
+        "task": "PlagiarismApp.tasks.check_due_assignments",
+        "schedule": 300.0,
+    },
+}
+# Heavy plagiarism work runs on queues of its own so that it never holds up
+# light tasks; start one worker per queue with `manage.py run_worker <queue>`
+CELERY_TASK_DEFAULT_QUEUE = "light"
+CELERY_TASK_ROUTES = {
+    "PlagiarismApp.tasks.extract_submission_text": {"queue": "extraction"},
+    "PlagiarismApp.tasks.check_for_plagiarism": {"queue": "scoring"},
+    "PlagiarismApp.tasks.flush_micro_batch": {"queue": "scoring"},
+    "PlagiarismApp.tasks.check_assignment_for_plagiarism": {"queue": "batch"},
+}
+# Long tasks are acknowledged once done and reserved one at a time, so a
+# worker never holds queued checks while it is busy with a thesis
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Worker settings per queue: processes, messages reserved per process, and
+# the tasks or resident memory (KiB) after which a process is replaced
+PLAGIARISM_WORKER_QUEUES = {
+    "priority": {
+        "concurrency": int(os.getenv("PLAGIARISM_PRIORITY_CONCURRENCY", 1)),
+        "prefetch_multiplier": 1,
+        "max_tasks_per_child": 50,
+        "max_memory_per_child": 1024 * 1024,
+    },
+    "extraction": {
+        "concurrency": int(os.getenv("PLAGIARISM_EXTRACTION_CONCURRENCY", 2)),
+        "prefetch_multiplier": 1,
+        "max_tasks_per_child": 50,
+        "max_memory_per_child": 1024 * 1024,
+    },
+    "scoring": {
+        "concurrency": int(os.getenv("PLAGIARISM_SCORING_CONCURRENCY", 2)),
+        "prefetch_multiplier": 1,
+        "max_tasks_per_child": 100,
+        "max_memory_per_child": 1024 * 1024,
+    },
+    "batch": {
+        "concurrency": int(os.getenv("PLAGIARISM_BATCH_CONCURRENCY", 1)),
+        "prefetch_multiplier": 1,
+        "max_tasks_per_child": 10,
+        "max_memory_per_child": 2 * 1024 * 1024,
+    },
+    "light": {
+        "concurrency": int(os.getenv("PLAGIARISM_LIGHT_CONCURRENCY", 2)),
+        "prefetch_multiplier": 4,
+        "max_tasks_per_child": None,
+        "max_memory_per_child": None,
+    },
+}
+
+# Plagiarism checker settings
+# Pairs scoring above this cosine similarity are written to the report
+PLAGIARISM_SIMILARITY_THRESHOLD = 0.35
+# "corpus" scores every peer with one shared-vocabulary sparse matrix,
+# "winnowing" scores peers by the share of the submission's winnowed
+# fingerprints they contain, found through the course's inverted index,
+# "pairwise" fits a vectorizer for each pair of submissions
+PLAGIARISM_SCORING_MODE = os.getenv("PLAGIARISM_SCORING_MODE", "corpus")
+# Record the matching passages of every reported pair, from winnowed
+# fingerprints of PLAGIARISM_WINNOWING_SHINGLE_SIZE-token shingles
+PLAGIARISM_WINNOWING_PASSAGES = os.getenv("PLAGIARISM_WINNOWING_PASSAGES", "true") == "true"
+PLAGIARISM_WINNOWING_SHINGLE_SIZE = 5
+PLAGIARISM_WINNOWING_WINDOW = 4
+# Rows of the assignment term matrix scored per block by the batch check
+PLAGIARISM_BATCH_BLOCK_SIZE = 256
+# Seconds after which a queued or running batch check is presumed lost and
+# its assignment claimed again by the next due-assignment run
+PLAGIARISM_BATCH_CLAIM_TIMEOUT = int(os.getenv("PLAGIARISM_BATCH_CLAIM_TIMEOUT", 2 * 3600))
+# Pages of a PDF read by the text extraction, None to read every page
+PLAGIARISM_MAX_PAGES = int(os.getenv("PLAGIARISM_MAX_PAGES", 0)) or None
+# Processes used to extract and preprocess peers within one check, 1 to run
+# serially, and the documents sent to a process at a time
+PLAGIARISM_WORKERS = int(os.getenv("PLAGIARISM_WORKERS", 1))
+PLAGIARISM_WORKER_CHUNK_SIZE = 16
+# BLAS/OpenMP threads allowed per check and per pool process
+PLAGIARISM_BLAS_THREADS = int(os.getenv("PLAGIARISM_BLAS_THREADS", 1))
+# Offline NLTK data loaded once per worker process; fill it with
+# `python manage.py download_nltk_data`
+PLAGIARISM_NLTK_DATA = os.getenv("PLAGIARISM_NLTK_DATA", str(BASE_DIR / "nltk_data"))
+# Local directory of the memory-mapped course matrices the "corpus" mode
+# scores against, shared by the worker processes of a host; empty to build
+# the matrix in memory for every check
+PLAGIARISM_CORPUS_DIR = os.getenv("PLAGIARISM_CORPUS_DIR", str(BASE_DIR / "corpus"))
+# Vectors stored since a course's matrix was published that a check scores
+# from memory beside it; the check that finds more publishes a new matrix
+PLAGIARISM_CORPUS_OVERLAY_SIZE = int(os.getenv("PLAGIARISM_CORPUS_OVERLAY_SIZE", 256))
+# Seconds a check waits after an upload; a re-upload within the delay
+# replaces the queued check instead of adding another
+PLAGIARISM_CHECK_DELAY = 5
+# Uploads this many seconds or less before an assignment's due date get no
+# check of their own; they are checked in micro-batches, or left to the
+# batch check of the assignment when micro-batching is off
+PLAGIARISM_DEADLINE_BATCH_WINDOW = int(os.getenv("PLAGIARISM_DEADLINE_BATCH_WINDOW", 3600))
+# A micro-batch is scored PLAGIARISM_MICROBATCH_WINDOW seconds after its
+# first upload, or as soon as it holds PLAGIARISM_MICROBATCH_MAX_SIZE
+# uploads, so a burst upload is reported at most one window plus one
+# batch's scoring time after it arrives. Needs the "corpus" mode with a
+# PLAGIARISM_CORPUS_DIR; 0 turns micro-batching off
+PLAGIARISM_MICROBATCH_WINDOW = int(os.getenv("PLAGIARISM_MICROBATCH_WINDOW", 30))
+PLAGIARISM_MICROBATCH_MAX_SIZE = int(os.getenv("PLAGIARISM_MICROBATCH_MAX_SIZE", 200))
+# Redis holding the uploads waiting for their micro-batch
+PLAGIARISM_MICROBATCH_REDIS_URL = os.getenv("PLAGIARISM_MICROBATCH_REDIS_URL", CELERY_BROKER_URL)
+# Redis holding the pipeline counters and stage histograms of services.metrics
+PLAGIARISM_METRICS_REDIS_URL = os.getenv("PLAGIARISM_METRICS_REDIS_URL", CELERY_BROKER_URL)
+# Bearer token /metrics requires from the Prometheus scraper; /metrics
+# answers 404 while it is empty
+PLAGIARISM_METRICS_TOKEN = os.getenv("PLAGIARISM_METRICS_TOKEN", "")
+# Trace the peak memory of every check stage with tracemalloc, which slows
+# allocation down noticeably
+PLAGIARISM_TRACE_MEMORY = os.getenv("PLAGIARISM_TRACE_MEMORY", "false") == "true"
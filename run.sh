@@ -35,11 +35,19 @@ main() {
         touch requirement_installed.txt
     fi
 
+    # Fetch the NLTK data once; workers load it offline from nltk_data
+    if [ ! -d "nltk_data" ]; then
+        echo "Downloading NLTK data..."
+        python manage.py download_nltk_data
+    fi
+
     # Start the application
     gunicorn -b 0.0.0.0:8000 PlagiarismChecker.wsgi &
 
-    # Start the celery workers
-    celery -A PlagiarismChecker worker -l info &
+    # Start one celery worker per queue
+    for queue in priority extraction scoring batch light; do
+        python manage.py run_worker "$queue" &
+    done
 
     # Start the celery beat
     celery -A PlagiarismChecker beat -l info &